@@ -1,47 +1,61 @@
+from bits import MASK32, SIGN_BIT
+from opcodes import OP_IDS
+
+
+def _sltu(a, b):
+    return 1 if (a & 0xFFFFFFFF) < (b & 0xFFFFFFFF) else 0
+
+
+def _address(op1, op2, imm, pc):
+    return op1 + imm
+
+
+# Raw (unwrapped) result of each operation, called as handler(op1, op2, imm, pc)
+HANDLERS_BY_NAME = {
+    'add': lambda op1, op2, imm, pc: op1 + op2,
+    'addi': lambda op1, op2, imm, pc: op1 + imm,
+    'sub': lambda op1, op2, imm, pc: op1 - op2,
+    'and': lambda op1, op2, imm, pc: op1 & op2,
+    'andi': lambda op1, op2, imm, pc: op1 & imm,
+    'or': lambda op1, op2, imm, pc: op1 | op2,
+    'ori': lambda op1, op2, imm, pc: op1 | imm,
+    'xor': lambda op1, op2, imm, pc: op1 ^ op2,
+    'xori': lambda op1, op2, imm, pc: op1 ^ imm,
+    'sll': lambda op1, op2, imm, pc: op1 << (op2 & 0x1F),
+    'slli': lambda op1, op2, imm, pc: op1 << imm,
+    'srl': lambda op1, op2, imm, pc: (op1 & 0xFFFFFFFF) >> (op2 & 0x1F),
+    'srli': lambda op1, op2, imm, pc: (op1 & 0xFFFFFFFF) >> imm,
+    'sra': lambda op1, op2, imm, pc: op1 >> (op2 & 0x1F),
+    'srai': lambda op1, op2, imm, pc: op1 >> imm,
+    'slt': lambda op1, op2, imm, pc: 1 if op1 < op2 else 0,
+    'slti': lambda op1, op2, imm, pc: 1 if op1 < imm else 0,
+    'sltu': lambda op1, op2, imm, pc: _sltu(op1, op2),
+    'sltiu': lambda op1, op2, imm, pc: _sltu(op1, imm),
+    'lw': _address, 'lb': _address, 'lh': _address, 'lbu': _address, 'lhu': _address,
+    'sw': _address, 'sb': _address, 'sh': _address,
+    'beq': lambda op1, op2, imm, pc: 1 if op1 == op2 else 0,
+    'bne': lambda op1, op2, imm, pc: 1 if op1 != op2 else 0,
+    'blt': lambda op1, op2, imm, pc: 1 if op1 < op2 else 0,
+    'bge': lambda op1, op2, imm, pc: 1 if op1 >= op2 else 0,
+    'bltu': lambda op1, op2, imm, pc: _sltu(op1, op2),
+    'bgeu': lambda op1, op2, imm, pc: 1 - _sltu(op1, op2),
+    'jal': lambda op1, op2, imm, pc: pc + 4,
+    'jalr': lambda op1, op2, imm, pc: pc + 4,
+    'lui': lambda op1, op2, imm, pc: imm << 12,
+    'auipc': lambda op1, op2, imm, pc: pc + (imm << 12),
+}
+
+# Indexed by opcode ID
+HANDLERS = [None] * len(OP_IDS)
+for _op, _handler in HANDLERS_BY_NAME.items():
+    HANDLERS[OP_IDS[_op]] = _handler
+
+
 class ALU:
     @staticmethod
-    def execute(opcode, inst_type, op1, op2, imm, pc):
-
-        result = 0
-
-        if opcode in ['add', 'addi']:
-            result = op1 + (imm if inst_type == 'I' else op2)
-        elif opcode == 'sub':
-            result = op1 - op2
-        elif opcode in ['and', 'andi']:
-            result = op1 & (imm if inst_type == 'I' else op2)
-        elif opcode in ['or', 'ori']:
-            result = op1 | (imm if inst_type == 'I' else op2)
-        elif opcode in ['xor', 'xori']:
-            result = op1 ^ (imm if inst_type == 'I' else op2)
-        elif opcode in ['sll', 'slli']:
-            result = op1 << (imm if inst_type == 'I' else (op2 & 0x1F))
-        elif opcode in ['srl', 'srli']:
-            result = (op1 & 0xFFFFFFFF) >> (imm if inst_type == 'I' else (op2 & 0x1F))
-        elif opcode in ['sra', 'srai']:
-            result = op1 >> (imm if inst_type == 'I' else (op2 & 0x1F))
-        elif opcode in ['slt', 'slti']:
-            result = 1 if op1 < (imm if inst_type == 'I' else op2) else 0
-        elif opcode in ['lw', 'lb', 'lh', 'sw', 'sb', 'sh']:
-            result = op1 + imm
-        elif opcode == 'beq':
-            result = 1 if op1 == op2 else 0
-        elif opcode == 'bne':
-            result = 1 if op1 != op2 else 0
-        elif opcode == 'blt':
-            result = 1 if op1 < op2 else 0
-        elif opcode == 'bge':
-            result = 1 if op1 >= op2 else 0
-        elif opcode in ['jal', 'jalr']:
-            result = pc + 4
-        elif opcode == 'lui':
-            result = imm << 12
-        elif opcode == 'auipc':
-            result = pc + (imm << 12)
+    def execute(inst, op1, op2, pc):
 
-        # Handle 32-bit signed arithmetic
-        result = result & 0xFFFFFFFF
-        if result & 0x80000000:
-            result = result - 0x100000000
+        result = inst.handler(op1, op2, inst.imm, pc)
 
-        return result
\ No newline at end of file
+        # Handle 32-bit signed arithmetic
+        return ((result + SIGN_BIT) & MASK32) - SIGN_BIT
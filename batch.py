@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fnmatch import fnmatch
+
+from result_cache import ResultCache, DEFAULT_MAX_BYTES
+from simulator import RISCVSimulator
+
+
+PROGRAM_PATTERNS = ['*.s', '*.asm']
+
+# Cycles run between timeout checks
+SLICE_CYCLES = 100000
+
+
+def collect_programs(inputs, patterns=PROGRAM_PATTERNS):
+    """Expand files and directories (searched recursively) into program paths"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found = set()
+            for root, _, files in os.walk(item):
+                for name in files:
+                    if any(fnmatch(name, pattern) for pattern in patterns):
+                        found.add(os.path.join(root, name))
+            paths.extend(sorted(found))
+        else:
+            paths.append(item)
+    return paths
+
+
+def _run_until(sim, max_cycles, deadline):
+    """Run ``sim``; returns (RunResult, stop reason), which is 'timeout' if
+    ``deadline`` (a perf_counter time, or None) passed first"""
+    if deadline is None:
+        run = sim.run(max_cycles=max_cycles)
+        return run, run.stop_reason
+
+    # Run in slices so the deadline is checked without signals
+    remaining = max_cycles
+    while True:
+        budget = SLICE_CYCLES if remaining is None else min(SLICE_CYCLES, remaining)
+        run = sim.run(max_cycles=budget)
+        stop_reason = run.stop_reason
+        if stop_reason != 'max_cycles':
+            break
+        if remaining is not None:
+            remaining -= budget
+            if remaining <= 0:
+                break
+        if time.perf_counter() >= deadline:
+            stop_reason = 'timeout'
+            break
+    return run, stop_reason
+
+
+def run_file(path, mode='pipeline', max_cycles=None, timeout=None, cache=None,
+             cache_size=DEFAULT_MAX_BYTES):
+    """Assemble and run one program; returns a JSON-ready result dict.
+
+    Failures (unreadable file, simulator error) are reported in the
+    result's ``error`` field rather than raised, so one bad program does
+    not stop a batch. ``cache`` is the path of a ResultCache file: a
+    program run before with the same settings is answered from it
+    (``cached`` is true) and new results are added, except timed-out ones.
+    """
+    result = {'path': path, 'mode': mode}
+    started = time.perf_counter()
+    deadline = None if timeout is None else started + timeout
+    try:
+        with open(path) as f:
+            code = f.read()
+        sim = RISCVSimulator(mode)
+        sim.configure_log(levels=[], max_entries=0)
+        sim.load_program(code)
+
+        if cache is None:
+            run, stop_reason = _run_until(sim, max_cycles, deadline)
+        else:
+            with ResultCache(cache, cache_size) as results:
+                key = results.key(sim, max_cycles)
+                run = results.lookup(key)
+                if run is None:
+                    run, stop_reason = _run_until(sim, max_cycles, deadline)
+                    if stop_reason != 'timeout':
+                        run = results.store(key, sim, run)
+                else:
+                    stop_reason = run.stop_reason
+
+        result.update(run.to_dict())
+        result['stop_reason'] = stop_reason
+        result.setdefault('registers', list(sim.registers))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['elapsed'] = time.perf_counter() - started
+    return result
+
+
+def run_chunk(paths, options):
+    return [run_file(path, **options) for path in paths]
+
+
+class BatchRunner:
+    """Runs many assembly programs over a pool of worker processes.
+
+    Programs are sent to workers ``chunk_size`` paths at a time (workers
+    read the files themselves, so only paths and result dicts cross
+    process boundaries) and results are yielded as chunks complete, not in
+    input order. ``workers=1`` runs in-process without a pool. With
+    ``cache`` (a file path) every worker answers repeated programs from a
+    shared ResultCache.
+    """
+
+    def __init__(self, workers=None, chunk_size=None, mode='pipeline', max_cycles=None, timeout=None,
+                 cache=None, cache_size=DEFAULT_MAX_BYTES):
+        if mode not in RISCVSimulator.MODES:
+            raise ValueError(f"Unknown execution mode: {mode!r}")
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.options = {'mode': mode, 'max_cycles': max_cycles, 'timeout': timeout}
+        if cache is not None:
+            self.options.update(cache=cache, cache_size=cache_size)
+
+    def run(self, paths):
+        paths = list(paths)
+        if self.workers == 1:
+            for path in paths:
+                yield run_file(path, **self.options)
+            return
+
+        # Default to ~4 chunks per worker: large enough to amortise
+        # dispatch, small enough to balance uneven run times
+        chunk_size = self.chunk_size or max(1, len(paths) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(run_chunk, paths[i:i + chunk_size], self.options)
+                       for i in range(0, len(paths), chunk_size)]
+            for future in as_completed(futures):
+                yield from future.result()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Run RV32I assembly programs in parallel and stream JSON-lines results")
+    arg_parser.add_argument('inputs', nargs='+',
+                            help="assembly files or directories (searched for *.s, *.asm)")
+    arg_parser.add_argument('-j', '--workers', type=int, default=None,
+                            help="worker processes (default: CPU count)")
+    arg_parser.add_argument('--chunk-size', type=int, default=None,
+                            help="programs per task sent to a worker")
+    arg_parser.add_argument('--mode', choices=list(RISCVSimulator.MODES), default='pipeline')
+    arg_parser.add_argument('--max-cycles', type=int, default=None, help="per-program cycle limit")
+    arg_parser.add_argument('--timeout', type=float, default=None,
+                            help="per-program wall-clock limit in seconds")
+    arg_parser.add_argument('-o', '--output', default=None, help="results file (default: stdout)")
+    arg_parser.add_argument('--cache', metavar='FILE', default=None,
+                            help="SQLite result cache to answer repeated programs from")
+    arg_parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / (1 << 20),
+                            metavar='MIB', help="cache size before least recently used results are evicted")
+    args = arg_parser.parse_args(argv)
+
+    paths = collect_programs(args.inputs)
+    runner = BatchRunner(args.workers, args.chunk_size, args.mode, args.max_cycles, args.timeout,
+                         args.cache, int(args.cache_size * (1 << 20)))
+    out = open(args.output, 'w') if args.output else sys.stdout
+    started = time.perf_counter()
+    count = errors = cached = 0
+    try:
+        for result in runner.run(paths):
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            count += 1
+            errors += 'error' in result
+            cached += result.get('cached', False)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    hits = f", {cached} cached" if args.cache else ''
+    print(f"{count} programs, {errors} errors{hits}, {time.perf_counter() - started:.2f}s",
+          file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from simulator import RISCVSimulator
+
+
+def counted_loop(n):
+    return f"""
+        li x1, 0
+        li x2, {n}
+loop:   addi x1, x1, 1
+        bne x1, x2, loop
+"""
+
+
+def memcpy(n):
+    return f"""
+.data
+src:    .space {4 * n}
+dst:    .space {4 * n}
+.text
+        la x1, src
+        li x3, {n}
+fill:   sw x3, 0(x1)
+        addi x1, x1, 4
+        addi x3, x3, -1
+        bne x3, x0, fill
+        la x1, src
+        la x2, dst
+        li x3, {n}
+copy:   lw x4, 0(x1)
+        sw x4, 0(x2)
+        addi x1, x1, 4
+        addi x2, x2, 4
+        addi x3, x3, -1
+        bne x3, x0, copy
+"""
+
+
+def fibonacci(n):
+    return f"""
+        li x1, 0
+        li x2, 1
+        li x3, {n}
+loop:   add x4, x1, x2
+        mv x1, x2
+        mv x2, x4
+        addi x3, x3, -1
+        bne x3, x0, loop
+"""
+
+
+def bubble_sort(n):
+    # Sorts n words stored in descending order (worst case)
+    return f"""
+.data
+array:  .space {4 * max(n, 2)}
+.text
+        la x10, array
+        li x11, {max(n, 2)}
+        li x1, 0
+init:   slli x2, x1, 2
+        add x2, x2, x10
+        sub x3, x11, x1
+        sw x3, 0(x2)
+        addi x1, x1, 1
+        blt x1, x11, init
+        addi x5, x11, -1
+outer:  li x1, 0
+        mv x6, x10
+inner:  lw x2, 0(x6)
+        lw x3, 4(x6)
+        bge x3, x2, noswap
+        sw x3, 0(x6)
+        sw x2, 4(x6)
+noswap: addi x6, x6, 4
+        addi x1, x1, 1
+        blt x1, x5, inner
+        addi x5, x5, -1
+        blt x0, x5, outer
+"""
+
+
+def pointer_chase(n):
+    # 1024 nodes linked with a stride of 389 (coprime), walked n times
+    return f"""
+.data
+nodes:  .space 4096
+.text
+        la x10, nodes
+        li x11, 1024
+        li x12, 389
+        li x1, 0
+init:   add x2, x1, x12
+        blt x2, x11, nowrap
+        sub x2, x2, x11
+nowrap: slli x3, x1, 2
+        add x3, x3, x10
+        slli x4, x2, 2
+        add x4, x4, x10
+        sw x4, 0(x3)
+        addi x1, x1, 1
+        blt x1, x11, init
+        mv x5, x10
+        li x6, {n}
+chase:  lw x5, 0(x5)
+        addi x6, x6, -1
+        bne x6, x0, chase
+"""
+
+
+def branchy(n):
+    # Branches on the low bits of a xorshift sequence
+    return f"""
+        li x1, 12345
+        li x2, {n}
+        li x3, 0
+        li x7, 0
+loop:   slli x5, x1, 13
+        xor x1, x1, x5
+        srli x5, x1, 17
+        xor x1, x1, x5
+        slli x5, x1, 5
+        xor x1, x1, x5
+        andi x6, x1, 1
+        beq x6, x0, even
+        addi x3, x3, 1
+        j next
+even:   addi x3, x3, -1
+next:   andi x6, x1, 2
+        beq x6, x0, skip
+        addi x7, x7, 1
+skip:   addi x2, x2, -1
+        bne x2, x0, loop
+"""
+
+
+# name: (source generator, size at scale 1)
+WORKLOADS = {
+    'counted_loop': (counted_loop, 50000),
+    'memcpy': (memcpy, 15000),
+    'fibonacci': (fibonacci, 20000),
+    'bubble_sort': (bubble_sort, 100),
+    'pointer_chase': (pointer_chase, 30000),
+    'branchy': (branchy, 8000),
+}
+
+# Relative drop in instructions/second reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def workload_source(name, scale=1.0):
+    generate, size = WORKLOADS[name]
+    return generate(max(1, int(size * scale)))
+
+
+def run_once(source, mode):
+    """(parse seconds, run seconds, simulator) for one cold run"""
+    started = time.perf_counter()
+    sim = RISCVSimulator(mode)
+    sim.configure_log(levels=[], max_entries=0)
+    sim.load_program(source)
+    loaded = time.perf_counter()
+    sim.run()
+    return loaded - started, time.perf_counter() - loaded, sim
+
+
+def peak_memory(source, mode):
+    """Peak bytes allocated by Python while assembling and running"""
+    tracemalloc.start()
+    try:
+        run_once(source, mode)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(name, mode, scale=1.0, repeat=3, measure_memory=True):
+    """Best-of-``repeat`` timings for one workload in one mode"""
+    source = workload_source(name, scale)
+    best_parse = best_run = None
+    for _ in range(repeat):
+        parse_time, run_time, sim = run_once(source, mode)
+        best_parse = parse_time if best_parse is None else min(best_parse, parse_time)
+        best_run = run_time if best_run is None else min(best_run, run_time)
+
+    result = {
+        'workload': name,
+        'mode': mode,
+        'cycles': sim.cycle,
+        'instructions': sim.instructions_executed,
+        'parse_seconds': best_parse,
+        'run_seconds': best_run,
+        'cycles_per_second': sim.cycle / best_run if best_run else 0.0,
+        'instructions_per_second': sim.instructions_executed / best_run if best_run else 0.0,
+        'registers': list(sim.registers),
+    }
+    if measure_memory:
+        result['peak_memory'] = peak_memory(source, mode)
+    return result
+
+
+def check_consistency(results):
+    """Workloads whose final registers differ between modes"""
+    registers = {}
+    mismatches = []
+    for result in results:
+        expected = registers.setdefault(result['workload'], result['registers'])
+        if result['registers'] != expected and result['workload'] not in mismatches:
+            mismatches.append(result['workload'])
+    return mismatches
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Results whose instructions/second fell more than ``threshold``
+    below the baseline's, as (key, baseline rate, current rate)"""
+    previous = {f"{r['workload']}/{r['mode']}": r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        key = f"{result['workload']}/{result['mode']}"
+        old = previous.get(key)
+        if old is None:
+            continue
+        old_rate = old['instructions_per_second']
+        new_rate = result['instructions_per_second']
+        if new_rate < old_rate * (1 - threshold):
+            regressions.append((key, old_rate, new_rate))
+    return regressions
+
+
+def format_results(results):
+    lines = [f"{'workload':<14} {'mode':<10} {'instructions':>12} {'cycles/s':>12} "
+             f"{'instr/s':>12} {'parse ms':>9} {'peak KiB':>9}"]
+    for r in results:
+        peak = f"{r['peak_memory'] / 1024:9.0f}" if 'peak_memory' in r else f"{'-':>9}"
+        lines.append(f"{r['workload']:<14} {r['mode']:<10} {r['instructions']:>12} "
+                     f"{r['cycles_per_second']:>12,.0f} {r['instructions_per_second']:>12,.0f} "
+                     f"{r['parse_seconds'] * 1000:>9.2f} {peak}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Measure simulator throughput on reference workloads")
+    arg_parser.add_argument('--workloads', nargs='+', choices=list(WORKLOADS), default=list(WORKLOADS))
+    arg_parser.add_argument('--modes', nargs='+', choices=list(RISCVSimulator.MODES),
+                            default=list(RISCVSimulator.MODES))
+    arg_parser.add_argument('--scale', type=float, default=1.0, help="multiply workload sizes")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per measurement (best is kept)")
+    arg_parser.add_argument('--no-memory', action='store_true', help="skip the peak-memory pass")
+    arg_parser.add_argument('-o', '--output', default=None, help="write results as JSON")
+    arg_parser.add_argument('--baseline', default=None, help="JSON results to compare against")
+    arg_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                            help="allowed relative slowdown before failing (default 0.10)")
+    args = arg_parser.parse_args(argv)
+
+    results = []
+    for name in args.workloads:
+        for mode in args.modes:
+            results.append(benchmark(name, mode, args.scale, args.repeat, not args.no_memory))
+            print(format_results(results[-1:]).split('\n')[1], file=sys.stderr)
+
+    print(format_results(results))
+    status = 0
+
+    mismatches = check_consistency(results)
+    if mismatches:
+        print(f"modes disagree on final registers: {', '.join(mismatches)}")
+        status = 1
+
+    if args.output:
+        report = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'results': [{k: v for k, v in r.items() if k != 'registers'} for r in results],
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for key, old_rate, new_rate in regressions:
+            print(f"REGRESSION {key}: {new_rate:,.0f} instr/s vs baseline {old_rate:,.0f} "
+                  f"({new_rate / old_rate - 1:+.1%})")
+        if regressions:
+            status = 1
+        else:
+            print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
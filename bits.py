@@ -0,0 +1,9 @@
+# Values are kept as signed 32-bit integers; every module wraps with these.
+# Hot paths inline the wrap32 expression rather than pay for the call.
+MASK32 = 0xFFFFFFFF
+SIGN_BIT = 0x80000000
+
+
+def wrap32(value):
+    """``value`` wrapped to a signed 32-bit integer"""
+    return ((value + SIGN_BIT) & MASK32) - SIGN_BIT
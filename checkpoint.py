@@ -0,0 +1,102 @@
+import struct
+import zlib
+
+from latch import STAGES
+from memory import PAGE_SIZE
+
+
+CHECKPOINT_MAGIC = b'RVCP'
+CHECKPOINT_VERSION = 1
+
+PREAMBLE = struct.Struct('<4sH')
+# mode, program start/end, pc, cycle, instructions executed, hazards, page count
+HEADER = struct.Struct('<16sqqqqqqI')
+REGISTERS = struct.Struct('<32i')
+# valid, pc, rd, rs1, rs2, imm, rs1_val, rs2_val, alu_result, data
+LATCH_STATE = struct.Struct('<?9q')
+PAGE_NUMBER = struct.Struct('<I')
+
+
+class Checkpoint:
+    """Complete machine state captured by RISCVSimulator.checkpoint.
+
+    Holds the register file, PC, counters, pipeline latch fields and memory
+    as ``{page number: bytes}``. Pages are immutable and shared between
+    successive checkpoints of the same simulator, so taking one only copies
+    the pages written since the last. The program itself is not included;
+    its address range is recorded so it can be checked on restore.
+    Latches refer to their instruction by PC.
+    """
+
+    def __init__(self, mode, program_range, registers, pc, cycle, instructions_executed,
+                 hazards_detected, latches, pages):
+        self.mode = mode
+        self.program_range = program_range
+        self.registers = registers
+        self.pc = pc
+        self.cycle = cycle
+        self.instructions_executed = instructions_executed
+        self.hazards_detected = hazards_detected
+        self.latches = latches
+        self.pages = pages
+
+    @property
+    def in_flight(self):
+        """True if any pipeline latch holds an instruction"""
+        return any(state[0] for state in self.latches.values())
+
+    def to_bytes(self):
+        parts = [
+            HEADER.pack(self.mode.encode(), *self.program_range, self.pc, self.cycle,
+                        self.instructions_executed, self.hazards_detected, len(self.pages)),
+            REGISTERS.pack(*self.registers),
+        ]
+        parts += [LATCH_STATE.pack(*self.latches[stage]) for stage in STAGES]
+        for number in sorted(self.pages):
+            parts.append(PAGE_NUMBER.pack(number))
+            parts.append(self.pages[number])
+        # Mostly-zero pages compress well; level 1 keeps saving fast
+        return PREAMBLE.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION) + zlib.compress(b''.join(parts), 1)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version = PREAMBLE.unpack_from(data)
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError("Not a simulator checkpoint")
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {version}")
+
+        body = memoryview(zlib.decompress(data[PREAMBLE.size:]))
+        (mode, start, end, pc, cycle, instructions_executed, hazards_detected,
+         page_count) = HEADER.unpack_from(body)
+        offset = HEADER.size
+        registers = list(REGISTERS.unpack_from(body, offset))
+        offset += REGISTERS.size
+
+        latches = {}
+        for stage in STAGES:
+            latches[stage] = LATCH_STATE.unpack_from(body, offset)
+            offset += LATCH_STATE.size
+
+        pages = {}
+        for _ in range(page_count):
+            (number,) = PAGE_NUMBER.unpack_from(body, offset)
+            offset += PAGE_NUMBER.size
+            pages[number] = bytes(body[offset:offset + PAGE_SIZE])
+            offset += PAGE_SIZE
+
+        return cls(mode.rstrip(b'\0').decode(), (start, end), registers, pc, cycle,
+                   instructions_executed, hazards_detected, latches, pages)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def __repr__(self):
+        return (f"Checkpoint(mode={self.mode!r}, cycle={self.cycle}, pc={self.pc}, "
+                f"pages={len(self.pages)})")
@@ -0,0 +1,178 @@
+import time
+
+# Taken before the simulator modules load so reported start-up time
+# includes import cost
+STARTED = time.perf_counter()
+
+import argparse
+import json
+import sys
+
+from simulator import RISCVSimulator
+
+
+def parse_dump(text):
+    """'ADDRESS[:WORDS]' -> (address, words); the address may be a label,
+    resolved once the program is loaded"""
+    address, _, count = text.partition(':')
+    try:
+        return address, int(count, 0) if count else 16
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected ADDRESS[:WORDS], got {text!r}") from None
+
+
+def resolve_address(sim, text):
+    """Address from a number or a label of the loaded program"""
+    try:
+        return int(text, 0)
+    except ValueError:
+        pass
+    if text.lower() not in sim.labels:
+        raise ValueError(f"Unknown address or label {text!r}")
+    return sim.labels[text.lower()]
+
+
+def dump_memory(sim, address, count):
+    return sim.memory.view(address, count).tolist()
+
+
+def format_text(result, registers, dumps, timing):
+    lines = [
+        f"stop: {result['stop_reason']}  cycles: {result['cycles']}  "
+        f"instructions: {result['instructions']}  CPI: {result['cpi']:.2f}  "
+        f"hazards: {result['hazards']}  pc: 0x{result['pc'] & 0xFFFFFFFF:08x}"
+    ]
+    if registers is not None:
+        for row in range(0, 32, 4):
+            lines.append('  '.join(f"x{reg:<2} = {registers[reg]:>11}" for reg in range(row, row + 4)))
+    for address, words in dumps:
+        for i in range(0, len(words), 4):
+            row = ' '.join(f"{word & 0xFFFFFFFF:08x}" for word in words[i:i + 4])
+            lines.append(f"0x{(address + 4 * i) & 0xFFFFFFFF:08x}: {row}")
+    if timing is not None:
+        lines.append(f"startup: {timing['startup'] * 1000:.1f} ms  "
+                     f"run: {timing['run']:.3f} s  "
+                     f"({timing['cycles_per_second']:,.0f} cycles/s)")
+    return '\n'.join(lines)
+
+
+def run(args):
+    sim = RISCVSimulator(args.mode)
+    sim.configure_log(levels=[], max_entries=0)
+
+    if args.binary:
+        if args.program == '-':
+            raise ValueError("Binaries cannot be read from stdin")
+        sim.load_binary(args.program, args.base)
+    elif args.program == '-':
+        sim.load_program(sys.stdin)
+    else:
+        with open(args.program) as f:
+            sim.load_program(f)
+
+    until_pc = resolve_address(sim, args.until_pc) if args.until_pc is not None else None
+    if args.profile or args.profile_stacks:
+        sim.enable_profiling()
+    if args.trace:
+        sim.enable_trace(args.trace)
+    loaded = time.perf_counter()
+    if args.sample:
+        if args.max_cycles is not None or until_pc is not None:
+            raise ValueError("Sampled runs only accept --max-instructions")
+        run_result = sim.run_sampled(args.sample, args.sample_warmup, args.sample_window,
+                                     max_instructions=args.max_instructions)
+    else:
+        run_result = sim.run(args.max_cycles, args.max_instructions, until_pc)
+    elapsed = time.perf_counter() - loaded
+
+    sim.disable_trace()
+    if sim.profiler is not None:
+        profiler = sim.disable_profiling()
+        if args.profile:
+            profiler.save_json(args.profile)
+        if args.profile_stacks:
+            profiler.save_collapsed(args.profile_stacks)
+
+    result = run_result.to_dict()
+    registers = None if args.no_registers else sim.register_snapshot().tolist()
+    dumps = []
+    for location, count in args.dump:
+        address = resolve_address(sim, location)
+        dumps.append((address, dump_memory(sim, address, count)))
+    timing = None
+    if args.timing:
+        timing = {
+            'startup': loaded - STARTED,
+            'run': elapsed,
+            'cycles_per_second': run_result.cycles / elapsed if elapsed else 0.0,
+        }
+
+    if args.format == 'json':
+        if registers is not None:
+            result['registers'] = registers
+        if dumps:
+            result['memory'] = [{'address': address, 'words': words} for address, words in dumps]
+        if timing is not None:
+            result['timing'] = timing
+        print(json.dumps(result))
+    else:
+        print(format_text(result, registers, dumps, timing))
+    return 0
+
+
+def gui(args):
+    # Imported here so headless runs never load tkinter
+    from main import main as gui_main
+    gui_main()
+    return 0
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="RV32I pipeline simulator")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run a program without the GUI")
+    run_parser.add_argument('program', help="assembly file ('-' for stdin), or a binary with --binary")
+    run_parser.add_argument('--mode', choices=list(RISCVSimulator.MODES), default='pipeline')
+    run_parser.add_argument('--max-cycles', type=int, default=None)
+    run_parser.add_argument('--max-instructions', type=int, default=None)
+    run_parser.add_argument('--until-pc', default=None,
+                            help="stop before the instruction at this address or label retires")
+    run_parser.add_argument('--binary', action='store_true',
+                            help="load an ELF32 executable or flat binary instead of assembly")
+    run_parser.add_argument('--base', type=lambda text: int(text, 0), default=0,
+                            help="load address for flat binaries")
+    run_parser.add_argument('--format', choices=['text', 'json'], default='text')
+    run_parser.add_argument('--dump', type=parse_dump, action='append', default=[],
+                            metavar='ADDRESS[:WORDS]',
+                            help="print memory words from ADDRESS (default 16 words; repeatable)")
+    run_parser.add_argument('--no-registers', action='store_true', help="omit the register file")
+    run_parser.add_argument('--timing', action='store_true',
+                            help="report start-up time and simulation speed")
+    run_parser.add_argument('--profile', metavar='FILE', default=None,
+                            help="write stage times, opcode, PC and memory access counts as JSON")
+    run_parser.add_argument('--profile-stacks', metavar='FILE', default=None,
+                            help="write stage times as collapsed stacks for flame graph tools")
+    run_parser.add_argument('--trace', metavar='FILE', default=None,
+                            help="write a binary per-cycle trace (read it with trace_reader.py)")
+    run_parser.add_argument('--sample', type=int, metavar='INTERVAL', default=None,
+                            help="estimate pipeline timing from a window every INTERVAL instructions")
+    run_parser.add_argument('--sample-warmup', type=int, default=100, metavar='N',
+                            help="unmeasured pipeline instructions before each window")
+    run_parser.add_argument('--sample-window', type=int, default=1000, metavar='N',
+                            help="measured pipeline instructions per window")
+    run_parser.set_defaults(handler=run)
+
+    gui_parser = commands.add_parser('gui', help="open the graphical simulator")
+    gui_parser.set_defaults(handler=gui)
+
+    args = arg_parser.parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
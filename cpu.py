@@ -1,20 +1,25 @@
+from execution_log import ExecutionLog
+from latch import make_pipeline
+from opcodes import OP_JALR
+from register_file import make_registers
+
+
 class CPU:
     def __init__(self):
-        self.registers = [0] * 32
+        self.registers = make_registers()
         self.pc = 0
         self.cycle = 0
         self.instructions_executed = 0
 
-        self.pipeline = {
-            'IF': {'instruction': None, 'pc': 0},
-            'ID': {'instruction': None, 'pc': 0, 'opcode': None, 'rs1': 0, 'rs2': 0, 'rd': 0,
-                   'imm': 0, 'rs1Val': 0, 'rs2Val': 0},
-            'EX': {'instruction': None, 'pc': 0, 'rd': 0, 'aluResult': 0, 'rs2Val': 0},
-            'MEM': {'instruction': None, 'pc': 0, 'rd': 0, 'data': 0},
-            'WB': {'instruction': None, 'pc': 0, 'rd': 0, 'data': 0}
-        }
+        # Fixed latches, updated in place every cycle
+        self.pipeline = make_pipeline()
+        self.if_latch = self.pipeline['IF']
+        self.id_latch = self.pipeline['ID']
+        self.ex_latch = self.pipeline['EX']
+        self.mem_latch = self.pipeline['MEM']
+        self.wb_latch = self.pipeline['WB']
 
-        self.execution_log = []
+        self.execution_log = ExecutionLog()
         self.is_running = False
 
     def parse_register(self, reg):
@@ -27,138 +32,144 @@ class CPU:
             return 0
 
     def flush_pipeline(self):
-        self.pipeline['IF'] = {'instruction': None, 'pc': 0}
-        self.pipeline['ID'] = {'instruction': None}
+        # Squash every instruction younger than the one retiring in WB
+        self.if_latch.valid = False
+        self.id_latch.valid = False
+        self.ex_latch.valid = False
+
+    def rewind_in_flight(self):
+        """Drop every in-flight instruction and point pc at the oldest.
 
-    def fetch(self, instructions):
-        if self.pc >= len(instructions) * 4:
-            self.pipeline['IF']['instruction'] = None
+        Everything older has retired, so the registers, memory and pc are
+        then the architectural state an ISA-level engine can resume from.
+        The instruction in MEM has already made its memory access; running
+        it again repeats the same access. Returns the new pc.
+        """
+        for latch in (self.mem_latch, self.ex_latch, self.id_latch, self.if_latch):
+            if latch.valid:
+                self.pc = latch.pc
+                break
+        for latch in self.pipeline.values():
+            latch.valid = False
+        return self.pc
+
+    def fetch(self, program):
+        latch = self.if_latch
+        pc = self.pc
+        if not program.start <= pc < program.end:
+            latch.valid = False
             return
 
-        inst_index = self.pc // 4
-        if inst_index < len(instructions):
-            self.pipeline['IF']['instruction'] = instructions[inst_index]
-            self.pipeline['IF']['pc'] = self.pc
+        # Words that do not decode are fetched as bubbles
+        inst = program.fetch(pc)
+        self.pc = pc + 4
+        latch.valid = inst is not None
+        latch.instruction = inst
+        latch.pc = pc
 
     def decode(self, instructions, hazard_detector):
-        if not self.pipeline['IF']['instruction']:
-            self.pipeline['ID'] = {'instruction': None}
+        latch = self.id_latch
+        if not self.if_latch.valid:
+            latch.valid = False
             return
 
-        inst = self.pipeline['IF']['instruction']
-        self.pipeline['ID'] = {
-            'instruction': inst,
-            'pc': self.pipeline['IF']['pc'],
-            'opcode': inst['op'],
-            'rs1': inst.get('rs1', 0),
-            'rs2': inst.get('rs2', 0),
-            'rd': inst.get('rd', 0),
-            'imm': inst.get('imm', 0),
-            'rs1Val': self.registers[inst.get('rs1', 0)],
-            'rs2Val': self.registers[inst.get('rs2', 0)]
-        }
+        inst = self.if_latch.instruction
+        latch.valid = True
+        latch.instruction = inst
+        latch.pc = self.if_latch.pc
+        latch.rs1 = inst.rs1
+        latch.rs2 = inst.rs2
+        latch.rd = inst.rd
+        latch.imm = inst.imm
+        latch.rs1_val = self.registers[inst.rs1]
+        latch.rs2_val = self.registers[inst.rs2]
 
         # Check for hazards
         if hazard_detector:
             hazard = hazard_detector.detect_hazards(self.pipeline)
             if hazard:
-                self.log_message(f"Hazard detected: {hazard}", 'hazard')
+                self.execution_log.record(self.cycle, 'hazard_detected', hazard)
                 hazard_detector.hazards_detected += 1
 
     def execute(self, alu, hazard_detector):
-        if not self.pipeline['ID'].get('instruction'):
-            self.pipeline['EX'] = {'instruction': None}
+        latch = self.ex_latch
+        if not self.id_latch.valid:
+            latch.valid = False
             return
 
-        inst = self.pipeline['ID']
+        inst = self.id_latch
 
-        # Get operand values with forwarding if needed
+        # Get operand values with forwarding if needed. MEM already holds the
+        # previous instruction's final value and WB the one before it.
         op1, op2 = hazard_detector.get_operands_with_forwarding(
-            inst, self.pipeline['EX'], self.pipeline['MEM'], self.registers
+            inst, self.mem_latch, self.wb_latch, self.registers
         )
 
         # Execute ALU operation
-        result = alu.execute(
-            inst['opcode'],
-            inst['instruction']['type'],
-            op1,
-            op2,
-            inst['imm'],
-            inst['pc']
-        )
+        result = alu.execute(inst.instruction, op1, op2, inst.pc)
 
-        self.pipeline['EX'] = {
-            'instruction': inst['instruction'],
-            'pc': inst['pc'],
-            'rd': inst['rd'],
-            'aluResult': result,
-            'rs2Val': op2
-        }
+        latch.copy_from(inst)
+        latch.rs1_val = op1
+        latch.rs2_val = op2
+        latch.alu_result = result
 
     def memory_access(self, memory_unit):
-        if not self.pipeline['EX'].get('instruction'):
-            self.pipeline['MEM'] = {'instruction': None}
+        latch = self.mem_latch
+        if not self.ex_latch.valid:
+            latch.valid = False
             return
 
-        inst = self.pipeline['EX']
-        data = inst['aluResult']
-        op = inst['instruction']['op']
+        inst = self.ex_latch
+        data = inst.alu_result
+        instruction = inst.instruction
 
         # Perform memory operation if needed
-        if op in ['lw', 'lb', 'lh'] or op in ['sw', 'sb', 'sh']:
-            data = memory_unit.access_memory(
-                op, inst['aluResult'], inst['rs2Val']
-            )
-
-        self.pipeline['MEM'] = {
-            'instruction': inst['instruction'],
-            'pc': inst['pc'],
-            'rd': inst['rd'],
-            'data': data
-        }
+        if instruction.is_load:
+            data = memory_unit.load(inst.alu_result, instruction.mem_size, instruction.mem_signed)
+        elif instruction.is_store:
+            data = memory_unit.store(inst.alu_result, inst.rs2_val, instruction.mem_size)
+
+        latch.copy_from(inst)
+        latch.data = data
 
     def write_back(self, instructions, hazard_detector):
-        if not self.pipeline['MEM'].get('instruction'):
-            self.pipeline['WB'] = {'instruction': None}
+        if not self.mem_latch.valid:
+            self.wb_latch.valid = False
             return
 
-        inst = self.pipeline['MEM']
-        op = inst['instruction']['op']
+        inst = self.mem_latch
+        instruction = inst.instruction
 
-        # Write back to register if needed
-        if inst['rd'] != 0 and not op.startswith('s') and not op.startswith('b'):
-            self.registers[inst['rd']] = inst['data']
-
-        # Handle branches and jumps
-        if op.startswith('b') and inst['data'] == 1:
-            branch_target = inst['pc'] + inst['instruction']['imm']
-            self.pc = branch_target
-            self.log_message(f"Branch taken to PC: {branch_target}", 'forward')
-            self.flush_pipeline()
-        elif op == 'jal':
-            self.pc = inst['pc'] + inst['instruction']['imm']
-            self.log_message(f"Jump to PC: {self.pc}", 'forward')
-            self.flush_pipeline()
-        elif op == 'jalr':
-            self.pc = (self.registers[inst['instruction']['rs1']] +
-                       inst['instruction']['imm']) & ~1
-            self.log_message(f"Jump register to PC: {self.pc}", 'forward')
+        # Handle branches and jumps (jalr reads rs1 before rd is written)
+        if instruction.is_branch:
+            if inst.data == 1:
+                branch_target = inst.pc + instruction.imm
+                self.pc = branch_target
+                self.execution_log.record(self.cycle, 'branch_taken', branch_target)
+                self.flush_pipeline()
+        elif instruction.is_jump:
+            if instruction.op_id == OP_JALR:
+                self.pc = (self.registers[instruction.rs1] + instruction.imm) & ~1
+                self.execution_log.record(self.cycle, 'jump_register', self.pc)
+            else:
+                self.pc = inst.pc + instruction.imm
+                self.execution_log.record(self.cycle, 'jump', self.pc)
             self.flush_pipeline()
-        elif not op.startswith('b'):
-            self.pc += 4
-        else:
-            self.pc += 4
 
-        self.pipeline['WB'] = inst
+        # Write back to register if needed
+        if instruction.writes_rd:
+            self.registers[inst.rd] = inst.data
+
+        self.wb_latch.copy_from(inst)
         self.instructions_executed += 1
         self.registers[0] = 0  # x0 is always 0
 
     def step(self, components):
         """Execute one pipeline step"""
-        if (self.pc >= len(components['instructions']) * 4 and
-                not any(self.pipeline[stage].get('instruction')
-                        for stage in ['IF', 'ID', 'EX', 'MEM', 'WB'])):
-            self.log_message('Program execution completed')
+        program = components['program']
+        if (not program.start <= self.pc < program.end and
+                not any(latch.valid for latch in self.pipeline.values())):
+            self.execution_log.record(self.cycle, 'program_completed')
             return False
 
         # Pipeline stages in reverse order (WB to IF)
@@ -166,35 +177,86 @@ class CPU:
         self.memory_access(components['memory'])
         self.execute(components['alu'], components['hazard_detector'])
         self.decode(components['instructions'], components['hazard_detector'])
-        self.fetch(components['instructions'])
+        self.fetch(program)
 
         self.cycle += 1
-        self.log_message(f"Cycle {self.cycle} completed", 'cycle')
+        self.execution_log.record(self.cycle, 'cycle_completed', self.cycle)
         return True
 
+    def run(self, components, max_cycles=None, max_instructions=None, until_pc=None):
+        """Run cycles in one loop until the program completes or a limit is hit.
+
+        ``until_pc`` stops before the instruction at that address touches
+        memory or registers, like the functional engines: once it is in the
+        EX/MEM latch, the older instruction ahead of it retires (the
+        write-back half of the next cycle, which is not counted again when
+        the run continues) and the run returns. Returns the stop reason:
+        'completed', 'max_cycles', 'max_instructions' or 'until_pc'.
+        """
+        program = components['program']
+        instructions = components['instructions']
+        hazard_detector = components['hazard_detector']
+        memory_unit = components['memory']
+        alu = components['alu']
+        write_back, memory_access = self.write_back, self.memory_access
+        execute, decode, fetch = self.execute, self.decode, self.fetch
+        if_latch, id_latch, ex_latch, mem_latch, wb_latch = (
+            self.if_latch, self.id_latch, self.ex_latch, self.mem_latch, self.wb_latch)
+        record = self.execution_log.record
+        start, end = program.start, program.end
+        cycle_budget = -1 if max_cycles is None else max_cycles
+        retire_limit = -1 if max_instructions is None else self.instructions_executed + max_instructions
+        cycles = 0
+
+        while True:
+            pc = self.pc
+            if (not start <= pc < end and not (if_latch.valid or id_latch.valid or ex_latch.valid
+                                               or mem_latch.valid or wb_latch.valid)):
+                record(self.cycle, 'program_completed')
+                return 'completed'
+            if cycles == cycle_budget:
+                return 'max_cycles'
+            if self.instructions_executed == retire_limit:
+                return 'max_instructions'
+
+            write_back(instructions, hazard_detector)
+            if ex_latch.pc == until_pc and ex_latch.valid:
+                self._stop_after_write_back()
+                return 'until_pc'
+            memory_access(memory_unit)
+            execute(alu, hazard_detector)
+            decode(instructions, hazard_detector)
+            fetch(program)
+
+            self.cycle += 1
+            record(self.cycle, 'cycle_completed', self.cycle)
+            cycles += 1
+
+    def _stop_after_write_back(self):
+        """Leave the pipeline between this cycle's write-back and the rest of
+        it: the retired instruction no longer waits in MEM/WB, and the one
+        in ID, which would have taken its value from the WB latch, reads it
+        from the register file instead."""
+        self.mem_latch.valid = False
+        latch = self.id_latch
+        if latch.valid:
+            latch.rs1_val = self.registers[latch.rs1]
+            latch.rs2_val = self.registers[latch.rs2]
+
     def reset(self):
-        self.registers = [0] * 32
+        self.registers = make_registers()
         self.pc = 0
         self.cycle = 0
         self.instructions_executed = 0
-        self.execution_log = []
+        self.execution_log.clear()
 
-        self.pipeline = {
-            'IF': {'instruction': None, 'pc': 0},
-            'ID': {'instruction': None},
-            'EX': {'instruction': None},
-            'MEM': {'instruction': None},
-            'WB': {'instruction': None}
-        }
+        for latch in self.pipeline.values():
+            latch.clear()
 
-        self.log_message('CPU reset')
+        self.execution_log.record(self.cycle, 'cpu_reset')
 
     def log_message(self, message, msg_type='info'):
-        self.execution_log.append({
-            'cycle': self.cycle,
-            'message': message,
-            'type': msg_type
-        })
+        self.execution_log.record(self.cycle, msg_type, message)
 
     def get_cpi(self):
         if self.instructions_executed > 0:
@@ -0,0 +1,191 @@
+import struct
+
+from bits import MASK32, wrap32
+from functional_cpu import BRANCH_OPS, FunctionalCPU
+from instrumentation import Patches
+
+
+TRACE_MAGIC = b'RVTR'
+TRACE_VERSION = 1
+
+# magic, version, record size, record count (written on close)
+TRACE_HEADER = struct.Struct('<4sHHQ')
+# cycle, IF/ID/EX/MEM/WB PCs, value written to rd, memory address,
+# memory value, rd, rs1, rs2, flags. Everything after the stage PCs
+# describes the instruction retiring (in WB) that cycle.
+TRACE_RECORD = struct.Struct('<q5IiIi4B')
+
+# Stage PC of a stage holding a bubble
+NO_PC = 0xFFFFFFFF
+
+# Record flags
+WRITE = 0x01     # the retiring instruction wrote rd (rd != 0)
+LOAD = 0x02
+STORE = 0x04
+HAZARD = 0x08    # HazardDetector reported a hazard this cycle
+FLUSH = 0x10     # the retiring instruction redirected the PC
+BRANCH = 0x20
+TAKEN = 0x40
+JUMP = 0x80
+
+def _static_flags(inst):
+    """Flags that depend only on the instruction"""
+    flags = 0
+    if inst.writes_rd and inst.rd:
+        flags |= WRITE
+    if inst.is_load:
+        flags |= LOAD
+    if inst.is_store:
+        flags |= STORE
+    if inst.is_branch:
+        flags |= BRANCH
+    if inst.is_jump:
+        flags |= JUMP | FLUSH
+    return flags
+
+
+class TraceWriter:
+    """Appends fixed-width TRACE_RECORDs to a file.
+
+    Records are packed into a preallocated buffer that is written out
+    every ``buffer_records`` records, so each record costs one
+    ``pack_into``. The header's record count is filled in by ``close``.
+    """
+
+    def __init__(self, path, buffer_records=8192):
+        self.file = open(path, 'wb')
+        self.file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, TRACE_RECORD.size, 0))
+        self.buffer = bytearray(TRACE_RECORD.size * buffer_records)
+        self.offset = 0
+        self.count = 0
+
+    def write(self, *fields):
+        TRACE_RECORD.pack_into(self.buffer, self.offset, *fields)
+        self.offset += TRACE_RECORD.size
+        if self.offset == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.offset])
+        self.count += self.offset // TRACE_RECORD.size
+        self.offset = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.seek(0)
+        self.file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, TRACE_RECORD.size, self.count))
+        self.file.close()
+
+
+class Tracer:
+    """Records one TRACE_RECORD per cycle of a RISCVSimulator to a file.
+
+    Like Profiler it wraps methods on the simulator's own objects while
+    attached (in pipeline mode, ``CPU.fetch``, the last stage of each
+    cycle, after which every latch holds that cycle's state) and removes
+    them on ``detach``, so untraced runs are unaffected. The functional
+    modes write one record per instruction with only the WB PC set; in
+    translated mode runs use the per-instruction closures while tracing.
+    Read traces with trace_reader.TraceReader.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = TraceWriter(path)
+        self._patches = Patches()
+        self._simulator = None
+
+    def attach(self, simulator):
+        if self._simulator is not None:
+            raise ValueError("Tracer is already attached")
+        self._simulator = simulator
+        cpu = simulator.cpu
+        wrap = self._patches.wrap
+        if isinstance(cpu, FunctionalCPU):
+            wrap(cpu, '_translate', lambda translate: self._traced_translate(cpu, translate))
+            if type(cpu).run is not FunctionalCPU.run:
+                wrap(cpu, 'run', lambda run: FunctionalCPU.run.__get__(cpu))
+            self._recompile()
+        else:
+            wrap(cpu, 'fetch', lambda fetch: self._traced_fetch(cpu, simulator.hazard_detector, fetch))
+
+    def detach(self):
+        self._patches.restore()
+        if isinstance(self._simulator.cpu, FunctionalCPU):
+            self._recompile()
+        self._simulator = None
+        self.writer.close()
+
+    def _recompile(self):
+        simulator = self._simulator
+        if simulator.program is not None:
+            simulator.cpu.compile(simulator.program, simulator.memory)
+
+    def _traced_fetch(self, cpu, hazard_detector, fetch):
+        write = self.writer.write
+        if_latch, id_latch, ex_latch, mem_latch, wb_latch = (
+            cpu.if_latch, cpu.id_latch, cpu.ex_latch, cpu.mem_latch, cpu.wb_latch)
+        hazards = [hazard_detector.hazards_detected]
+
+        def traced(program):
+            fetch(program)
+            flags = value = address = mem_value = rd = rs1 = rs2 = 0
+            if wb_latch.valid:
+                inst = wb_latch.instruction
+                flags = _static_flags(inst)
+                rd, rs1, rs2 = inst.rd, inst.rs1, inst.rs2
+                if flags & WRITE:
+                    value = wb_latch.data
+                if flags & (LOAD | STORE):
+                    address = wb_latch.alu_result & MASK32
+                    mem_value = wrap32(wb_latch.data)
+                if flags & BRANCH and wb_latch.data == 1:
+                    flags |= TAKEN | FLUSH
+            detected = hazard_detector.hazards_detected
+            if detected != hazards[0]:
+                hazards[0] = detected
+                flags |= HAZARD
+            write(cpu.cycle,
+                  if_latch.pc & MASK32 if if_latch.valid else NO_PC,
+                  id_latch.pc & MASK32 if id_latch.valid else NO_PC,
+                  ex_latch.pc & MASK32 if ex_latch.valid else NO_PC,
+                  mem_latch.pc & MASK32 if mem_latch.valid else NO_PC,
+                  wb_latch.pc & MASK32 if wb_latch.valid else NO_PC,
+                  value, address, mem_value, rd, rs1, rs2, flags)
+        return traced
+
+    def _traced_translate(self, cpu, translate):
+        write = self.writer.write
+        # Functional engines count cycles only when a run ends
+        cycle = [cpu.cycle]
+
+        def traced_translate(inst, memory_unit):
+            run = translate(inst, memory_unit)
+            regs = cpu.registers
+            rd, rs1, rs2, imm = inst.rd, inst.rs1, inst.rs2, inst.imm
+            static = _static_flags(inst)
+            is_load, is_store = inst.is_load, inst.is_store
+            # Evaluated on the operands, not inferred from the next PC: a
+            # taken branch to pc + 4 still flushes the pipeline
+            taken = BRANCH_OPS[inst.op] if inst.is_branch else None
+
+            def traced(pc):
+                address = mem_value = 0
+                flags = static
+                if is_load or is_store:
+                    address = (regs[rs1] + imm) & MASK32
+                    mem_value = regs[rs2]
+                elif taken is not None and taken(regs[rs1], regs[rs2]):
+                    flags |= TAKEN | FLUSH
+                next_pc = run(pc)
+                if is_load:
+                    mem_value = regs[rd]
+                write(cycle[0], NO_PC, NO_PC, NO_PC, NO_PC, pc & MASK32,
+                      regs[rd] if static & WRITE else 0, address, wrap32(mem_value),
+                      rd, rs1, rs2, flags)
+                cycle[0] += 1
+                return next_pc
+            return traced
+        return traced_translate
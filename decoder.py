@@ -0,0 +1,140 @@
+from instruction import Instruction
+
+
+# (funct3, funct7) -> op for register-register instructions
+R_FUNCTS = {
+    (0, 0x00): 'add', (0, 0x20): 'sub', (1, 0x00): 'sll', (2, 0x00): 'slt',
+    (3, 0x00): 'sltu', (4, 0x00): 'xor', (5, 0x00): 'srl', (5, 0x20): 'sra',
+    (6, 0x00): 'or', (7, 0x00): 'and',
+}
+
+# funct3 -> op for the remaining formats
+I_FUNCTS = {0: 'addi', 2: 'slti', 3: 'sltiu', 4: 'xori', 6: 'ori', 7: 'andi'}
+SHIFT_FUNCTS = {(1, 0x00): 'slli', (5, 0x00): 'srli', (5, 0x20): 'srai'}
+LOAD_FUNCTS = {0: 'lb', 1: 'lh', 2: 'lw', 4: 'lbu', 5: 'lhu'}
+STORE_FUNCTS = {0: 'sb', 1: 'sh', 2: 'sw'}
+BRANCH_FUNCTS = {0: 'beq', 1: 'bne', 4: 'blt', 5: 'bge', 6: 'bltu', 7: 'bgeu'}
+
+
+def _sign_extend(value, bits):
+    if value & (1 << (bits - 1)):
+        return value - (1 << bits)
+    return value
+
+
+class Decoder:
+    """Decodes 32-bit RV32I machine words into Instruction records.
+
+    The ``raw`` text of each decoded instruction is its disassembly in the
+    syntax accepted by Parser.
+    """
+
+    def __init__(self, opcode_unit):
+        self.opcode = opcode_unit
+        opcodes = opcode_unit.opcodes
+        self.major = {name: opcodes[name] for name in ['add', 'addi', 'lw', 'sw', 'beq',
+                                                       'jal', 'jalr', 'lui', 'auipc']}
+
+    def decode(self, word):
+        """Return the Instruction for ``word``, or None if it is not RV32I"""
+        major = word & 0x7F
+        rd = (word >> 7) & 0x1F
+        funct3 = (word >> 12) & 0x7
+        rs1 = (word >> 15) & 0x1F
+        rs2 = (word >> 20) & 0x1F
+        funct7 = word >> 25
+        imm_i = _sign_extend(word >> 20, 12)
+
+        if major == self.major['add']:
+            op = R_FUNCTS.get((funct3, funct7))
+            return op and self._make(op, f"{op} x{rd}, x{rs1}, x{rs2}", rd, rs1, rs2, 0)
+
+        if major == self.major['addi']:
+            if funct3 in (1, 5):
+                op = SHIFT_FUNCTS.get((funct3, funct7))
+                return op and self._make(op, f"{op} x{rd}, x{rs1}, {rs2}", rd, rs1, 0, rs2)
+            op = I_FUNCTS[funct3]
+            return self._make(op, f"{op} x{rd}, x{rs1}, {imm_i}", rd, rs1, 0, imm_i)
+
+        if major == self.major['lw']:
+            op = LOAD_FUNCTS.get(funct3)
+            return op and self._make(op, f"{op} x{rd}, {imm_i}(x{rs1})", rd, rs1, 0, imm_i)
+
+        if major == self.major['sw']:
+            op = STORE_FUNCTS.get(funct3)
+            imm = _sign_extend((funct7 << 5) | rd, 12)
+            return op and self._make(op, f"{op} x{rs2}, {imm}(x{rs1})", 0, rs1, rs2, imm)
+
+        if major == self.major['beq']:
+            op = BRANCH_FUNCTS.get(funct3)
+            imm = _sign_extend(((word >> 31) << 12) | (((word >> 7) & 0x1) << 11) |
+                               (((word >> 25) & 0x3F) << 5) | (((word >> 8) & 0xF) << 1), 13)
+            return op and self._make(op, f"{op} x{rs1}, x{rs2}, {imm}", 0, rs1, rs2, imm)
+
+        if major == self.major['jal']:
+            imm = _sign_extend(((word >> 31) << 20) | (((word >> 12) & 0xFF) << 12) |
+                               (((word >> 20) & 0x1) << 11) | (((word >> 21) & 0x3FF) << 1), 21)
+            return self._make('jal', f"jal x{rd}, {imm}", rd, 0, 0, imm)
+
+        if major == self.major['jalr'] and funct3 == 0:
+            return self._make('jalr', f"jalr x{rd}, x{rs1}, {imm_i}", rd, rs1, 0, imm_i)
+
+        if major in (self.major['lui'], self.major['auipc']):
+            op = 'lui' if major == self.major['lui'] else 'auipc'
+            return self._make(op, f"{op} x{rd}, {word >> 12}", rd, 0, 0, word >> 12)
+
+        return None
+
+    def _make(self, op, raw, rd, rs1, rs2, imm):
+        return Instruction(op, raw, self.opcode.get_instruction_type(op), rd, rs1, rs2, imm)
+
+
+class DecodeCache:
+    """Instructions for a program, decoded at most once per PC.
+
+    Fetches in ``[start, end)`` that miss are decoded from the word in
+    memory and kept, so hot code is only ever decoded on its first fetch.
+    PCs are looked up word-aligned.
+    """
+
+    def __init__(self, memory_unit, start, end, decoder):
+        self.memory = memory_unit
+        self.start = start
+        self.end = end
+        self.decoder = decoder
+        self.entries = {}
+        self.decoded = 0
+
+    @classmethod
+    def from_instructions(cls, instructions, start=0):
+        """Cache pre-filled with already parsed (assembly) instructions"""
+        cache = cls(None, start, start + len(instructions) * 4, None)
+        cache.entries = {start + index * 4: inst for index, inst in enumerate(instructions)}
+        return cache
+
+    def fetch(self, pc):
+        key = pc & ~3
+        try:
+            return self.entries[key]
+        except KeyError:
+            pass
+
+        if self.memory is None or not self.start <= key < self.end:
+            return None
+        inst = self.decoder.decode(self.memory.load(key, 4, False))
+        self.entries[key] = inst
+        self.decoded += 1
+        return inst
+
+    def invalidate(self, start, end):
+        """Forget decoded instructions for words overlapping [start, end)"""
+        if self.memory is None:
+            return  # parsed programs do not live in memory
+        for key in range(start & ~3, end, 4):
+            self.entries.pop(key, None)
+
+    def __contains__(self, pc):
+        return self.start <= pc < self.end
+
+    def __len__(self):
+        return (self.end - self.start) // 4
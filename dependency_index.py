@@ -0,0 +1,162 @@
+import argparse
+import json
+import sys
+
+from decoder import DecodeCache
+from opcodes import Opcode
+from parser import Parser
+
+
+LOAD_USE = 'Load-use data hazard'
+DATA_HAZARD = 'Data hazard (forwarding possible)'
+CONTROL_HAZARD = 'Control hazard (branch/jump)'
+
+
+def _raw_registers(producer, consumer):
+    """Registers ``producer`` writes that ``consumer`` reads"""
+    if producer is None or not producer.writes_rd:
+        return []
+    return [reg for reg in dict.fromkeys((consumer.rs1, consumer.rs2))
+            if reg and reg == producer.rd]
+
+
+class Dependency:
+    """Def-use facts for the instruction at one PC.
+
+    ``producer`` and ``producer2`` are the instructions 1 and 2 words
+    earlier; ``raw1``/``raw2`` the source registers they write. ``hazard``
+    is what HazardDetector reports when ``producer`` is in EX, and
+    ``hazard_alone`` when EX holds a bubble.
+    """
+
+    __slots__ = ('pc', 'instruction', 'producer', 'producer2', 'raw1', 'raw2',
+                 'load_use', 'control', 'hazard', 'hazard_alone')
+
+    def __init__(self, pc, instruction, producer, producer2):
+        self.pc = pc
+        self.instruction = instruction
+        self.producer = producer
+        self.producer2 = producer2
+        self.raw1 = _raw_registers(producer, instruction)
+        self.raw2 = _raw_registers(producer2, instruction)
+        self.load_use = bool(self.raw1) and producer.is_load
+        self.control = instruction.is_branch or instruction.is_jump
+
+        self.hazard_alone = CONTROL_HAZARD if self.control else None
+        if self.raw1:
+            self.hazard = LOAD_USE if self.load_use else DATA_HAZARD
+        else:
+            self.hazard = self.hazard_alone
+
+
+class DependencyIndex:
+    """Def-use index over a program, built once per instruction.
+
+    Entries are computed on first lookup (or all at once by ``build``) and
+    keyed by PC, so the per-cycle hazard check is a dict lookup plus two
+    identity checks. An entry whose instruction no longer matches (code
+    rewritten in memory) is recomputed.
+    """
+
+    def __init__(self, program):
+        self.program = program
+        self.entries = {}
+
+    def lookup(self, pc, instruction=None):
+        entry = self.entries.get(pc)
+        if entry is None or (instruction is not None and entry.instruction is not instruction):
+            entry = self._analyze(pc, instruction)
+        return entry
+
+    def _analyze(self, pc, instruction=None):
+        fetch = self.program.fetch
+        if instruction is None:
+            instruction = fetch(pc)
+            if instruction is None:
+                return None
+        entry = Dependency(pc, instruction, self._fetch(pc - 4), self._fetch(pc - 8))
+        self.entries[pc] = entry
+        return entry
+
+    def _fetch(self, pc):
+        program = self.program
+        return program.fetch(pc) if program.start <= pc < program.end else None
+
+    def build(self):
+        """Analyze every instruction in the program up front"""
+        program = self.program
+        for pc in range(program.start, program.end, 4):
+            self.lookup(pc)
+        return self
+
+    def report(self):
+        """Every potential hazard in the program, without executing it.
+
+        Returns dicts with the consumer's ``pc`` and ``instruction``, the
+        ``kind`` ('load-use', 'raw' or 'control') and, for data hazards,
+        the ``register``, ``distance`` (1 or 2 instructions) and
+        ``producer_pc``. Paths through taken branches are not followed.
+        """
+        hazards = []
+        self.build()
+        for pc in range(self.program.start, self.program.end, 4):
+            entry = self.entries.get(pc)
+            if entry is None:
+                continue
+            raw = entry.instruction.raw
+            for distance, registers, producer in ((1, entry.raw1, entry.producer),
+                                                  (2, entry.raw2, entry.producer2)):
+                for reg in registers:
+                    load_use = distance == 1 and producer.is_load
+                    hazards.append({
+                        'pc': pc,
+                        'instruction': raw,
+                        'kind': 'load-use' if load_use else 'raw',
+                        'register': reg,
+                        'distance': distance,
+                        'producer_pc': pc - 4 * distance,
+                    })
+            if entry.control:
+                hazards.append({'pc': pc, 'instruction': raw, 'kind': 'control'})
+        return hazards
+
+
+def format_report(hazards):
+    lines = []
+    for hazard in hazards:
+        if hazard['kind'] == 'control':
+            detail = 'branch/jump'
+        else:
+            detail = (f"x{hazard['register']} from 0x{hazard['producer_pc']:08x} "
+                      f"(distance {hazard['distance']})")
+        lines.append(f"0x{hazard['pc']:08x}  {hazard['kind']:<9} {hazard['instruction']:<28} {detail}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="List potential RAW, load-use and control hazards in an assembly program")
+    arg_parser.add_argument('program', help="assembly file ('-' for stdin)")
+    arg_parser.add_argument('--json', action='store_true', help="print JSON lines")
+    args = arg_parser.parse_args(argv)
+
+    source = sys.stdin if args.program == '-' else open(args.program)
+    with source:
+        instructions = Parser(Opcode()).load_program(source.read())
+
+    hazards = DependencyIndex(DecodeCache.from_instructions(instructions)).report()
+    if args.json:
+        for hazard in hazards:
+            print(json.dumps(hazard))
+    else:
+        print(format_report(hazards))
+        counts = {}
+        for hazard in hazards:
+            counts[hazard['kind']] = counts.get(hazard['kind'], 0) + 1
+        summary = ', '.join(f"{count} {kind}" for kind, count in sorted(counts.items()))
+        print(f"{len(instructions)} instructions: {summary or 'no hazards'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
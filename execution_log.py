@@ -0,0 +1,139 @@
+import json
+from collections import deque
+from itertools import islice
+
+
+MESSAGE_TYPES = ['cycle', 'hazard', 'forward', 'info']
+
+# Event code -> (message type, format template). The bare type names are
+# free-text codes whose only argument is the message itself.
+EVENTS = {
+    'cycle': ('cycle', '{}'),
+    'hazard': ('hazard', '{}'),
+    'forward': ('forward', '{}'),
+    'info': ('info', '{}'),
+    'cycle_completed': ('cycle', 'Cycle {} completed'),
+    'hazard_detected': ('hazard', 'Hazard detected: {}'),
+    'branch_taken': ('forward', 'Branch taken to PC: {}'),
+    'jump': ('forward', 'Jump to PC: {}'),
+    'jump_register': ('forward', 'Jump register to PC: {}'),
+    'program_completed': ('info', 'Program execution completed'),
+    'cpu_reset': ('info', 'CPU reset'),
+}
+
+DEFAULT_MAX_ENTRIES = 10000
+
+# Marks configure() arguments that were not passed (None is meaningful)
+_UNCHANGED = object()
+
+
+class ExecutionLog:
+    """Execution log storing raw events and formatting them only when read.
+
+    Events are kept as ``(cycle, code, args)`` tuples in a ring buffer of
+    ``max_entries`` (``None`` keeps everything, ``0`` keeps nothing in
+    memory). Each message type can be switched off, in which case
+    ``record`` returns immediately. An optional sink (path or text file)
+    receives events as JSON lines, written ``batch_size`` at a time.
+
+    Reading behaves like the old list of dicts: ``log[-1]['message']``.
+    ``recorded`` counts every event ever kept, so readers can tell how many
+    are new since they last looked.
+    """
+
+    def __init__(self, levels=None, max_entries=DEFAULT_MAX_ENTRIES, sink=None, batch_size=1000):
+        self.levels = {msg_type: True for msg_type in MESSAGE_TYPES}
+        self._enabled = {}
+        self.entries = deque()
+        self.max_entries = None
+        self.batch_size = batch_size
+        self._sink = None
+        self._owns_sink = False
+        self._pending = []
+        self.recorded = 0
+
+        self.configure(levels=levels, max_entries=max_entries, sink=sink)
+
+    def configure(self, levels=None, max_entries=_UNCHANGED, sink=None, batch_size=None):
+        """Change verbosity, buffer size and sink; kept entries are preserved"""
+        if levels is not None:
+            for msg_type in MESSAGE_TYPES:
+                self.levels[msg_type] = msg_type in levels
+        self._enabled = {code: self.levels[msg_type] for code, (msg_type, _) in EVENTS.items()}
+
+        if max_entries is not _UNCHANGED and max_entries != self.max_entries:
+            self.max_entries = max_entries
+            self.entries = deque(self.entries, maxlen=max_entries)
+
+        if batch_size is not None:
+            self.batch_size = batch_size
+
+        if sink is not None:
+            self.close()
+            if isinstance(sink, str):
+                self._sink = open(sink, 'w')
+                self._owns_sink = True
+            else:
+                self._sink = sink
+                self._owns_sink = False
+
+    def set_level(self, msg_type, enabled):
+        self.levels[msg_type] = enabled
+        for code, (event_type, _) in EVENTS.items():
+            if event_type == msg_type:
+                self._enabled[code] = enabled
+
+    def record(self, cycle, code, *args):
+        if not self._enabled[code]:
+            return
+
+        event = (cycle, code, args)
+        self.entries.append(event)
+        self.recorded += 1
+        if self._sink is not None:
+            self._pending.append(event)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if self._sink is None or not self._pending:
+            return
+        self._sink.write(''.join(json.dumps(self.format_event(event)) + '\n'
+                                 for event in self._pending))
+        self._sink.flush()
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        if self._owns_sink:
+            self._sink.close()
+        self._sink = None
+        self._owns_sink = False
+
+    def clear(self):
+        self.flush()
+        self.entries.clear()
+
+    @staticmethod
+    def format_event(event):
+        cycle, code, args = event
+        msg_type, template = EVENTS[code]
+        return {
+            'cycle': cycle,
+            'message': template.format(*args),
+            'type': msg_type
+        }
+
+    def tail(self, count):
+        """The last ``count`` kept events, formatted, oldest first"""
+        events = list(islice(reversed(self.entries), count))
+        return [self.format_event(event) for event in reversed(events)]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.format_event(self.entries[index])
+
+    def __iter__(self):
+        return (self.format_event(event) for event in self.entries)
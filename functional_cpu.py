@@ -0,0 +1,204 @@
+import operator
+
+from bits import MASK32, SIGN_BIT
+from execution_log import ExecutionLog
+from latch import make_pipeline
+from opcodes import OP_JAL, OP_JALR
+from register_file import make_registers
+
+
+
+# Branch conditions as C-level callables where possible (faster than the
+# generic ALU handler, which also needs imm and pc)
+BRANCH_OPS = {
+    'beq': operator.eq,
+    'bne': operator.ne,
+    'blt': operator.lt,
+    'bge': operator.ge,
+    'bltu': lambda a, b: (a & MASK32) < (b & MASK32),
+    'bgeu': lambda a, b: (a & MASK32) >= (b & MASK32),
+}
+
+
+class FunctionalCPU:
+    """ISA-level engine: executes one instruction per call with no pipeline.
+
+    Architectural results match CPU (same ALU and Memory semantics), but each
+    instruction is translated on first execution into a closure, cached by
+    PC, that updates the register file directly and returns the next PC.
+    There is no timing model, so ``cycle`` advances once per retired
+    instruction.
+    """
+
+    def __init__(self):
+        self.registers = make_registers()
+        self.pc = 0
+        self.cycle = 0
+        self.instructions_executed = 0
+
+        # Always empty; kept so the GUI and simulator can treat both engines alike
+        self.pipeline = make_pipeline()
+
+        self.execution_log = ExecutionLog()
+        self.is_running = False
+
+        self._compiled_for = (None, None, None)
+        self._ops = {}
+
+    def compile(self, program, memory_unit):
+        """Start a fresh PC -> closure table; closures are built on first use"""
+        self._ops = {}
+        self._compiled_for = (program, memory_unit, self.registers)
+
+    def _translate_at(self, pc, program, memory_unit):
+        inst = program.fetch(pc)
+        if inst is None:
+            return None
+        op = self._ops[pc] = self._translate(inst, memory_unit)
+        return op
+
+    def _translate(self, inst, memory_unit):
+        regs = self.registers
+        rd, rs1, rs2, imm = inst.rd, inst.rs1, inst.rs2, inst.imm
+        handler = inst.handler
+
+        if inst.is_load:
+            load = memory_unit.load
+            size, signed = inst.mem_size, inst.mem_signed
+
+            # Memory wraps the address itself
+            def run(pc):
+                data = load(regs[rs1] + imm, size, signed)
+                if rd:
+                    regs[rd] = data
+                return pc + 4
+        elif inst.is_store:
+            store = memory_unit.store
+            size = inst.mem_size
+
+            def run(pc):
+                store(regs[rs1] + imm, regs[rs2], size)
+                return pc + 4
+        elif inst.is_branch:
+            taken = BRANCH_OPS[inst.op]
+
+            def run(pc):
+                return pc + imm if taken(regs[rs1], regs[rs2]) else pc + 4
+        elif inst.op_id == OP_JAL:
+            def run(pc):
+                if rd:
+                    regs[rd] = ((pc + 4 + SIGN_BIT) & MASK32) - SIGN_BIT
+                return pc + imm
+        elif inst.op_id == OP_JALR:
+            def run(pc):
+                target = (regs[rs1] + imm) & ~1
+                if rd:
+                    regs[rd] = ((pc + 4 + SIGN_BIT) & MASK32) - SIGN_BIT
+                return target
+        elif not inst.writes_rd:
+            return _next
+        else:
+            def run(pc):
+                regs[rd] = ((handler(regs[rs1], regs[rs2], imm, pc) + SIGN_BIT) & MASK32) - SIGN_BIT
+                return pc + 4
+
+        return run
+
+    def invalidate(self, start, end):
+        """Drop translations of code overlapping [start, end)"""
+        for pc in range(start - 3, end):
+            self._ops.pop(pc, None)
+        program = self._compiled_for[0]
+        if program is not None:
+            program.invalidate(start, end)
+
+    def _ensure_compiled(self, components):
+        program = components['program']
+        memory_unit = components['memory']
+        compiled_program, compiled_memory, compiled_registers = self._compiled_for
+        if (compiled_program is not program or compiled_memory is not memory_unit
+                or compiled_registers is not self.registers):
+            self.compile(program, memory_unit)
+        return self._ops
+
+    def step(self, components):
+        """Execute one instruction"""
+        ops = self._ensure_compiled(components)
+        program = components['program']
+        while program.start <= self.pc < program.end:
+            op = ops.get(self.pc) or self._translate_at(self.pc, program, components['memory'])
+            if op is None:
+                # Not an instruction: skipped like a fetch bubble in CPU
+                self.pc += 4
+                continue
+
+            self.pc = op(self.pc)
+            self.cycle += 1
+            self.instructions_executed += 1
+            return True
+
+        self.execution_log.record(self.cycle, 'program_completed')
+        return False
+
+    def run(self, components, max_cycles=None, max_instructions=None, until_pc=None):
+        """Execute until the PC leaves the program, reaches until_pc or a budget runs out"""
+        ops = self._ensure_compiled(components)
+        program = components['program']
+        memory_unit = components['memory']
+        start, end = program.start, program.end
+        budget = self._budget(max_cycles, max_instructions)
+        until = -1 if until_pc is None else until_pc
+        pc = self.pc
+        count = 0
+
+        while start <= pc < end and count != budget and pc != until:
+            try:
+                op = ops[pc]
+            except KeyError:
+                op = self._translate_at(pc, program, memory_unit)
+                if op is None:
+                    pc += 4
+                    continue
+            pc = op(pc)
+            count += 1
+
+        self.pc = pc
+        self.cycle += count
+        self.instructions_executed += count
+        return self._stop_reason(start, end, until, count, max_cycles)
+
+    @staticmethod
+    def _budget(max_cycles, max_instructions):
+        # One instruction per cycle, so both limits bound the same count
+        limits = [limit for limit in (max_cycles, max_instructions) if limit is not None]
+        return min(limits) if limits else -1
+
+    def _stop_reason(self, start, end, until, count, max_cycles):
+        if not start <= self.pc < end:
+            self.execution_log.record(self.cycle, 'program_completed')
+            return 'completed'
+        if self.pc == until:
+            return 'until_pc'
+        return 'max_cycles' if count == max_cycles else 'max_instructions'
+
+    def reset(self):
+        # Clear in place: compiled closures hold a reference to this list
+        self.registers[:] = make_registers()
+        self.pc = 0
+        self.cycle = 0
+        self.instructions_executed = 0
+        self.execution_log.clear()
+
+        self.execution_log.record(self.cycle, 'cpu_reset')
+
+    def log_message(self, message, msg_type='info'):
+        self.execution_log.record(self.cycle, msg_type, message)
+
+    def get_cpi(self):
+        if self.instructions_executed > 0:
+            return self.cycle / self.instructions_executed
+        return 0.0
+
+
+def _next(pc):
+    return pc + 4
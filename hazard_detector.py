@@ -1,39 +1,58 @@
+from dependency_index import DependencyIndex
+
+
 class HazardDetector:
     def __init__(self):
         self.hazards_detected = 0
+        self.index = None
+
+    def set_program(self, program):
+        """Precompute def-use facts for ``program`` (None to drop them)"""
+        self.index = None if program is None else DependencyIndex(program)
 
     def detect_hazards(self, pipeline):
-        id_inst = pipeline['ID'].get('instruction')
-        if not id_inst:
+        id_latch = pipeline['ID']
+        if not id_latch.valid:
             return None
-
-
-        if pipeline['EX'].get('instruction'):
-            ex_rd = pipeline['EX']['rd']
-            if ex_rd != 0 and (ex_rd == pipeline['ID']['rs1'] or
-                               ex_rd == pipeline['ID']['rs2']):
-                if pipeline['EX']['instruction']['op'].startswith('l'):
+        id_inst = id_latch.instruction
+        ex_latch = pipeline['EX']
+
+        # Fast path: EX holds a bubble or the instruction just before ID
+        index = self.index
+        if index is not None:
+            entry = index.entries.get(id_latch.pc)
+            if entry is None or entry.instruction is not id_inst:
+                entry = index.lookup(id_latch.pc, id_inst)
+            if not ex_latch.valid:
+                return entry.hazard_alone
+            if ex_latch.instruction is entry.producer:
+                return entry.hazard
+
+        ex_inst = ex_latch.instruction
+        if ex_latch.valid and ex_inst.writes_rd:
+            ex_rd = ex_inst.rd
+            if ex_rd == id_inst.rs1 or ex_rd == id_inst.rs2:
+                if ex_inst.is_load:
                     return 'Load-use data hazard'
                 return 'Data hazard (forwarding possible)'
 
 
-        if id_inst['op'].startswith('b') or id_inst['op'] in ['jal', 'jalr']:
+        if id_inst.is_branch or id_inst.is_jump:
             return 'Control hazard (branch/jump)'
 
         return None
 
-    def get_operands_with_forwarding(self, inst, ex_stage, mem_stage, registers):
-
-        op1 = inst['rs1Val']
-        op2 = inst['rs2Val']
-
-
-        if ex_stage.get('instruction') and ex_stage['rd'] == inst['rs1'] and ex_stage['rd'] != 0:
-            op1 = ex_stage['aluResult']
-
-        if ex_stage.get('instruction') and ex_stage['rd'] == inst['rs2'] and ex_stage['rd'] != 0:
-            op2 = ex_stage['aluResult']
+    def get_operands_with_forwarding(self, inst, mem_stage, wb_stage, registers):
 
+        op1 = inst.rs1_val
+        op2 = inst.rs2_val
 
+        # Older producer first so the nearer one wins
+        for stage in (wb_stage, mem_stage):
+            if stage.valid and stage.instruction.writes_rd:
+                if stage.rd == inst.rs1:
+                    op1 = stage.data
+                if stage.rd == inst.rs2:
+                    op2 = stage.data
 
         return op1, op2
\ No newline at end of file
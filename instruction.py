@@ -0,0 +1,40 @@
+from alu import HANDLERS
+from memory import ACCESS_WIDTHS
+from opcodes import OP_IDS
+
+
+LOAD_OPS = ['lw', 'lb', 'lh', 'lbu', 'lhu']
+
+
+class Instruction:
+    """Predecoded instruction produced by the parser.
+
+    Everything the pipeline needs per cycle is resolved once at load time:
+    an integer opcode ID, the instruction-class flags and the ALU handler,
+    so no stage has to compare opcode strings.
+    """
+
+    __slots__ = ('op', 'op_id', 'raw', 'type', 'rd', 'rs1', 'rs2', 'imm',
+                 'is_load', 'is_store', 'is_branch', 'is_jump', 'writes_rd', 'handler',
+                 'mem_size', 'mem_signed')
+
+    def __init__(self, op, raw, inst_type, rd=0, rs1=0, rs2=0, imm=0):
+        self.op = op
+        self.op_id = OP_IDS[op]
+        self.raw = raw
+        self.type = inst_type
+        self.rd = rd
+        self.rs1 = rs1
+        self.rs2 = rs2
+        self.imm = imm
+
+        self.is_load = op in LOAD_OPS
+        self.is_store = inst_type == 'S'
+        self.is_branch = inst_type == 'B'
+        self.is_jump = op in ['jal', 'jalr']
+        self.writes_rd = rd != 0 and inst_type not in ['S', 'B']
+        self.handler = HANDLERS[self.op_id]
+        self.mem_size, self.mem_signed = ACCESS_WIDTHS.get(op, (0, False))
+
+    def __repr__(self):
+        return f"Instruction({self.raw!r})"
@@ -0,0 +1,42 @@
+_MISSING = object()
+
+
+class Patches:
+    """Wrappers one instrument (Profiler, Tracer) installs on instance attributes.
+
+    ``wrap`` takes a factory that builds the wrapper around the current
+    attribute. Several instruments may wrap the same attribute; every
+    factory is kept, oldest first, so ``restore`` can remove one
+    instrument's wrappers in any order and rebuild the others over the
+    attribute as it was before anything was wrapped.
+    """
+
+    # (id(target), name) -> (target, original instance attribute or _MISSING,
+    # [(owner, factory), ...])
+    _chains = {}
+
+    def __init__(self):
+        self._installed = []
+
+    def wrap(self, target, name, factory):
+        key = (id(target), name)
+        chain = Patches._chains.get(key)
+        if chain is None:
+            chain = Patches._chains[key] = (target, target.__dict__.get(name, _MISSING), [])
+        chain[2].append((self, factory))
+        setattr(target, name, factory(getattr(target, name)))
+        self._installed.append((key, name))
+
+    def restore(self):
+        for key, name in dict.fromkeys(reversed(self._installed)):
+            target, original, layers = Patches._chains[key]
+            layers[:] = [(owner, factory) for owner, factory in layers if owner is not self]
+            if original is _MISSING:
+                target.__dict__.pop(name, None)
+            else:
+                setattr(target, name, original)
+            for _, factory in layers:
+                setattr(target, name, factory(getattr(target, name)))
+            if not layers:
+                del Patches._chains[key]
+        self._installed = []
@@ -0,0 +1,465 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from simulator import RISCVSimulator
+from cli import parse_dump, resolve_address, dump_memory
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Longest request line accepted (a whole program travels in one line)
+MAX_LINE = 1 << 24
+
+JOB_OPS = ('run', 'load_program')
+
+# Job fields that must be a non-negative integer when given
+COUNT_FIELDS = ('max_cycles', 'max_instructions', 'progress')
+
+
+def validate_job(request):
+    """Raise ValueError if a job request cannot be run as given (checked
+    before it is queued, so a bad limit can never leave a worker
+    running unbounded)"""
+    mode = request.get('mode', 'pipeline')
+    if mode not in RISCVSimulator.MODES:
+        raise ValueError(f"Unknown execution mode: {mode!r}")
+    if not isinstance(request.get('program'), str):
+        raise ValueError("Job needs the program source as a string")
+    for field in COUNT_FIELDS:
+        value = request.get(field)
+        if value is not None and (type(value) is not int or value < 0):
+            raise ValueError(f"{field} must be a non-negative integer, got {value!r}")
+    until_pc = request.get('until_pc')
+    if until_pc is not None and not (isinstance(until_pc, str)
+                                     or (type(until_pc) is int and until_pc >= 0)):
+        raise ValueError(f"until_pc must be an address or a label, got {until_pc!r}")
+
+
+def execute_job(simulators, request):
+    """Run one job on a reused simulator, yielding the messages to send back.
+
+    ``simulators`` holds one RISCVSimulator per mode, created on first use
+    and reset after loading each later job's program. A 'run' job yields a 'progress'
+    message every ``progress`` cycles (if given) and then its 'result'.
+    """
+    validate_job(request)
+    mode = request.get('mode', 'pipeline')
+    sim = simulators.get(mode)
+    if sim is None:
+        sim = simulators[mode] = RISCVSimulator(mode)
+        sim.configure_log(levels=[], max_entries=0)
+        count = sim.load_program(request['program'])
+    else:
+        # Loaded first, so the reset leaves memory holding only this program's .data
+        count = sim.load_program(request['program'])
+        sim.reset()
+
+    if request.get('op', 'run') == 'load_program':
+        yield {'event': 'result', 'instructions': count, 'labels': sim.labels}
+        return
+
+    max_cycles = request.get('max_cycles')
+    max_instructions = request.get('max_instructions')
+    until_pc = request.get('until_pc')
+    if until_pc is not None:
+        until_pc = resolve_address(sim, str(until_pc))
+    progress = request.get('progress')
+
+    if not progress:
+        run = sim.run(max_cycles, max_instructions, until_pc)
+    else:
+        # Run in slices, reporting after each
+        remaining = max_cycles
+        while True:
+            budget = progress if remaining is None else min(progress, remaining)
+            instructions_left = (None if max_instructions is None
+                                 else max_instructions - sim.instructions_executed)
+            run = sim.run(budget, instructions_left, until_pc)
+            if run.stop_reason != 'max_cycles':
+                break
+            if remaining is not None:
+                remaining -= budget
+                if remaining <= 0:
+                    break
+            yield {'event': 'progress', 'cycles': run.cycles, 'instructions': run.instructions,
+                   'pc': run.pc}
+
+    result = {'event': 'result', **run.to_dict()}
+    if request.get('registers', True):
+        result['registers'] = list(sim.registers)
+    dumps = []
+    for text in request.get('dump', []):
+        location, words = parse_dump(str(text))
+        address = resolve_address(sim, location)
+        dumps.append({'address': address, 'words': dump_memory(sim, address, words)})
+    if dumps:
+        result['memory'] = dumps
+    yield result
+
+
+def _worker_main(conn):
+    """Worker process: executes jobs received on ``conn`` until it gets None"""
+    simulators = {}
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        try:
+            for message in execute_job(simulators, request):
+                conn.send(message)
+        except Exception as e:
+            # The simulator may be mid-program; start the next job afresh
+            simulators.pop(request.get('mode', 'pipeline'), None)
+            conn.send({'event': 'error', 'error': f"{type(e).__name__}: {e}"})
+    conn.close()
+
+
+class Worker:
+    """A warm worker process and the server's end of its pipe"""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def stop(self, timeout=5):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class Connection:
+    """A client connection; it is closed once the client has finished
+    sending and every job it submitted has been answered"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.ids = itertools.count()
+
+    async def send(self, message):
+        if self.writer.is_closing():
+            return  # client went away; the job still runs to completion
+        try:
+            self.writer.write(json.dumps(message).encode() + b'\n')
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+
+
+class Job:
+    def __init__(self, request, connection):
+        self.request = request
+        self.connection = connection
+        self.id = request.get('id', next(connection.ids))
+        self.submitted = time.perf_counter()
+
+    async def send(self, message):
+        await self.connection.send({'id': self.id, **message})
+
+
+class JobServer:
+    """Line-delimited JSON simulation server over TCP or a Unix socket.
+
+    Each request line is a job ``{"op": "run" | "load_program",
+    "program": SOURCE, ...}`` (see execute_job for the options) or
+    ``{"op": "stats"}``. Jobs wait in a queue of ``queue_size``; while it
+    is full the server stops reading from connections, so clients are
+    slowed down instead of jobs piling up. ``workers`` processes, started
+    once, take jobs from the queue and keep their simulators between
+    jobs, so a job pays neither process start-up nor import cost.
+
+    Every reply carries the job's ``id`` (from the request, or numbered
+    per connection) and an ``event``: 'progress', 'result' or 'error'.
+    Replies to different jobs on one connection may interleave.
+    """
+
+    def __init__(self, workers=None, queue_size=64):
+        if queue_size < 1:
+            raise ValueError("Queue size must be at least 1")
+        self.worker_count = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.context = multiprocessing.get_context()
+        self.workers = []
+        self.queue = None
+        self.server = None
+        self.tasks = []
+        self.executor = None
+        self.stats = {'submitted': 0, 'completed': 0, 'errors': 0, 'restarts': 0}
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        """Start the workers and listen on ``path`` (a Unix socket) or host:port"""
+        self.queue = asyncio.Queue(self.queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=self.worker_count)
+        self.workers = [Worker(self.context) for _ in range(self.worker_count)]
+        self.tasks = [asyncio.create_task(self._dispatch(index)) for index in range(self.worker_count)]
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path, limit=MAX_LINE)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port, limit=MAX_LINE)
+        return self.server
+
+    async def serve_forever(self):
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, worker.stop)
+                               for worker in self.workers))
+        self.executor.shutdown()
+        self.tasks = []
+        self.workers = []
+
+    def get_stats(self):
+        return {**self.stats, 'queued': self.queue.qsize(), 'queue_size': self.queue_size,
+                'workers': self.worker_count}
+
+    async def _handle(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break  # line over MAX_LINE or connection reset
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    await connection.send({'id': None, 'event': 'error', 'error': f"Bad request: {e}"})
+                    continue
+
+                op = request.get('op', 'run')
+                if op == 'stats':
+                    await connection.send({'id': request.get('id'), 'event': 'result',
+                                           **self.get_stats()})
+                    continue
+                if op not in JOB_OPS:
+                    await connection.send({'id': request.get('id'), 'event': 'error',
+                                           'error': f"Unknown op {op!r}"})
+                    continue
+                try:
+                    validate_job(request)
+                except ValueError as e:
+                    await connection.send({'id': request.get('id'), 'event': 'error',
+                                           'error': f"Bad request: {e}"})
+                    continue
+
+                connection.pending += 1
+                connection.idle.clear()
+                self.stats['submitted'] += 1
+                # Blocks while the queue is full (back-pressure)
+                await self.queue.put(Job(request, connection))
+            await connection.idle.wait()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, index):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            worker = self.workers[index]
+            try:
+                await loop.run_in_executor(self.executor, worker.conn.send, job.request)
+                while True:
+                    message = await loop.run_in_executor(self.executor, worker.conn.recv)
+                    if message['event'] == 'result':
+                        message['elapsed'] = time.perf_counter() - job.submitted
+                    await job.send(message)
+                    if message['event'] != 'progress':
+                        break
+                self.stats['completed' if message['event'] == 'result' else 'errors'] += 1
+            except (EOFError, OSError):
+                # The worker died mid-job; replace it
+                self.stats['errors'] += 1
+                self.stats['restarts'] += 1
+                await job.send({'event': 'error', 'error': "Worker process exited"})
+                worker.process.join(0)
+                worker.conn.close()
+                self.workers[index] = Worker(self.context)
+            finally:
+                connection = job.connection
+                connection.pending -= 1
+                if not connection.pending:
+                    connection.idle.set()
+
+
+class JobClient:
+    """Client for JobServer running one job at a time on its connection"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count()
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=MAX_LINE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+        return cls(reader, writer)
+
+    async def submit(self, request, on_progress=None):
+        """Send one job and return its 'result' or 'error' message; progress
+        messages are passed to ``on_progress``"""
+        request = {**request, 'id': next(self.ids)}
+        self.writer.write(json.dumps(request).encode() + b'\n')
+        await self.writer.drain()
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError("Server closed the connection")
+            message = json.loads(line)
+            if message.get('id') != request['id']:
+                continue
+            if message['event'] != 'progress':
+                return message
+            if on_progress is not None:
+                on_progress(message)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+async def load_test(request, jobs=1000, concurrency=32, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                    path=None):
+    """Submit ``jobs`` copies of ``request`` from ``concurrency`` clients, each
+    waiting for one job's result before sending its next, and report
+    throughput and latency"""
+    latencies = []
+    errors = 0
+
+    async def client(count):
+        nonlocal errors
+        connection = await JobClient.connect(host, port, path)
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                reply = await connection.submit(request)
+                latencies.append(time.perf_counter() - started)
+                errors += reply['event'] == 'error'
+        finally:
+            await connection.close()
+
+    shares = [jobs // concurrency + (i < jobs % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*(client(count) for count in shares if count))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'jobs': len(latencies),
+        'errors': errors,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_p50': percentile(latencies, 0.50),
+        'latency_p99': percentile(latencies, 0.99),
+        'latency_max': latencies[-1] if latencies else 0.0,
+    }
+
+
+def format_load(report):
+    return (f"{report['jobs']} jobs ({report['errors']} errors) from {report['concurrency']} "
+            f"clients in {report['seconds']:.2f}s: {report['throughput']:,.0f} jobs/s, "
+            f"p50 {report['latency_p50'] * 1000:.1f} ms, p99 {report['latency_p99'] * 1000:.1f} ms, "
+            f"max {report['latency_max'] * 1000:.1f} ms")
+
+
+async def serve(args):
+    server = JobServer(args.workers, args.queue_size)
+    await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"serving on {where} with {server.worker_count} workers", file=sys.stderr)
+    await server.serve_forever()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Simulation job server and load generator")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="run the job server")
+    serve_parser.add_argument('-j', '--workers', type=int, default=None,
+                              help="worker processes (default: CPU count)")
+    serve_parser.add_argument('--queue-size', type=int, default=64,
+                              help="jobs waiting for a worker before clients are slowed down")
+
+    load_parser = commands.add_parser('load', help="measure a running server's throughput and latency")
+    load_parser.add_argument('--program', default=None,
+                             help="assembly file to submit (default: a small counted loop)")
+    load_parser.add_argument('--mode', choices=list(RISCVSimulator.MODES), default='pipeline')
+    load_parser.add_argument('-n', '--jobs', type=int, default=1000)
+    load_parser.add_argument('-c', '--concurrency', type=int, default=32)
+    load_parser.add_argument('--json', action='store_true', help="print the report as JSON")
+
+    for sub in (serve_parser, load_parser):
+        sub.add_argument('--host', default=DEFAULT_HOST)
+        sub.add_argument('--port', type=int, default=DEFAULT_PORT)
+        sub.add_argument('--unix', metavar='PATH', default=None, help="use a Unix socket instead of TCP")
+    args = arg_parser.parse_args(argv)
+
+    try:
+        if args.command == 'serve':
+            asyncio.run(serve(args))
+            return 0
+
+        if args.program:
+            with open(args.program) as f:
+                source = f.read()
+        else:
+            from benchmark import workload_source
+            source = workload_source('counted_loop', scale=0.001)
+        request = {'op': 'run', 'program': source, 'mode': args.mode, 'registers': False}
+        report = asyncio.run(load_test(request, args.jobs, args.concurrency, args.host, args.port,
+                                       args.unix))
+    except KeyboardInterrupt:
+        return 0
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(report) if args.json else format_load(report))
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+class Latch:
+    """Pipeline register between two stages, reused every cycle.
+
+    All five stages share one schema; ``valid`` says whether the latch holds
+    an instruction this cycle (a bubble otherwise). Fields are overwritten
+    in place so stepping the pipeline allocates nothing. Item access is
+    read-only and accepts the old dict keys ('aluResult', 'rs1Val', ...).
+    """
+
+    __slots__ = ('valid', 'instruction', 'pc', 'rd', 'rs1', 'rs2', 'imm',
+                 'rs1_val', 'rs2_val', 'alu_result', 'data')
+
+    KEY_ALIASES = {
+        'rs1Val': 'rs1_val',
+        'rs2Val': 'rs2_val',
+        'aluResult': 'alu_result',
+    }
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.valid = False
+        self.instruction = None
+        self.pc = 0
+        self.rd = 0
+        self.rs1 = 0
+        self.rs2 = 0
+        self.imm = 0
+        self.rs1_val = 0
+        self.rs2_val = 0
+        self.alu_result = 0
+        self.data = 0
+
+    def copy_from(self, other):
+        self.valid = other.valid
+        self.instruction = other.instruction
+        self.pc = other.pc
+        self.rd = other.rd
+        self.rs1 = other.rs1
+        self.rs2 = other.rs2
+        self.imm = other.imm
+        self.rs1_val = other.rs1_val
+        self.rs2_val = other.rs2_val
+        self.alu_result = other.alu_result
+        self.data = other.data
+
+    def get_state(self):
+        """Field values other than the instruction, as a tuple"""
+        return (self.valid, self.pc, self.rd, self.rs1, self.rs2, self.imm,
+                self.rs1_val, self.rs2_val, self.alu_result, self.data)
+
+    def set_state(self, state, instruction):
+        (self.valid, self.pc, self.rd, self.rs1, self.rs2, self.imm,
+         self.rs1_val, self.rs2_val, self.alu_result, self.data) = state
+        self.instruction = instruction
+
+    def __getitem__(self, key):
+        if key == 'instruction':
+            return self.instruction if self.valid else None
+        try:
+            return getattr(self, self.KEY_ALIASES.get(key, key))
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        if not self.valid:
+            return 'Latch(bubble)'
+        return f"Latch({self.instruction.raw!r}, pc={self.pc})"
+
+
+STAGES = ['IF', 'ID', 'EX', 'MEM', 'WB']
+
+
+def make_pipeline():
+    return {stage: Latch() for stage in STAGES}
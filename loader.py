@@ -0,0 +1,88 @@
+import mmap
+import os
+import struct
+
+from memory import PAGE_BITS
+
+
+ELF_MAGIC = b'\x7fELF'
+ELFCLASS32 = 1
+ELFDATA2LSB = 1
+EM_RISCV = 243
+PT_LOAD = 1
+PF_X = 1
+
+# e_type .. e_shstrndx, following the 16-byte e_ident
+ELF32_HEADER = struct.Struct('<HHIIIIIHHHHHH')
+# p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align
+ELF32_PHDR = struct.Struct('<IIIIIIII')
+
+
+class Loader:
+    """Maps program images into Memory.
+
+    ``load`` accepts an ELF32 little-endian RISC-V executable or a raw flat
+    binary, reading the file through ``mmap`` so large images are copied
+    straight into memory pages. It returns ``(entry, text_start, text_end)``:
+    the initial PC and the address range instructions may be fetched from.
+    """
+
+    def __init__(self, memory_unit):
+        self.memory = memory_unit
+
+    def load(self, path, base=0):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"{path} is an empty binary")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+                view = memoryview(image)
+                try:
+                    if image[:4] == ELF_MAGIC:
+                        return self.load_elf(view)
+                    return self.load_flat(view, base)
+                finally:
+                    view.release()
+
+    def load_flat(self, data, base=0):
+        self.memory.write_bytes(base, data)
+        return base, base, base + len(data)
+
+    def load_elf(self, data):
+        ident = bytes(data[:16])
+        if ident[:4] != ELF_MAGIC:
+            raise ValueError("Not an ELF file")
+        if ident[4] != ELFCLASS32 or ident[5] != ELFDATA2LSB:
+            raise ValueError("Only 32-bit little-endian ELF files are supported")
+
+        (_, machine, _, entry, phoff, _, _, _, phentsize, phnum,
+         _, _, _) = ELF32_HEADER.unpack_from(data, 16)
+        if machine != EM_RISCV:
+            raise ValueError(f"ELF machine {machine} is not RISC-V")
+
+        text_start, text_end = None, None
+        for index in range(phnum):
+            (p_type, offset, vaddr, _, filesz, memsz,
+             flags, _) = ELF32_PHDR.unpack_from(data, phoff + index * phentsize)
+            if p_type != PT_LOAD:
+                continue
+
+            self.memory.write_bytes(vaddr, data[offset:offset + filesz])
+            if memsz > filesz:
+                self.zero(vaddr + filesz, vaddr + memsz)
+            if flags & PF_X:
+                text_start = vaddr if text_start is None else min(text_start, vaddr)
+                text_end = vaddr + memsz if text_end is None else max(text_end, vaddr + memsz)
+
+        if text_start is None:
+            raise ValueError("ELF file has no executable segment")
+        return entry, text_start, text_end
+
+    def zero(self, start, end):
+        """Clear [start, end) (a segment's .bss); untouched pages already
+        read as zero, so only allocated ones are written"""
+        address = start
+        while address < end:
+            chunk = min(end, ((address >> PAGE_BITS) + 1) << PAGE_BITS) - address
+            if address >> PAGE_BITS in self.memory.pages:
+                self.memory.write_bytes(address, bytes(chunk))
+            address += chunk
@@ -0,0 +1,283 @@
+import numpy as np
+
+from bits import MASK32, wrap32
+from opcodes import Opcode, OP_JAL, OP_JALR
+from parser import Parser
+
+
+# Memory is little-endian whatever the host, so byte views match Memory
+WORD = np.dtype('<i4')
+
+
+def _unsigned(values):
+    return values.view(np.uint32)
+
+
+# Vectorised ALU results for register (a, b) and immediate (a, imm) forms.
+# int32 arithmetic wraps like ALU.execute; shifts go through uint32 where
+# the sign bit must not be smeared.
+VECTOR_OPS = {
+    'add': lambda a, b: a + b,
+    'sub': lambda a, b: a - b,
+    'and': lambda a, b: a & b,
+    'or': lambda a, b: a | b,
+    'xor': lambda a, b: a ^ b,
+    'sll': lambda a, b: (_unsigned(a) << _unsigned(b & 31)).view(np.int32),
+    'srl': lambda a, b: (_unsigned(a) >> _unsigned(b & 31)).view(np.int32),
+    'sra': lambda a, b: a >> (b & 31),
+    'slt': lambda a, b: (a < b).astype(np.int32),
+    'sltu': lambda a, b: (_unsigned(a) < _unsigned(b)).astype(np.int32),
+}
+
+IMMEDIATE_OPS = {'addi': 'add', 'andi': 'and', 'ori': 'or', 'xori': 'xor'}
+
+BRANCH_TESTS = {
+    'beq': lambda a, b: a == b,
+    'bne': lambda a, b: a != b,
+    'blt': lambda a, b: a < b,
+    'bge': lambda a, b: a >= b,
+    'bltu': lambda a, b: _unsigned(a) < _unsigned(b),
+    'bgeu': lambda a, b: _unsigned(a) >= _unsigned(b),
+}
+
+
+class LockstepSimulator:
+    """Runs one parsed program over N independent machines at once.
+
+    Each instance has its own row of ``registers`` (an ``(N, 32)`` int32
+    array) and ``memory`` (an ``(N, words)`` little-endian int32 array,
+    i.e. ``words * 4`` bytes starting at address 0). Every step executes
+    one instruction with NumPy operations across all instances whose PC
+    is the lowest active PC, so diverged instances wait and reconverge
+    where their paths meet. Results match RISCVSimulator's functional
+    mode; an access outside an instance's memory halts that instance with
+    ``faulted`` set instead of raising.
+    """
+
+    def __init__(self, instances, memory_words=1024):
+        self.instances = instances
+        self.memory_words = memory_words
+        self.opcode = Opcode()
+        self.parser = Parser(self.opcode)
+        self.instructions = []
+        self.data = []
+        self._ops = []
+        self._rows = np.arange(instances)
+        self.reset()
+
+    def load_program(self, code):
+        """Assemble and translate ``code``, copying its .data into every
+        instance's memory; returns the instruction count"""
+        assembly = self.parser.assemble(code)
+        self.instructions = assembly.instructions
+        self.data = assembly.data
+        self._ops = [self._translate(inst, index * 4) for index, inst in enumerate(self.instructions)]
+        self._load_data()
+        return len(self.instructions)
+
+    def _load_data(self):
+        for address, block in self.data:
+            end = address + len(block)
+            if end > self._memory_bytes.shape[1]:
+                raise ValueError(f"Data at 0x{address:x}-0x{end:x} does not fit in "
+                                 f"{self.memory_words} words of memory")
+            self._memory_bytes[:, address:end] = np.frombuffer(block, dtype=np.uint8)
+
+    def reset(self):
+        n = self.instances
+        self.registers = np.zeros((n, 32), dtype=np.int32)
+        self.memory = np.zeros((n, self.memory_words), dtype=WORD)
+        self._memory_bytes = self.memory.view(np.uint8)
+        self.pc = np.zeros(n, dtype=np.int64)
+        self.instructions_executed = np.zeros(n, dtype=np.int64)
+        self.faulted = np.zeros(n, dtype=bool)
+        self.steps = 0
+        self._load_data()
+
+    def active(self, max_instructions=None):
+        """Mask of instances that have not left the program or faulted"""
+        mask = (self.pc >= 0) & (self.pc < len(self._ops) * 4) & ~self.faulted
+        if max_instructions is not None:
+            mask &= self.instructions_executed < max_instructions
+        return mask
+
+    def run(self, max_steps=None, max_instructions=None):
+        """Step until every instance has finished (or the limits are hit).
+
+        ``max_steps`` bounds vector steps for this call; ``max_instructions``
+        is a per-instance total after which that instance stops. Returns
+        the number of steps taken.
+        """
+        ops = self._ops
+        pc = self.pc
+        counts = self.instructions_executed
+        steps = 0
+
+        while steps != max_steps:
+            live = self.active(max_instructions)
+            if live.all():
+                current = int(pc[0])
+                if (pc == current).all():
+                    rows = slice(None)
+                else:
+                    current = int(pc.min())
+                    rows = np.flatnonzero(pc == current)
+            elif live.any():
+                current = int(pc[live].min())
+                rows = np.flatnonzero(live & (pc == current))
+            else:
+                break
+
+            pc[rows] = ops[current >> 2](rows, current)
+            counts[rows] += 1
+            steps += 1
+
+        self.steps += steps
+        return steps
+
+    def _translate(self, inst, pc):
+        """Vector closure for ``inst`` at ``pc``: run(rows, pc) -> next PC(s).
+
+        Closures read ``self.registers`` and ``self.memory`` on each call, so
+        the arrays may be replaced (e.g. by reset) after translation.
+        """
+        rd, rs1, rs2, imm = inst.rd, inst.rs1, inst.rs2, inst.imm
+        op = inst.op
+
+        if inst.is_load:
+            return self._translate_load(inst)
+        if inst.is_store:
+            return self._translate_store(inst)
+
+        if inst.is_branch:
+            test = BRANCH_TESTS[op]
+
+            def run(rows, pc):
+                taken = test(self.registers[rows, rs1], self.registers[rows, rs2])
+                return np.where(taken, pc + imm, pc + 4)
+            return run
+
+        if inst.op_id == OP_JAL:
+            def run(rows, pc):
+                if rd:
+                    self.registers[rows, rd] = wrap32(pc + 4)
+                return pc + imm
+            return run
+
+        if inst.op_id == OP_JALR:
+            def run(rows, pc):
+                target = (self.registers[rows, rs1].astype(np.int64) + imm) & ~1
+                if rd:
+                    self.registers[rows, rd] = wrap32(pc + 4)
+                return target
+            return run
+
+        if not inst.writes_rd:
+            return lambda rows, pc: pc + 4
+
+        if op in ('lui', 'auipc'):
+            value = wrap32((imm << 12) + (pc if op == 'auipc' else 0))
+
+            def run(rows, pc):
+                self.registers[rows, rd] = value
+                return pc + 4
+            return run
+
+        if op in VECTOR_OPS:
+            compute = VECTOR_OPS[op]
+
+            def run(rows, pc):
+                registers = self.registers
+                registers[rows, rd] = compute(registers[rows, rs1], registers[rows, rs2])
+                return pc + 4
+            return run
+
+        compute = self._immediate_op(op, imm)
+
+        def run(rows, pc):
+            registers = self.registers
+            registers[rows, rd] = compute(registers[rows, rs1])
+            return pc + 4
+        return run
+
+    @staticmethod
+    def _immediate_op(op, imm):
+        if op in IMMEDIATE_OPS:
+            compute = VECTOR_OPS[IMMEDIATE_OPS[op]]
+            constant = np.int32(wrap32(imm))
+            return lambda a: compute(a, constant)
+        if op == 'slti':
+            # Compare against the exact immediate, which may not fit in int32
+            bound = max(min(imm, 1 << 32), -(1 << 32))
+            return lambda a: (a.astype(np.int64) < bound).astype(np.int32)
+        if op == 'sltiu':
+            constant = np.uint32(imm & MASK32)
+            return lambda a: (_unsigned(a) < constant).astype(np.int32)
+
+        if imm < 0:
+            raise ValueError(f"Negative shift amount in {op}")
+        if op == 'srai':
+            shift = np.int32(min(imm, 31))
+            return lambda a: a >> shift
+        if imm > 31:
+            # Every bit is shifted out, as in ALU.execute
+            return lambda a: np.zeros_like(a)
+        shift = np.uint32(imm)
+        if op == 'slli':
+            return lambda a: (_unsigned(a) << shift).view(np.int32)
+        return lambda a: (_unsigned(a) >> shift).view(np.int32)
+
+    def _addresses(self, rows, rs1, imm, size):
+        """Per-row byte addresses and row IDs; faulting rows are removed"""
+        address = (self.registers[rows, rs1].astype(np.int64) + imm) & MASK32
+        ids = self._rows if isinstance(rows, slice) else rows
+        in_range = address + size <= self._memory_bytes.shape[1]
+        if in_range.all():
+            return address, ids, None
+        self.faulted[ids[~in_range]] = True
+        return address[in_range], ids[in_range], in_range
+
+    def _translate_load(self, inst):
+        rd, rs1, imm = inst.rd, inst.rs1, inst.imm
+        size, signed = inst.mem_size, inst.mem_signed
+        offsets = np.arange(size)
+        shifts = (8 * offsets).astype(np.int64)
+
+        def run(rows, pc):
+            address, ids, in_range = self._addresses(rows, rs1, imm, size)
+            if size == 4 and not (address & 3).any():
+                value = self.memory[ids, address >> 2]
+            else:
+                data = self._memory_bytes[ids[:, None], address[:, None] + offsets]
+                value = (data.astype(np.int64) << shifts).sum(axis=1)
+                if signed:
+                    sign = 1 << (size * 8 - 1)
+                    value = (value ^ sign) - sign
+                value = value.astype(np.uint32).view(np.int32) if size == 4 else value.astype(np.int32)
+            if rd:
+                self.registers[ids, rd] = value
+            return self._advance(pc, in_range)
+        return run
+
+    def _translate_store(self, inst):
+        rs1, rs2, imm = inst.rs1, inst.rs2, inst.imm
+        size = inst.mem_size
+        offsets = np.arange(size)
+
+        def run(rows, pc):
+            address, ids, in_range = self._addresses(rows, rs1, imm, size)
+            value = self.registers[ids, rs2]
+            if size == 4 and not (address & 3).any():
+                self.memory[ids, address >> 2] = value
+            else:
+                data = value.astype(WORD).view(np.uint8).reshape(-1, 4)[:, :size]
+                self._memory_bytes[ids[:, None], address[:, None] + offsets] = data
+            return self._advance(pc, in_range)
+        return run
+
+    @staticmethod
+    def _advance(pc, in_range):
+        # Faulting instances stay on the faulting instruction
+        if in_range is None:
+            return pc + 4
+        return np.where(in_range, pc + 4, pc)
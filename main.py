@@ -1,7 +1,107 @@
+import time
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 from simulator import RISCVSimulator
 
+# Display refresh cap while running (~30 fps)
+FRAME_INTERVAL = 1 / 30
+# Simulation time per Tk callback in max-speed mode; the cycle batch is
+# resized after each run to stay near this
+BATCH_TIME = 0.03
+MIN_BATCH_CYCLES = 100
+MAX_BATCH_CYCLES = 1000000
+# Log lines appended per refresh, and kept in the log widget
+LOG_LINES_PER_FRAME = 200
+LOG_MAX_LINES = 2000
+
+# Highlight colours for instruction rows in each pipeline stage
+STAGE_COLORS = {
+    'IF': '#dbeafe',
+    'ID': '#dcfce7',
+    'EX': '#fef9c3',
+    'MEM': '#fde68a',
+    'WB': '#fbcfe8',
+}
+
+# The memory view has a row of four words for every 16 bytes
+MEMORY_ROWS = (1 << 32) // 16
+
+
+class VirtualList:
+    """Treeview that only holds the rows currently visible.
+
+    The list has ``count()`` rows, each produced on demand by
+    ``get_row(index)``. A fixed set of ``height`` tree items is refilled as
+    the list scrolls, so building and refreshing the view costs the same
+    however long the list is. Rows whose index is in ``highlights`` get
+    that tag.
+    """
+
+    def __init__(self, parent, columns, widths, count, get_row, height=16):
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show='headings',
+                                 height=height, selectmode='none')
+        for column, width in zip(columns, widths):
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=width)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.count = count
+        self.get_row = get_row
+        self.height = height
+        self.top = 0
+        self.highlights = {}
+        self.items = [self.tree.insert('', tk.END, values=()) for _ in range(height)]
+        self.shown = [None] * height
+
+        for widget in (self.tree, self.scrollbar):
+            widget.bind('<MouseWheel>', self.on_wheel)
+            widget.bind('<Button-4>', self.on_wheel)
+            widget.bind('<Button-5>', self.on_wheel)
+
+    def on_scroll(self, action, *args):
+        if action == 'moveto':
+            self.top = int(float(args[0]) * self.count())
+        elif action == 'scroll':
+            step = self.height if args[1] == 'pages' else 1
+            self.top += int(args[0]) * step
+        self.refresh()
+
+    def on_wheel(self, event):
+        up = event.num == 4 or getattr(event, 'delta', 0) > 0
+        self.top += -3 if up else 3
+        self.refresh()
+        return 'break'
+
+    def scroll_to(self, index, refresh=True):
+        """Scroll so row ``index`` is visible (a third of the way down)"""
+        if not self.top <= index < self.top + self.height:
+            self.top = index - self.height // 3
+        if refresh:
+            self.refresh()
+
+    def refresh(self):
+        count = self.count()
+        self.top = max(0, min(self.top, count - self.height))
+        for slot, item in enumerate(self.items):
+            index = self.top + slot
+            if index < count:
+                tag = self.highlights.get(index)
+                row = (self.get_row(index), (tag,) if tag else ())
+            else:
+                row = ((), ())
+            if self.shown[slot] != row:
+                self.shown[slot] = row
+                self.tree.item(item, values=row[0], tags=row[1])
+
+        if count:
+            self.scrollbar.set(self.top / count, min(1.0, (self.top + self.height) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
 class RISCVSimulatorGUI:
     def __init__(self, root):
         self.root = root
@@ -10,6 +110,11 @@ class RISCVSimulatorGUI:
 
         self.simulator = RISCVSimulator()
         self.speed_ms = 500
+        self.batch_cycles = 1000
+        self.last_refresh = 0.0
+        self.shown = {}
+        self.log_seen = 0
+        self.stage_rows = {}
 
         self.setup_ui()
         self.update_displays()
@@ -53,6 +158,8 @@ addi x7, x0, 100"""
                   command=self.load_program).pack(side=tk.LEFT, padx=2)
         ttk.Button(control_frame, text="Run",
                   command=self.run_program).pack(side=tk.LEFT, padx=2)
+        ttk.Button(control_frame, text="Run to End",
+                  command=self.run_to_end).pack(side=tk.LEFT, padx=2)
         ttk.Button(control_frame, text="Step",
                   command=self.step_program).pack(side=tk.LEFT, padx=2)
         ttk.Button(control_frame, text="Reset",
@@ -68,6 +175,9 @@ addi x7, x0, 100"""
         speed_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         self.speed_label = ttk.Label(speed_frame, text="500ms")
         self.speed_label.pack(side=tk.LEFT)
+        self.max_speed_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(speed_frame, text="Max speed",
+                        variable=self.max_speed_var).pack(side=tk.LEFT, padx=5)
 
         right_frame = ttk.Frame(main_frame)
         right_frame.grid(row=1, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5)
@@ -132,45 +242,41 @@ addi x7, x0, 100"""
         mem_frame = ttk.Frame(notebook, padding="10")
         notebook.add(mem_frame, text="Memory")
 
-        mem_canvas = tk.Canvas(mem_frame)
-        mem_scrollbar = ttk.Scrollbar(mem_frame, orient="vertical", command=mem_canvas.yview)
-        self.mem_inner_frame = ttk.Frame(mem_canvas)
-
-        self.mem_inner_frame.bind("<Configure>",
-                                 lambda e: mem_canvas.configure(scrollregion=mem_canvas.bbox("all")))
-
-        mem_canvas.create_window((0, 0), window=self.mem_inner_frame, anchor="nw")
-        mem_canvas.configure(yscrollcommand=mem_scrollbar.set)
-
-        mem_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        mem_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        self.memory_labels = []
-        for i in range(64):
-            frame = ttk.Frame(self.mem_inner_frame, relief=tk.RIDGE, borderwidth=1, padding="3")
-            frame.grid(row=i//4, column=i%4, padx=2, pady=2, sticky=(tk.W, tk.E))
+        mem_jump = ttk.Frame(mem_frame)
+        mem_jump.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(mem_jump, text="Address:").pack(side=tk.LEFT)
+        self.mem_jump_var = tk.StringVar()
+        mem_entry = ttk.Entry(mem_jump, textvariable=self.mem_jump_var, width=14)
+        mem_entry.pack(side=tk.LEFT, padx=5)
+        mem_entry.bind('<Return>', lambda e: self.jump_to_address())
+        ttk.Button(mem_jump, text="Go", command=self.jump_to_address).pack(side=tk.LEFT)
 
-            label = ttk.Label(frame, text=f"[{i}]: 0", font=('Courier', 8))
-            label.pack()
-            self.memory_labels.append(label)
+        self.memory_view = VirtualList(
+            mem_frame, ('Address', '+0', '+4', '+8', '+C'), (90, 90, 90, 90, 90),
+            lambda: MEMORY_ROWS, self.memory_row)
+        self.memory_view.frame.pack(fill=tk.BOTH, expand=True)
 
         inst_frame = ttk.Frame(notebook, padding="10")
         notebook.add(inst_frame, text="Instructions")
 
-        self.inst_tree = ttk.Treeview(inst_frame, columns=('PC', 'Instruction', 'Type'),
-                                     show='headings', height=15)
-        self.inst_tree.heading('PC', text='PC')
-        self.inst_tree.heading('Instruction', text='Instruction')
-        self.inst_tree.heading('Type', text='Type')
-        self.inst_tree.column('PC', width=50)
-        self.inst_tree.column('Instruction', width=200)
-        self.inst_tree.column('Type', width=50)
-
-        inst_scrollbar = ttk.Scrollbar(inst_frame, orient="vertical", command=self.inst_tree.yview)
-        self.inst_tree.configure(yscrollcommand=inst_scrollbar.set)
-
-        self.inst_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        inst_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        inst_jump = ttk.Frame(inst_frame)
+        inst_jump.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(inst_jump, text="PC or label:").pack(side=tk.LEFT)
+        self.pc_jump_var = tk.StringVar()
+        pc_entry = ttk.Entry(inst_jump, textvariable=self.pc_jump_var, width=14)
+        pc_entry.pack(side=tk.LEFT, padx=5)
+        pc_entry.bind('<Return>', lambda e: self.jump_to_pc())
+        ttk.Button(inst_jump, text="Go", command=self.jump_to_pc).pack(side=tk.LEFT)
+        self.follow_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(inst_jump, text="Follow pipeline",
+                        variable=self.follow_var).pack(side=tk.LEFT, padx=5)
+
+        self.inst_view = VirtualList(
+            inst_frame, ('PC', 'Instruction', 'Type', 'Stage'), (80, 200, 50, 50),
+            self.instruction_count, self.instruction_row)
+        for stage, color in STAGE_COLORS.items():
+            self.inst_view.tree.tag_configure(stage, background=color)
+        self.inst_view.frame.pack(fill=tk.BOTH, expand=True)
 
         stats_frame = ttk.LabelFrame(right_frame, text="Statistics & Hazard Detection", padding="10")
         stats_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=5)
@@ -202,7 +308,11 @@ addi x7, x0, 100"""
 
     def load_program(self):
         code = self.code_text.get('1.0', tk.END)
-        count = self.simulator.load_program(code)
+        try:
+            count = self.simulator.load_program(code)
+        except ValueError as e:
+            messagebox.showerror("Load Program", str(e))
+            return
         messagebox.showinfo("Load Program", f"Loaded {count} instructions")
         self.reset_simulator()
         self.update_instruction_table()
@@ -224,65 +334,178 @@ addi x7, x0, 100"""
         self.run_step()
 
     def run_step(self):
+        if not self.simulator.cpu.is_running:
+            return
+
+        if self.max_speed_var.get():
+            result = self.run_batch()
+        else:
+            result = self.simulator.run(max_cycles=1)
+
+        if result.completed:
+            self.simulator.cpu.is_running = False
+            self.update_displays()
+            messagebox.showinfo("Execution", "Program execution completed")
+            return
+
+        if time.perf_counter() - self.last_refresh >= FRAME_INTERVAL or not self.max_speed_var.get():
+            self.update_displays()
+        # A 1 ms gap lets Tk handle input between batches
+        delay = 1 if self.max_speed_var.get() else self.speed_ms
+        self.simulator.cpu.run_after_id = self.root.after(delay, self.run_step)
+
+    def run_batch(self):
+        """Run about BATCH_TIME worth of cycles, adapting the batch size"""
+        start = time.perf_counter()
+        result = self.simulator.run(max_cycles=self.batch_cycles)
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        scaled = int(self.batch_cycles * BATCH_TIME / elapsed)
+        self.batch_cycles = max(MIN_BATCH_CYCLES, min(MAX_BATCH_CYCLES, scaled))
+        return result
+
+    def run_to_end(self):
         if self.simulator.cpu.is_running:
-            if self.simulator.step():
-                self.update_displays()
-                self.simulator.cpu.run_after_id = self.root.after(self.speed_ms, self.run_step)
-            else:
-                self.simulator.cpu.is_running = False
-                messagebox.showinfo("Execution", "Program execution completed")
+            self.run_program()  # stop the animated run first
+        result = self.simulator.run()
+        self.update_displays()
+        messagebox.showinfo("Execution",
+                            f"Program execution completed\n"
+                            f"Cycles: {result.cycles}  Instructions: {result.instructions}  "
+                            f"CPI: {result.cpi:.2f}")
 
     def reset_simulator(self):
         if hasattr(self.simulator.cpu, 'run_after_id') and self.simulator.cpu.run_after_id:
             self.root.after_cancel(self.simulator.cpu.run_after_id)
         self.simulator.cpu.is_running = False
         self.simulator.reset()
-        self.update_displays()
         self.log_text.delete('1.0', tk.END)
+        self.log_seen = self.simulator.execution_log.recorded
+        self.update_displays()
+
+    def set_text(self, widget, text):
+        # Only touch widgets whose text changed
+        if self.shown.get(widget) != text:
+            self.shown[widget] = text
+            widget.config(text=text)
 
     def update_displays(self):
-        self.cycle_label.config(text=f"Cycle: {self.simulator.cycle}")
+        self.last_refresh = time.perf_counter()
+        sim = self.simulator
+        self.set_text(self.cycle_label, f"Cycle: {sim.cycle}")
 
         for stage in ['IF', 'ID', 'EX', 'MEM', 'WB']:
-            pipe_stage = self.simulator.pipeline[stage]
-            if pipe_stage.get('instruction'):
-                inst = pipe_stage['instruction']
-                text = f"{inst['raw']}\n"
+            pipe_stage = sim.pipeline[stage]
+            if pipe_stage.valid:
+                inst = pipe_stage.instruction
+                text = f"{inst.raw}\n"
                 if stage == 'ID':
-                    text += f"rs1: x{inst.get('rs1', 0)}\nrs2: x{inst.get('rs2', 0)}\nrd: x{inst.get('rd', 0)}"
+                    text += f"rs1: x{inst.rs1}\nrs2: x{inst.rs2}\nrd: x{inst.rd}"
                 elif stage == 'EX':
-                    text += f"Result: {pipe_stage.get('aluResult', 0)}"
+                    text += f"Result: {pipe_stage.alu_result}"
                 elif stage == 'MEM':
-                    text += f"Data: {pipe_stage.get('data', 0)}"
+                    text += f"Data: {pipe_stage.data}"
                 elif stage == 'WB':
-                    text += f"rd: x{pipe_stage.get('rd', 0)}\nData: {pipe_stage.get('data', 0)}"
-                self.stage_labels[stage].config(text=text)
+                    text += f"rd: x{pipe_stage.rd}\nData: {pipe_stage.data}"
+                self.set_text(self.stage_labels[stage], text)
             else:
-                self.stage_labels[stage].config(text="Bubble")
+                self.set_text(self.stage_labels[stage], "Bubble")
 
+        registers = sim.register_snapshot()
         for i, label in enumerate(self.register_labels):
-            label.config(text=str(self.simulator.registers[i]))
+            self.set_text(label, str(registers[i]))
 
-        for i, label in enumerate(self.memory_labels):
-            label.config(text=f"[{i}]: {self.simulator.memory_values[i]}")
+        self.memory_view.refresh()
+        self.update_instruction_view()
 
-        self.total_cycles_label.config(text=f"Total Cycles: {self.simulator.cycle}")
-        self.inst_exec_label.config(text=f"Instructions Executed: {self.simulator.instructions_executed}")
-        self.hazards_label.config(text=f"Hazards Detected: {self.simulator.hazards_detected}")
-        self.cpi_label.config(text=f"CPI: {self.simulator.get_cpi():.2f}")
+        self.set_text(self.total_cycles_label, f"Total Cycles: {sim.cycle}")
+        self.set_text(self.inst_exec_label, f"Instructions Executed: {sim.instructions_executed}")
+        self.set_text(self.hazards_label, f"Hazards Detected: {sim.hazards_detected}")
+        self.set_text(self.cpi_label, f"CPI: {sim.get_cpi():.2f}")
 
-        if len(self.simulator.execution_log) > 0:
-            last_log = self.simulator.execution_log[-1]
-            log_entry = f"[Cycle {last_log['cycle']}] {last_log['message']}\n"
-            self.log_text.insert(tk.END, log_entry)
-            self.log_text.see(tk.END)
+        self.append_log()
 
-    def update_instruction_table(self):
-        for item in self.inst_tree.get_children():
-            self.inst_tree.delete(item)
+    def append_log(self):
+        """Add events logged since the last refresh in one insert"""
+        log = self.simulator.execution_log
+        new = log.recorded - self.log_seen
+        self.log_seen = log.recorded
+        if new <= 0:
+            return
+
+        lines = []
+        shown = min(new, LOG_LINES_PER_FRAME)
+        if new > shown:
+            lines.append(f"... {new - shown} events not shown\n")
+        lines += [f"[Cycle {entry['cycle']}] {entry['message']}\n" for entry in log.tail(shown)]
+        self.log_text.insert(tk.END, ''.join(lines))
 
-        for idx, inst in enumerate(self.simulator.instructions):
-            self.inst_tree.insert('', tk.END, values=(idx * 4, inst['raw'], inst['type']))
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - LOG_MAX_LINES
+        if excess > 0:
+            self.log_text.delete('1.0', f"{excess + 1}.0")
+        self.log_text.see(tk.END)
+
+    def update_instruction_table(self):
+        self.inst_view.top = 0
+        self.update_instruction_view()
+
+    def update_instruction_view(self):
+        """Refresh visible instruction rows, highlighting pipeline stages"""
+        program = self.simulator.program
+        stages = {}
+        if program is not None:
+            for stage in ['IF', 'ID', 'EX', 'MEM', 'WB']:
+                latch = self.simulator.pipeline[stage]
+                if latch.valid:
+                    stages[(latch.pc - program.start) // 4] = stage
+        self.stage_rows = stages
+        self.inst_view.highlights = stages
+        if stages and self.follow_var.get():
+            self.inst_view.scroll_to(min(stages), refresh=False)
+        self.inst_view.refresh()
+
+    def instruction_count(self):
+        program = self.simulator.program
+        return 0 if program is None else len(program)
+
+    def instruction_row(self, index):
+        program = self.simulator.program
+        pc = program.start + index * 4
+        inst = program.fetch(pc)
+        stage = self.stage_rows.get(index, '')
+        if inst is None:
+            return (f"0x{pc:08x}", '(not an instruction)', '', stage)
+        return (f"0x{pc:08x}", inst.raw, inst.type, stage)
+
+    def memory_row(self, index):
+        return (f"0x{index * 16:08x}",) + tuple(self.simulator.memory.view(index * 16, 4))
+
+    def jump_to_address(self):
+        address = self.parse_location(self.mem_jump_var.get())
+        if address is not None:
+            self.memory_view.scroll_to((address & 0xFFFFFFFF) // 16)
+
+    def jump_to_pc(self):
+        pc = self.parse_location(self.pc_jump_var.get())
+        program = self.simulator.program
+        if pc is None or program is None:
+            return
+        if not program.start <= pc < program.end:
+            messagebox.showerror("Jump", f"PC 0x{pc:x} is outside the program")
+            return
+        self.follow_var.set(False)  # otherwise the next refresh scrolls back
+        self.inst_view.scroll_to((pc - program.start) // 4)
+
+    def parse_location(self, text):
+        """Address from a number (decimal or 0x..) or a label; None if invalid"""
+        text = text.strip()
+        try:
+            return int(text, 0)
+        except ValueError:
+            pass
+        if text.lower() in self.simulator.labels:
+            return self.simulator.labels[text.lower()]
+        messagebox.showerror("Jump", f"Not an address or label: {text!r}")
+        return None
 
 
 def main():
@@ -1,21 +1,251 @@
+import sys
+from array import array
+
+from bits import MASK32, SIGN_BIT
+
+
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+ADDRESS_MASK = MASK32
+
+# Access width in bytes and whether loads sign-extend
+ACCESS_WIDTHS = {
+    'lw': (4, True), 'lh': (2, True), 'lb': (1, True),
+    'lhu': (2, False), 'lbu': (1, False),
+    'sw': (4, True), 'sh': (2, True), 'sb': (1, True),
+}
+
+# Aligned words are read through an int32 memoryview, which is only
+# little-endian on little-endian hosts
+WORD_VIEWS = sys.byteorder == 'little'
+
+
 class Memory:
-    def __init__(self, size=256):
-        self.memory = [0] * size
+    """Byte-addressable, little-endian 32-bit address space.
 
-    def access_memory(self, opcode, address, value=None):
+    Memory is split into PAGE_SIZE bytearrays allocated on the first store
+    that touches them; loads from untouched pages read as zero without
+    allocating. Addresses wrap to 32 bits. Pages written since the last
+    snapshot are tracked in ``dirty`` so snapshots only copy those.
+    Ranges registered with ``watch`` report every write into them, which
+    engines use to drop instructions decoded from code that was overwritten.
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self._word_views = {}
+        self.words = WordView(self)
+        self.dirty = set()
+        self._snapshot = None
+        self.watches = []
+        self._watched_pages = set()
 
-        addr_word = address // 4
+    def access_memory(self, opcode, address, value=None):
 
-        if opcode in ['lw', 'lb', 'lh']:
-            if 0 <= addr_word < len(self.memory):
-                return self.memory[addr_word]
+        if opcode in ['lw', 'lb', 'lh', 'lbu', 'lhu']:
+            size, signed = ACCESS_WIDTHS[opcode]
+            return self.load(address, size, signed)
 
         elif opcode in ['sw', 'sb', 'sh']:
-            if 0 <= addr_word < len(self.memory):
-                self.memory[addr_word] = value
-                return value
+            return self.store(address, value, ACCESS_WIDTHS[opcode][0])
 
         return address
 
+    def load(self, address, size=4, signed=True):
+        address &= ADDRESS_MASK
+        offset = address & PAGE_MASK
+
+        if size == 4 and not offset & 3:
+            words = self._word_views.get(address >> PAGE_BITS)
+            if words is not None:
+                return words[offset >> 2] if signed else words[offset >> 2] & ADDRESS_MASK
+
+        page = self.pages.get(address >> PAGE_BITS)
+        if offset + size > PAGE_SIZE:
+            data = self.read_bytes(address, size)
+        elif page is None:
+            return 0
+        elif size == 1:
+            value = page[offset]
+            return value - 0x100 if signed and value & 0x80 else value
+        else:
+            data = page[offset:offset + size]
+        return int.from_bytes(data, 'little', signed=signed)
+
+    def store(self, address, value, size=4):
+        address &= ADDRESS_MASK
+        offset = address & PAGE_MASK
+        page_number = address >> PAGE_BITS
+        page = self.pages.get(page_number)
+        if page is None:
+            page = self._allocate(page_number)
+        self.dirty.add(page_number)
+
+        if size == 4 and not offset & 3 and WORD_VIEWS:
+            self._word_views[page_number][offset >> 2] = ((value + SIGN_BIT) & MASK32) - SIGN_BIT
+        elif size == 1:
+            page[offset] = value & 0xFF
+        else:
+            data = (value & ((1 << (size * 8)) - 1)).to_bytes(size, 'little')
+            if offset + size > PAGE_SIZE:
+                self.write_bytes(address, data)
+            else:
+                page[offset:offset + size] = data
+        if page_number in self._watched_pages:
+            self._written(address, address + size)
+        return value
+
+    def read_bytes(self, address, length):
+        """Copy ``length`` bytes starting at ``address`` (may span pages)"""
+        out = bytearray(length)
+        pos = 0
+        while pos < length:
+            current = (address + pos) & ADDRESS_MASK
+            offset = current & PAGE_MASK
+            chunk = min(length - pos, PAGE_SIZE - offset)
+            page = self.pages.get(current >> PAGE_BITS)
+            if page is not None:
+                out[pos:pos + chunk] = page[offset:offset + chunk]
+            pos += chunk
+        return bytes(out)
+
+    def write_bytes(self, address, data):
+        """Copy ``data`` into memory starting at ``address`` (may span pages)"""
+        data = memoryview(data).cast('B')
+        pos = 0
+        while pos < len(data):
+            current = (address + pos) & ADDRESS_MASK
+            offset = current & PAGE_MASK
+            chunk = min(len(data) - pos, PAGE_SIZE - offset)
+            page_number = current >> PAGE_BITS
+            page = self.pages.get(page_number)
+            if page is None:
+                page = self._allocate(page_number)
+            self.dirty.add(page_number)
+            page[offset:offset + chunk] = data[pos:pos + chunk]
+            pos += chunk
+        if self._watched_pages:
+            self._written(address & ADDRESS_MASK, (address & ADDRESS_MASK) + len(data))
+
+    def watch(self, start, end, callback):
+        """Call ``callback(start, end)`` after each store or write_bytes
+        that writes bytes in [start, end); restoring a snapshot does not"""
+        self.watches.append((start, end, callback))
+        self._watched_pages.update(range(start >> PAGE_BITS, ((end - 1) >> PAGE_BITS) + 1))
+
+    def unwatch(self, callback):
+        self.watches = [watch for watch in self.watches if watch[2] != callback]
+        self._watched_pages = {number for start, end, _ in self.watches
+                               for number in range(start >> PAGE_BITS, ((end - 1) >> PAGE_BITS) + 1)}
+
+    def _written(self, start, end):
+        for low, high, callback in self.watches:
+            if start < high and low < end:
+                callback(start, end)
+
+    def _allocate(self, page_number):
+        page = bytearray(PAGE_SIZE)
+        self.pages[page_number] = page
+        if WORD_VIEWS:
+            self._word_views[page_number] = memoryview(page).cast('i')
+        return page
+
+    def view(self, address, count):
+        """``count`` words from ``address`` as a read-only int32 memoryview.
+
+        An aligned range inside one allocated page is a live view of the
+        page, with nothing copied; other ranges are copied. Take
+        ``tolist()`` or ``tobytes()`` of a view to keep its values.
+        """
+        address &= ADDRESS_MASK
+        offset = address & PAGE_MASK
+        if WORD_VIEWS and not offset & 3 and offset + 4 * count <= PAGE_SIZE:
+            words = self._word_views.get(address >> PAGE_BITS)
+            if words is not None:
+                return words[offset >> 2:(offset >> 2) + count].toreadonly()
+        data = array('i', self.read_bytes(address, 4 * count))
+        if not WORD_VIEWS:
+            data.byteswap()
+        return memoryview(data).toreadonly()
+
+    @property
+    def allocated_bytes(self):
+        return len(self.pages) * PAGE_SIZE
+
+    def snapshot(self):
+        """Immutable copy of memory as {page number: bytes}.
+
+        Only pages dirtied since the previous snapshot (or restore) are
+        copied; the rest are shared with it.
+        """
+        base = self._snapshot
+        if base is None:
+            pages = {number: bytes(page) for number, page in self.pages.items()}
+        else:
+            pages = dict(base)
+            for number in self.dirty:
+                page = self.pages.get(number)
+                if page is None:
+                    pages.pop(number, None)
+                else:
+                    pages[number] = bytes(page)
+        self.dirty.clear()
+        self._snapshot = pages
+        return pages
+
+    def restore(self, pages):
+        """Make memory equal to a snapshot; returns the page numbers rewritten.
+
+        Pages that are unchanged since the previous snapshot or restore and
+        shared with ``pages`` are left alone, so returning repeatedly to the
+        same snapshot only costs the pages written in between.
+        """
+        base = self._snapshot
+        changed = []
+        for number in list(self.pages):
+            if number not in pages:
+                del self.pages[number]
+                self._word_views.pop(number, None)
+                changed.append(number)
+
+        for number, data in pages.items():
+            page = self.pages.get(number)
+            if (page is not None and base is not None and number not in self.dirty
+                    and base.get(number) is data):
+                continue
+            if page is None:
+                page = self._allocate(number)
+            page[:] = data
+            changed.append(number)
+
+        self.dirty.clear()
+        self._snapshot = pages
+        return changed
+
     def reset(self):
-        self.memory = [0] * len(self.memory)
\ No newline at end of file
+        self.pages.clear()
+        self._word_views.clear()
+        self.dirty.clear()
+        self._snapshot = None
+
+
+class WordView:
+    """Word-indexed view of Memory (index i is the word at address 4 * i)"""
+
+    def __init__(self, memory_unit):
+        self.memory = memory_unit
+
+    def __len__(self):
+        return (ADDRESS_MASK + 1) // 4
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return self.memory.view(start * 4, max(0, stop - start)).tolist()
+            return [self.memory.load(i * 4) for i in range(start, stop, step)]
+        return self.memory.load(index * 4)
+
+    def __setitem__(self, index, value):
+        self.memory.store(index * 4, value)
@@ -0,0 +1,340 @@
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+from memory import Memory, PAGE_BITS, PAGE_MASK, PAGE_SIZE, WORD_VIEWS
+from register_file import set_registers
+from simulator import RISCVSimulator, RunResult
+
+
+DEFAULT_MEMORY_SIZE = 1 << 20
+
+# Register each hart starts with its hart ID in (x10/a0, where boot
+# firmware passes it)
+HART_ID_REGISTER = 10
+
+# Seconds between checks that worker processes are still alive
+RESULT_POLL = 0.5
+
+
+class SharedMemoryImage(Memory):
+    """Memory whose first ``size`` bytes live in a shared memory block.
+
+    Every page of the image is a view into a
+    ``multiprocessing.shared_memory.SharedMemory`` block, allocated up
+    front, so stores made through one SharedMemoryImage are seen by every
+    other one attached to the same block, in this process or another.
+    Pass ``name`` to attach to an existing block instead of creating one.
+    Loads above the image read as zero; stores there raise ValueError.
+    """
+
+    def __init__(self, size, name=None):
+        if size <= 0 or size & PAGE_MASK:
+            raise ValueError(f"Shared memory size must be a positive multiple of {PAGE_SIZE}")
+        super().__init__()
+        if name is None:
+            self.block = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.block = shared_memory.SharedMemory(name=name)
+            if self.block.size < size:
+                self.block.close()
+                raise ValueError(f"Shared memory block {name!r} is smaller than {size} bytes")
+        self.size = size
+        self.name = self.block.name
+
+        buffer = self.block.buf
+        for number in range(size >> PAGE_BITS):
+            start = number << PAGE_BITS
+            self.pages[number] = buffer[start:start + PAGE_SIZE]
+            if WORD_VIEWS:
+                self._word_views[number] = self.pages[number].cast('i')
+
+    def _allocate(self, page_number):
+        raise ValueError(f"Address 0x{page_number << PAGE_BITS:08x} is outside the "
+                         f"{self.size}-byte shared memory image")
+
+    def restore(self, pages):
+        for number in pages:
+            if number not in self.pages:
+                self._allocate(number)
+        return super().restore({**dict.fromkeys(self.pages, bytes(PAGE_SIZE)), **pages})
+
+    def reset(self):
+        self.block.buf[:self.size] = bytes(self.size)
+        self.dirty.clear()
+        self._snapshot = None
+
+    def close(self):
+        """Detach from the block (views must be released before it can close)"""
+        for view in self._word_views.values():
+            view.release()
+        for view in self.pages.values():
+            view.release()
+        self.pages.clear()
+        self._word_views.clear()
+        self.block.close()
+
+    def unlink(self):
+        """Free the block once every process has closed it"""
+        self.block.unlink()
+
+
+def hart_state(sim):
+    """Registers, PC, counters and latches of a hart, as plain data"""
+    cpu = sim.cpu
+    return {
+        'registers': list(cpu.registers),
+        'pc': cpu.pc,
+        'cycle': cpu.cycle,
+        'instructions_executed': cpu.instructions_executed,
+        'hazards_detected': sim.hazard_detector.hazards_detected,
+        'latches': {stage: latch.get_state() for stage, latch in cpu.pipeline.items()},
+    }
+
+
+def set_hart_state(sim, state):
+    cpu = sim.cpu
+    set_registers(cpu.registers, state['registers'])
+    cpu.pc = state['pc']
+    cpu.cycle = state['cycle']
+    cpu.instructions_executed = state['instructions_executed']
+    sim.hazard_detector.hazards_detected = state['hazards_detected']
+    for stage, latch in cpu.pipeline.items():
+        latch_state = state['latches'][stage]
+        latch.set_state(latch_state, sim.program.fetch(latch_state[1]) if latch_state[0] else None)
+
+
+def _run_hart(hart_id, mode, code, memory_name, memory_size, state, quantum, max_cycles,
+              barrier, status, results):
+    """Worker process body: runs one hart in quanta, meeting the others at
+    ``barrier`` after each, and puts (hart_id, state, stop_reason, error)
+    on ``results``"""
+    memory = SharedMemoryImage(memory_size, memory_name)
+    try:
+        sim = RISCVSimulator(mode, memory)
+        sim.configure_log(levels=[], max_entries=0)
+        sim.load_program(code, load_data=False)
+        set_hart_state(sim, state)
+
+        remaining = max_cycles
+        reason = None
+        while True:
+            budget = quantum if remaining is None else min(quantum, remaining)
+            if reason != 'completed':
+                reason = sim.run(max_cycles=budget).stop_reason
+            status[hart_id] = reason == 'completed'
+            # Everyone reads the flags between two barriers, so no hart can
+            # change them before all have seen the same values
+            barrier.wait()
+            finished = all(status)
+            barrier.wait()
+            if remaining is not None:
+                remaining -= budget
+            if finished or remaining == 0:
+                break
+        results.put((hart_id, hart_state(sim), reason, None))
+    except threading.BrokenBarrierError:
+        results.put((hart_id, None, None, None))
+    except Exception as e:
+        barrier.abort()
+        results.put((hart_id, None, None, f"{type(e).__name__}: {e}"))
+    finally:
+        sim = None
+        memory.close()
+
+
+class MultiHartSimulator:
+    """Several harts running one program over one shared memory image.
+
+    Each hart is a RISCVSimulator (its own CPU, pipeline and registers)
+    whose memory is the same SharedMemoryImage of ``memory_size`` bytes
+    from address 0. Harts start with their ID (0, 1, ...) in
+    ``hart_id_register`` so the program can split the work.
+
+    ``run`` advances the harts in quanta of ``quantum`` cycles. In-process
+    (the default) they take turns, one quantum each, which is
+    deterministic. With ``processes=True`` every hart runs in its own
+    worker process, concurrently within a quantum, and the workers meet at
+    a barrier after each; their final state is copied back into
+    ``harts``. Workers do not log, profile or trace.
+
+    Call ``close`` (or use it as a context manager) to free the shared
+    memory block.
+    """
+
+    def __init__(self, harts=2, mode='pipeline', memory_size=DEFAULT_MEMORY_SIZE, quantum=1000,
+                 processes=False, hart_id_register=HART_ID_REGISTER):
+        if harts < 1:
+            raise ValueError("A multi-hart simulator needs at least one hart")
+        if quantum < 1:
+            raise ValueError("Quantum must be at least one cycle")
+        if mode not in RISCVSimulator.MODES:
+            raise ValueError(f"Unknown execution mode: {mode!r}")
+        self.mode = mode
+        self.quantum = quantum
+        self.processes = processes
+        self.hart_id_register = hart_id_register
+        self.memory = SharedMemoryImage(memory_size)
+        self.harts = [RISCVSimulator(mode, self.memory) for _ in range(harts)]
+        self.code = None
+
+    def load_program(self, code):
+        """Assemble ``code`` on every hart and copy its .data into memory once;
+        returns the instruction count"""
+        if not isinstance(code, str):
+            code = ''.join(code)
+        self.code = code
+        count = 0
+        for hart_id, hart in enumerate(self.harts):
+            count = hart.load_program(code, load_data=hart_id == 0)
+        self._seed_hart_ids()
+        return count
+
+    def _seed_hart_ids(self):
+        if self.hart_id_register:
+            for hart_id, hart in enumerate(self.harts):
+                hart.registers[self.hart_id_register] = hart_id
+
+    def run(self, max_cycles=None):
+        """Run every hart until all complete or each has run ``max_cycles``
+        cycles in this call; returns one RunResult per hart"""
+        if self.code is None:
+            raise ValueError("No program loaded")
+        if self.processes and len(self.harts) > 1:
+            reasons = self._run_processes(max_cycles)
+        else:
+            reasons = self._run_in_process(max_cycles)
+        return [RunResult(hart.cycle, hart.instructions_executed, hart.hazards_detected,
+                          hart.cpu.pc, reason)
+                for hart, reason in zip(self.harts, reasons)]
+
+    def _run_in_process(self, max_cycles):
+        reasons = [None] * len(self.harts)
+        remaining = max_cycles
+        while True:
+            budget = self.quantum if remaining is None else min(self.quantum, remaining)
+            for hart_id, hart in enumerate(self.harts):
+                if reasons[hart_id] != 'completed':
+                    reasons[hart_id] = hart.run(max_cycles=budget).stop_reason
+            if remaining is not None:
+                remaining -= budget
+            if all(reason == 'completed' for reason in reasons) or remaining == 0:
+                return reasons
+
+    def _run_processes(self, max_cycles):
+        count = len(self.harts)
+        context = multiprocessing.get_context()
+        barrier = context.Barrier(count)
+        status = context.RawArray('b', count)
+        results = context.Queue()
+        workers = [
+            context.Process(target=_run_hart, daemon=True, args=(
+                hart_id, self.mode, self.code, self.memory.name, self.memory.size,
+                hart_state(hart), self.quantum, max_cycles, barrier, status, results))
+            for hart_id, hart in enumerate(self.harts)
+        ]
+        for worker in workers:
+            worker.start()
+
+        outcomes = {}
+        try:
+            while len(outcomes) < count:
+                try:
+                    hart_id, state, reason, error = results.get(timeout=RESULT_POLL)
+                except queue.Empty:
+                    if any(worker.exitcode not in (None, 0) for worker in workers):
+                        barrier.abort()
+                        raise ValueError("A hart worker process exited unexpectedly")
+                    continue
+                outcomes[hart_id] = (state, reason, error)
+        finally:
+            for worker in workers:
+                worker.join()
+
+        for hart_id in range(count):
+            error = outcomes[hart_id][2]
+            if error:
+                raise ValueError(f"Hart {hart_id} failed: {error}")
+        reasons = []
+        for hart_id, hart in enumerate(self.harts):
+            state, reason, _ = outcomes[hart_id]
+            if state is None:
+                raise ValueError(f"Hart {hart_id} was stopped by another hart's failure")
+            set_hart_state(hart, state)
+            reasons.append(reason)
+        return reasons
+
+    def reset(self):
+        for hart in self.harts:
+            hart.reset()
+        self._seed_hart_ids()
+
+    @property
+    def cycle(self):
+        """Cycles of the longest-running hart"""
+        return max(hart.cycle for hart in self.harts)
+
+    @property
+    def instructions_executed(self):
+        return sum(hart.instructions_executed for hart in self.harts)
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Run one RV32I assembly program on several harts sharing memory")
+    arg_parser.add_argument('program', help="assembly source file")
+    arg_parser.add_argument('-n', '--harts', type=int, default=2, help="number of harts")
+    arg_parser.add_argument('--mode', choices=list(RISCVSimulator.MODES), default='pipeline')
+    arg_parser.add_argument('--quantum', type=int, default=1000,
+                            help="cycles each hart runs between synchronisations")
+    arg_parser.add_argument('--processes', action='store_true',
+                            help="run each hart in its own worker process")
+    arg_parser.add_argument('--memory-size', type=int, default=DEFAULT_MEMORY_SIZE,
+                            help="bytes of shared memory from address 0")
+    arg_parser.add_argument('--max-cycles', type=int, default=None, help="per-hart cycle limit")
+    arg_parser.add_argument('--json', action='store_true', help="print JSON lines")
+    args = arg_parser.parse_args(argv)
+
+    try:
+        with open(args.program) as f:
+            code = f.read()
+        with MultiHartSimulator(args.harts, args.mode, args.memory_size, args.quantum,
+                                args.processes) as sim:
+            sim.load_program(code)
+            started = time.perf_counter()
+            results = sim.run(max_cycles=args.max_cycles)
+            elapsed = time.perf_counter() - started
+            registers = [list(hart.registers) for hart in sim.harts]
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        for hart_id, result in enumerate(results):
+            print(json.dumps({'hart': hart_id, **result.to_dict(), 'registers': registers[hart_id]}))
+    else:
+        print(f"{'hart':>4} {'cycles':>10} {'instructions':>12} {'CPI':>6} {'hazards':>8}  stop")
+        for hart_id, result in enumerate(results):
+            print(f"{hart_id:>4} {result.cycles:>10} {result.instructions:>12} {result.cpi:>6.2f} "
+                  f"{result.hazards:>8}  {result.stop_reason}")
+        print(f"{elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -15,6 +15,8 @@ class Opcode:
     def get_instruction_type(self, op):
         if op in ['add', 'sub', 'and', 'or', 'xor', 'sll', 'srl', 'sra', 'slt', 'sltu']:
             return 'R'
+        if op in ['lui', 'auipc']:
+            return 'U'
         if op in ['addi', 'andi', 'ori', 'xori', 'slti', 'sltiu', 'slli', 'srli', 'srai', 'jalr'] or op.startswith('l'):
             return 'I'
         if op in ['sw', 'sb', 'sh']:
@@ -23,9 +25,14 @@ class Opcode:
             return 'B'
         if op == 'jal':
             return 'J'
-        if op in ['lui', 'auipc']:
-            return 'U'
         return 'R'
 
     def get_opcode(self, op):
-        return self.opcodes.get(op, 0)
\ No newline at end of file
+        return self.opcodes.get(op, 0)
+
+# Small integer IDs used by predecoded instructions, in Opcode.opcodes order
+OP_NAMES = list(Opcode().opcodes)
+OP_IDS = {op: op_id for op_id, op in enumerate(OP_NAMES)}
+
+OP_JAL = OP_IDS['jal']
+OP_JALR = OP_IDS['jalr']
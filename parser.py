@@ -1,11 +1,109 @@
 import re
+import struct
+
+from bits import wrap32
+from instruction import Instruction
+
+
+LABEL = re.compile(r'([a-z_.$][\w.$]*)\s*:\s*')
+OPERAND_SPLIT = re.compile(r'[\s,()]+')
+
+PSEUDO_OPS = ['nop', 'mv', 'j', 'li', 'la']
+REGISTER_NUMBERS = {f"x{number}": number for number in range(32)}
+
+
+def _parse_int(token):
+    """Integer literal (decimal, 0x.., 0b..), or None if ``token`` is not one"""
+    try:
+        return int(token)
+    except ValueError:
+        try:
+            return int(token, 0)
+        except ValueError:
+            return None
+
+
+def _immediate(token):
+    value = _parse_int(token)
+    if value is None:
+        raise ValueError(f"Bad immediate '{token}'")
+    return value
+
+
+def _split_immediate(value):
+    """(hi, lo) with ``(hi << 12) + lo == value`` mod 2**32 and lo 12-bit signed"""
+    lo = ((value & 0xFFF) ^ 0x800) - 0x800
+    return ((value - lo) >> 12) & 0xFFFFF, lo
+
+
+class Fixup:
+    """Instruction whose immediate depends on a label, filled in by pass 2.
+
+    ``kind`` is 'pcrel' (branch/jump offset from the instruction's own PC),
+    'hi' or 'lo' (the lui/addi halves of the label's absolute address).
+    """
+
+    __slots__ = ('kind', 'op', 'raw', 'type', 'rd', 'rs1', 'rs2', 'symbol')
+
+    def __init__(self, kind, op, raw, inst_type, rd, rs1, rs2, symbol):
+        self.kind = kind
+        self.op = op
+        self.raw = raw
+        self.type = inst_type
+        self.rd = rd
+        self.rs1 = rs1
+        self.rs2 = rs2
+        self.symbol = symbol
+
+    def resolve(self, address, pc):
+        hi, lo = _split_immediate(address)
+        if self.kind == 'pcrel':
+            return Instruction(self.op, self.raw, self.type, self.rd, self.rs1, self.rs2, address - pc)
+        if self.kind == 'hi':
+            return Instruction('lui', f"lui x{self.rd}, {hi}", 'U', self.rd, 0, 0, hi)
+        return Instruction('addi', f"addi x{self.rd}, x{self.rd}, {lo}", 'I', self.rd, self.rd, 0, lo)
+
+
+class Assembly:
+    """Output of Parser.assemble.
+
+    ``instructions`` start at address 0; ``data`` is a list of
+    ``(address, bytes)`` blocks to copy into memory; ``labels`` maps each
+    label to its address.
+    """
+
+    def __init__(self, instructions, data, labels):
+        self.instructions = instructions
+        self.data = data
+        self.labels = labels
 
 
 class Parser:
-    def __init__(self, opcode_unit):
+    """Two-pass assembler for RV32I text.
+
+    Supports ``label:`` definitions (branch, jump, ``la``/``li`` and
+    ``.word`` operands may name a label), the pseudo-instructions ``nop``,
+    ``mv``, ``j``, ``li`` and ``la``, and ``.text``/``.data`` sections with
+    ``.word`` and ``.space``. Data is laid out from ``data_base``.
+
+    Each distinct line is parsed once and cached by its text, so
+    re-assembling an edited program only parses the changed lines.
+    Unknown mnemonics and directives are skipped; undefined or duplicate
+    labels raise ValueError.
+    """
+
+    MAX_CACHED_LINES = 1 << 18
+
+    def __init__(self, opcode_unit, data_base=0):
         self.opcode = opcode_unit
+        self.data_base = data_base
+        self.line_cache = {}
+        self.types = {op: opcode_unit.get_instruction_type(op) for op in opcode_unit.opcodes}
 
     def parse_register(self, reg):
+        number = REGISTER_NUMBERS.get(reg)
+        if number is not None:
+            return number
         if not reg:
             return 0
         reg = reg.lower().replace('x', '')
@@ -15,70 +113,202 @@ class Parser:
             return 0
 
     def parse_instruction(self, line):
-        line = line.strip().lower()
-        if not line or line.startswith('#'):
-            return None
+        """Parse one label-free line; None for blanks, comments and unknown ops"""
+        _, items = self._parse_line(line)
+        if items and isinstance(items[0], Instruction):
+            return items[0]
+        return None
 
-        parts = re.split(r'[\s,()]+', line)
-        parts = [p for p in parts if p]
+    def load_program(self, code):
+        return self.assemble(code).instructions
 
-        if not parts:
-            return None
+    def assemble(self, source):
+        """Assemble a string or any iterable of lines (e.g. an open file)"""
+        if isinstance(source, str):
+            source = source.split('\n')
 
-        op = parts[0]
+        parse_line = self._parse_line
+        instructions = []
+        fixups = []
+        data = bytearray()
+        data_fixups = []
+        labels = {}
+        in_data = False
 
-        if op not in self.opcode.opcodes:
-            return None
+        for line_no, line in enumerate(source, 1):
+            line_labels, items = parse_line(line)
 
-        instruction = {
-            'op': op,
-            'raw': line,
-            'type': self.opcode.get_instruction_type(op),
-            'rd': 0,
-            'rs1': 0,
-            'rs2': 0,
-            'imm': 0
-        }
+            for label in line_labels:
+                if label in labels:
+                    raise ValueError(f"Line {line_no}: duplicate label '{label}'")
+                labels[label] = self.data_base + len(data) if in_data else len(instructions) * 4
 
+            for item in items:
+                if isinstance(item, Instruction):
+                    if in_data:
+                        raise ValueError(f"Line {line_no}: instruction in .data section")
+                    instructions.append(item)
+                elif isinstance(item, Fixup):
+                    if in_data:
+                        raise ValueError(f"Line {line_no}: instruction in .data section")
+                    fixups.append((len(instructions), item, line_no))
+                    instructions.append(None)
+                else:
+                    directive, args = item
+                    if directive == '.data' or directive == '.text':
+                        in_data = directive == '.data'
+                        continue
+                    if not in_data:
+                        raise ValueError(f"Line {line_no}: {directive} outside .data section")
+                    if directive == '.space':
+                        data.extend(bytes(args))
+                    else:
+                        values, symbols = args
+                        for index, symbol in symbols:
+                            data_fixups.append((len(data) + index * 4, symbol, line_no))
+                        data += values
+
+        for index, fixup, line_no in fixups:
+            instructions[index] = fixup.resolve(self._address(labels, fixup.symbol, line_no), index * 4)
+        for offset, symbol, line_no in data_fixups:
+            address = self._address(labels, symbol, line_no)
+            struct.pack_into('<I', data, offset, address & 0xFFFFFFFF)
+
+        return Assembly(instructions, [(self.data_base, bytes(data))] if data else [], labels)
+
+    @staticmethod
+    def _address(labels, symbol, line_no):
         try:
-            if instruction['type'] == 'R':
-                instruction['rd'] = self.parse_register(parts[1])
-                instruction['rs1'] = self.parse_register(parts[2])
-                instruction['rs2'] = self.parse_register(parts[3])
-            elif instruction['type'] == 'I':
-                instruction['rd'] = self.parse_register(parts[1])
+            return labels[symbol]
+        except KeyError:
+            raise ValueError(f"Line {line_no}: undefined label '{symbol}'") from None
+
+    def _parse_line(self, line):
+        """(labels, items) for one source line, cached by line text"""
+        cached = self.line_cache.get(line)
+        if cached is not None:
+            return cached
+
+        text = (line.split('#', 1)[0] if '#' in line else line).strip().lower()
+        labels = []
+        if ':' in text:
+            match = LABEL.match(text)
+            while match:
+                labels.append(match.group(1))
+                text = text[match.end():]
+                match = LABEL.match(text)
+
+        if not text:
+            items = ()
+        elif text[0] == '.':
+            items = self._parse_directive(text)
+        else:
+            items = self._parse_statement(text)
+
+        if len(self.line_cache) >= self.MAX_CACHED_LINES:
+            self.line_cache.clear()
+        parsed = self.line_cache[line] = (tuple(labels), items)
+        return parsed
+
+    def _parse_directive(self, text):
+        parts = [p for p in OPERAND_SPLIT.split(text) if p]
+        directive, args = parts[0], parts[1:]
+        if directive in ('.data', '.text'):
+            return ((directive, None),)
+        if directive == '.space':
+            size = _parse_int(args[0]) if args else None
+            if size is None or size < 0:
+                raise ValueError(f"Bad .space size in '{text}'")
+            return ((directive, size),)
+        if directive == '.word':
+            values = []
+            symbols = []
+            for index, arg in enumerate(args):
+                value = _parse_int(arg)
+                if value is None:
+                    symbols.append((index, arg))
+                    value = 0
+                values.append(value & 0xFFFFFFFF)
+            return ((directive, (struct.pack(f'<{len(values)}I', *values), tuple(symbols))),)
+        return ()  # other directives (.globl, .section, ...) are ignored
+
+    def _parse_statement(self, text):
+        parts = [p for p in OPERAND_SPLIT.split(text) if p]
+        op = parts[0]
+        if op in PSEUDO_OPS:
+            return self._expand_pseudo(op, parts, text)
+        inst_type = self.types.get(op)
+        if inst_type is None:
+            return ()
+
+        rd = rs1 = rs2 = imm = 0
+
+        try:
+            if inst_type == 'R':
+                rd = self.parse_register(parts[1])
+                rs1 = self.parse_register(parts[2])
+                rs2 = self.parse_register(parts[3])
+            elif inst_type == 'I':
+                rd = self.parse_register(parts[1])
                 if op.startswith('l'):
-                    instruction['imm'] = int(parts[2]) if len(parts) > 2 else 0
-                    instruction['rs1'] = self.parse_register(parts[3]) if len(parts) > 3 else 0
+                    imm = _immediate(parts[2]) if len(parts) > 2 else 0
+                    rs1 = self.parse_register(parts[3]) if len(parts) > 3 else 0
                 else:
-                    instruction['rs1'] = self.parse_register(parts[2]) if len(parts) > 2 else 0
-                    instruction['imm'] = int(parts[3]) if len(parts) > 3 else 0
-            elif instruction['type'] == 'S':
-                instruction['rs2'] = self.parse_register(parts[1])
-                instruction['imm'] = int(parts[2]) if len(parts) > 2 else 0
-                instruction['rs1'] = self.parse_register(parts[3]) if len(parts) > 3 else 0
-            elif instruction['type'] == 'B':
-                instruction['rs1'] = self.parse_register(parts[1])
-                instruction['rs2'] = self.parse_register(parts[2]) if len(parts) > 2 else 0
-                instruction['imm'] = int(parts[3]) if len(parts) > 3 else 0
-            elif instruction['type'] == 'J':
-                instruction['rd'] = self.parse_register(parts[1])
-                instruction['imm'] = int(parts[2]) if len(parts) > 2 else 0
-            elif instruction['type'] == 'U':
-                instruction['rd'] = self.parse_register(parts[1])
-                instruction['imm'] = int(parts[2]) if len(parts) > 2 else 0
+                    rs1 = self.parse_register(parts[2]) if len(parts) > 2 else 0
+                    imm = _immediate(parts[3]) if len(parts) > 3 else 0
+            elif inst_type == 'S':
+                rs2 = self.parse_register(parts[1])
+                imm = _immediate(parts[2]) if len(parts) > 2 else 0
+                rs1 = self.parse_register(parts[3]) if len(parts) > 3 else 0
+            elif inst_type == 'B':
+                rs1 = self.parse_register(parts[1])
+                rs2 = self.parse_register(parts[2]) if len(parts) > 2 else 0
+                if len(parts) > 3:
+                    if _parse_int(parts[3]) is None:
+                        return (Fixup('pcrel', op, text, inst_type, 0, rs1, rs2, parts[3]),)
+                    imm = _immediate(parts[3])
+            elif inst_type == 'J':
+                rd = self.parse_register(parts[1])
+                if len(parts) > 2:
+                    if _parse_int(parts[2]) is None:
+                        return (Fixup('pcrel', op, text, inst_type, rd, 0, 0, parts[2]),)
+                    imm = _immediate(parts[2])
+            elif inst_type == 'U':
+                rd = self.parse_register(parts[1])
+                imm = _immediate(parts[2]) if len(parts) > 2 else 0
         except (ValueError, IndexError):
             pass
 
-        return instruction
+        return (Instruction(op, text, inst_type, rd, rs1, rs2, imm),)
 
-    def load_program(self, code):
-        lines = code.split('\n')
-        instructions = []
+    def _expand_pseudo(self, op, parts, text):
+        args = parts[1:]
+        if op == 'nop':
+            return (Instruction('addi', text, 'I', 0, 0, 0, 0),)
+        if len(args) < (1 if op == 'j' else 2):
+            raise ValueError(f"Missing operands in '{text}'")
+
+        if op == 'j':
+            offset = _parse_int(args[0])
+            if offset is None:
+                return (Fixup('pcrel', 'jal', text, 'J', 0, 0, 0, args[0]),)
+            return (Instruction('jal', text, 'J', 0, 0, 0, offset),)
+
+        rd = self.parse_register(args[0])
+        if op == 'mv':
+            return (Instruction('addi', text, 'I', rd, self.parse_register(args[1]), 0, 0),)
 
-        for line in lines:
-            inst = self.parse_instruction(line)
-            if inst:
-                instructions.append(inst)
+        value = _parse_int(args[1]) if op == 'li' else None
+        if value is None:
+            # Label address, always materialised as lui + addi
+            return (Fixup('hi', 'lui', text, 'U', rd, 0, 0, args[1]),
+                    Fixup('lo', 'addi', text, 'I', rd, rd, 0, args[1]))
 
-        return instructions
\ No newline at end of file
+        value = wrap32(value)
+        if -2048 <= value < 2048:
+            return (Instruction('addi', text, 'I', rd, 0, 0, value),)
+        hi, lo = _split_immediate(value)
+        upper = Instruction('lui', f"lui x{rd}, {hi}", 'U', rd, 0, 0, hi)
+        if not lo:
+            return (upper,)
+        return (upper, Instruction('addi', f"addi x{rd}, x{rd}, {lo}", 'I', rd, rd, 0, lo))
@@ -0,0 +1,181 @@
+import json
+import time
+from collections import Counter
+
+from functional_cpu import FunctionalCPU
+from instrumentation import Patches
+
+
+# Pipeline stage methods of CPU, timed under the stage name
+STAGE_METHODS = {
+    'IF': 'fetch',
+    'ID': 'decode',
+    'EX': 'execute',
+    'MEM': 'memory_access',
+    'WB': 'write_back',
+}
+
+# Component calls timed inside a stage: (stage, name, component, method)
+COMPONENT_METHODS = [
+    ('ID', 'hazard_detector', 'hazard_detector', 'detect_hazards'),
+    ('EX', 'forwarding', 'hazard_detector', 'get_operands_with_forwarding'),
+    ('EX', 'alu', 'alu', 'execute'),
+]
+
+
+class Profiler:
+    """Runtime instrumentation for a RISCVSimulator.
+
+    ``attach`` replaces the methods it measures with wrappers set on the
+    instances (CPU stages, ALU, HazardDetector, Memory load/store) and
+    ``detach`` deletes them again, so a simulator that is not being
+    profiled runs the unmodified code. Collected while attached:
+
+    - ``stage_time``: seconds per stage path, e.g. ``('EX',)`` or
+      ``('EX', 'alu')`` (inclusive; pipeline mode only)
+    - ``opcodes`` and ``pcs``: retired instructions per mnemonic and per PC
+    - ``loads`` and ``stores``: accesses per byte address
+
+    The functional modes have no stages to time. In translated mode whole
+    blocks cannot be counted per PC, so runs use the per-instruction
+    closures while attached.
+    """
+
+    def __init__(self):
+        self.stage_time = {}
+        self.opcodes = Counter()
+        self.pcs = Counter()
+        self.loads = Counter()
+        self.stores = Counter()
+        self._patches = Patches()
+        self._simulator = None
+
+    def attach(self, simulator):
+        if self._simulator is not None:
+            raise ValueError("Profiler is already attached")
+        self._simulator = simulator
+        cpu = simulator.cpu
+        wrap = self._patches.wrap
+        wrap(simulator.memory, 'load', lambda load: self._counted_access(load, self.loads))
+        wrap(simulator.memory, 'store', lambda store: self._counted_access(store, self.stores))
+
+        if isinstance(cpu, FunctionalCPU):
+            wrap(cpu, '_translate', self._counted_translate)
+            if type(cpu).run is not FunctionalCPU.run:
+                wrap(cpu, 'run', lambda run: FunctionalCPU.run.__get__(cpu))
+            self._recompile()
+            return
+
+        for stage, method in STAGE_METHODS.items():
+            if stage == 'WB':
+                wrap(cpu, method, lambda func: self._timed(('WB',), self._counted_write_back(cpu, func)))
+            else:
+                wrap(cpu, method, lambda func, path=(stage,): self._timed(path, func))
+        for stage, name, component, method in COMPONENT_METHODS:
+            wrap(getattr(simulator, component), method,
+                 lambda func, path=(stage, name): self._timed(path, func))
+
+    def detach(self):
+        # Wrappers another instrument put over these are rebuilt without them
+        self._patches.restore()
+        if isinstance(self._simulator.cpu, FunctionalCPU):
+            self._recompile()
+        self._simulator = None
+
+    def _recompile(self):
+        # Drop cached closures so they are rebuilt with (or without) the
+        # counting wrappers and wrapped memory methods
+        simulator = self._simulator
+        if simulator.program is not None:
+            simulator.cpu.compile(simulator.program, simulator.memory)
+
+    def _timed(self, path, func):
+        clock = time.perf_counter
+        stage_time = self.stage_time
+        stage_time.setdefault(path, 0.0)
+
+        def timed(*args):
+            started = clock()
+            result = func(*args)
+            stage_time[path] += clock() - started
+            return result
+        return timed
+
+    def _counted_write_back(self, cpu, write_back):
+        mem_latch = cpu.mem_latch
+        opcodes, pcs = self.opcodes, self.pcs
+
+        def counted(*args):
+            if mem_latch.valid:
+                opcodes[mem_latch.instruction.op] += 1
+                pcs[mem_latch.pc] += 1
+            return write_back(*args)
+        return counted
+
+    def _counted_translate(self, translate):
+        opcodes, pcs = self.opcodes, self.pcs
+
+        def counted_translate(inst, memory_unit):
+            run = translate(inst, memory_unit)
+            op = inst.op
+
+            def counted(pc):
+                opcodes[op] += 1
+                pcs[pc] += 1
+                return run(pc)
+            return counted
+        return counted_translate
+
+    @staticmethod
+    def _counted_access(access, counts):
+        def counted(address, *args):
+            counts[address & 0xFFFFFFFF] += 1
+            return access(address, *args)
+        return counted
+
+    def hot_pcs(self, count=10):
+        """The ``count`` most executed PCs as (pc, executions)"""
+        return self.pcs.most_common(count)
+
+    def memory_heatmap(self, bucket_size=64):
+        """Accesses per ``bucket_size``-byte block of memory, as
+        ``{block address: (loads, stores)}`` in address order"""
+        buckets = {}
+        for counts, index in ((self.loads, 0), (self.stores, 1)):
+            for address, n in counts.items():
+                bucket = buckets.setdefault(address - address % bucket_size, [0, 0])
+                bucket[index] += n
+        return {address: tuple(buckets[address]) for address in sorted(buckets)}
+
+    def self_time(self):
+        """Seconds spent in each stage path excluding timed calls inside it"""
+        exclusive = dict(self.stage_time)
+        for path, seconds in self.stage_time.items():
+            if len(path) > 1:
+                exclusive[path[:-1]] -= seconds
+        return exclusive
+
+    def to_dict(self, bucket_size=64):
+        return {
+            'stage_seconds': {';'.join(path): seconds for path, seconds in self.stage_time.items()},
+            'opcodes': dict(self.opcodes.most_common()),
+            'pcs': {f"0x{pc & 0xFFFFFFFF:08x}": n for pc, n in self.pcs.most_common()},
+            'memory': {f"0x{address:08x}": list(counts)
+                       for address, counts in self.memory_heatmap(bucket_size).items()},
+        }
+
+    def collapsed_stacks(self):
+        """Stage self-times in microseconds as collapsed-stack lines
+        ('pipeline;EX;alu 1234'), the input format of flame graph tools"""
+        lines = []
+        for path, seconds in self.self_time().items():
+            lines.append(f"pipeline;{';'.join(path)} {max(0, round(seconds * 1e6))}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def save_json(self, path, bucket_size=64):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(bucket_size), f, indent=2)
+
+    def save_collapsed(self, path):
+        with open(path, 'w') as f:
+            f.write(self.collapsed_stacks())
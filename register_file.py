@@ -0,0 +1,78 @@
+from array import array
+
+from bits import wrap32
+
+
+REGISTER_COUNT = 32
+
+
+def make_registers():
+    """A zeroed register file.
+
+    Engines keep registers in a plain list: indexing an ``array('i')``
+    boxes every read and range-checks every write, which costs 25-30% of
+    the functional engines' speed. The values stay 32-bit because every
+    engine write is already wrapped (ALU results, sign-extended loads) and
+    values from outside go through set_registers or a RegisterView.
+    """
+    return [0] * REGISTER_COUNT
+
+
+def set_registers(registers, values):
+    """Overwrite a register file in place with ``values`` wrapped to 32 bits
+    (compiled code keeps a reference to the list, so it must not be
+    replaced); x0 stays zero"""
+    values = [wrap32(value) for value in values]
+    if len(values) != REGISTER_COUNT:
+        raise ValueError(f"Expected {REGISTER_COUNT} register values, got {len(values)}")
+    registers[:] = values
+    registers[0] = 0
+
+
+def register_snapshot(registers):
+    """Compact copy of a register file as a read-only int32 memoryview
+    (128 bytes; compare snapshots with ``==``, or take ``tobytes()``)"""
+    return memoryview(array('i', registers)).toreadonly()
+
+
+class RegisterView:
+    """The register file as code outside the engines sees it
+    (``RISCVSimulator.registers``).
+
+    Reads behave like the engine's list. Writes are wrapped to 32 bits
+    and writes to x0 are ignored, so a value written from outside can never
+    leave the range the engines keep.
+    """
+
+    __slots__ = ('_registers',)
+
+    def __init__(self, registers):
+        self._registers = registers
+
+    def __getitem__(self, index):
+        return self._registers[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            values = list(self._registers)
+            values[index] = value
+            set_registers(self._registers, values)
+            return
+        index = range(REGISTER_COUNT)[index]
+        if index:
+            self._registers[index] = wrap32(value)
+
+    def __len__(self):
+        return REGISTER_COUNT
+
+    def __iter__(self):
+        return iter(self._registers)
+
+    def __eq__(self, other):
+        try:
+            return list(self._registers) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"RegisterView({self._registers!r})"
@@ -0,0 +1,258 @@
+import argparse
+import json
+import sys
+
+from cycle_trace import WRITE, LOAD, STORE, FLUSH, BRANCH, JUMP
+from dependency_index import DependencyIndex, LOAD_USE, DATA_HAZARD, CONTROL_HAZARD
+from decoder import DecodeCache
+from opcodes import Opcode
+from parser import Parser
+
+
+HAZARD_KINDS = {LOAD_USE: 'load-use', DATA_HAZARD: 'raw', CONTROL_HAZARD: 'control'}
+
+
+class ReplayConfig:
+    """Pipeline parameters for a replay.
+
+    ``forwarding`` off makes a consumer wait until its producer has
+    written back (3 cycles after the producer's fetch, as registers are
+    written before they are read in a cycle). ``load_use_stall`` adds
+    cycles after a load whose result the next instruction uses (CPU needs
+    none: MEM runs before EX each cycle). ``branch_penalty`` is the number
+    of instructions squashed by a taken branch or jump (3: they resolve in
+    WB). ``memory_latency`` is extra cycles every load and store holds MEM.
+    The defaults reproduce CPU exactly.
+    """
+
+    FIELDS = ('forwarding', 'load_use_stall', 'branch_penalty', 'memory_latency')
+
+    def __init__(self, name='baseline', forwarding=True, load_use_stall=0, branch_penalty=3,
+                 memory_latency=0):
+        if branch_penalty < 0 or load_use_stall < 0 or memory_latency < 0:
+            raise ValueError("Replay penalties and latencies cannot be negative")
+        self.name = name
+        self.forwarding = forwarding
+        self.load_use_stall = load_use_stall
+        self.branch_penalty = branch_penalty
+        self.memory_latency = memory_latency
+
+    @classmethod
+    def parse(cls, text):
+        """'name:key=value,...' (e.g. 'slow:memory_latency=2,forwarding=0')"""
+        name, _, settings = text.partition(':')
+        options = {}
+        for setting in filter(None, settings.split(',')):
+            key, _, value = setting.partition('=')
+            if key not in cls.FIELDS:
+                raise ValueError(f"Unknown replay setting {key!r}")
+            options[key] = int(value, 0)
+        if 'forwarding' in options:
+            options['forwarding'] = bool(options['forwarding'])
+        return cls(name, **options)
+
+    def __repr__(self):
+        settings = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)
+        return f"ReplayConfig({self.name!r}, {settings})"
+
+
+PRESETS = [
+    ReplayConfig('baseline'),
+    ReplayConfig('no_forwarding', forwarding=False),
+    ReplayConfig('load_use_stall', load_use_stall=1),
+    ReplayConfig('early_branch', branch_penalty=1),
+    ReplayConfig('slow_memory', memory_latency=2),
+]
+
+
+class TraceReplay:
+    """Recomputes pipeline timing from a retired-instruction stream.
+
+    ``records`` holds one entry per retired instruction with fields
+    ``wb_pc``, ``rd``, ``rs1``, ``rs2`` and ``flags`` (e.g.
+    ``TraceReader.retired()``; a trace from a functional mode works as
+    well as one from the pipeline). Hazards follow HazardDetector's rules:
+    each instruction reaching ID is checked against the one ahead of it.
+    Squashed wrong-path instructions are not in the stream, so their
+    hazards are only counted when the static ``program`` is given.
+
+    The stream is read once, into per-instruction facts that do not depend
+    on the config; ``run`` then replays any number of configs over those
+    facts, each in one tight loop that touches no ALU or memory state.
+    """
+
+    def __init__(self, records, program=None):
+        self.pcs = records['wb_pc'].tolist()
+        self.flags = records['flags'].tolist()
+        rds = records['rd'].tolist()
+        rs1s = records['rs1'].tolist()
+        rs2s = records['rs2'].tolist()
+        self.index = DependencyIndex(program) if program is not None else None
+
+        # Per instruction: words skipped since the previous one (fetch
+        # bubbles), whether it reads the result of the previous / second
+        # previous instruction, and the hazard HazardDetector reports when
+        # it enters ID (EX holds the previous instruction only if it
+        # neither redirected nor was followed by a bubble)
+        self.gaps = []
+        self.raw1 = []
+        self.raw2 = []
+        self.hazards = []
+        prev_pc = prev_flags = None
+        written = [0, 0]  # rd written by the previous two instructions (0: none)
+        for pc, flags, rd, rs1, rs2 in zip(self.pcs, self.flags, rds, rs1s, rs2s):
+            sequential = prev_pc is not None and not prev_flags & FLUSH
+            gap = (pc - prev_pc - 4) >> 2 if sequential and pc > prev_pc + 4 else 0
+            raw1 = bool(written[0]) and written[0] in (rs1, rs2)
+            self.gaps.append(gap)
+            self.raw1.append(raw1)
+            self.raw2.append(bool(written[1]) and written[1] in (rs1, rs2))
+
+            if raw1 and sequential and not gap:
+                hazard = LOAD_USE if prev_flags & LOAD else DATA_HAZARD
+            elif flags & (BRANCH | JUMP):
+                hazard = CONTROL_HAZARD
+            else:
+                hazard = None
+            self.hazards.append(hazard)
+
+            written = [rd if flags & WRITE else 0, written[0]]
+            prev_pc, prev_flags = pc, flags
+
+        # Config-independent totals: hazards of the instructions in the
+        # stream, and how often each PC redirected
+        self.stream_hazards = {}
+        for hazard in self.hazards:
+            if hazard:
+                self.stream_hazards[hazard] = self.stream_hazards.get(hazard, 0) + 1
+        self.redirects = {}
+        for pc, flags in zip(self.pcs, self.flags):
+            if flags & FLUSH:
+                self.redirects[pc] = self.redirects.get(pc, 0) + 1
+
+    def wrong_path_hazards(self, pc, count):
+        """Hazards of the ``count`` sequential instructions after ``pc``"""
+        hazards = []
+        index = self.index
+        if index is None:
+            return hazards
+        program = index.program
+        for k in range(1, count + 1):
+            target = pc + 4 * k
+            if not program.start <= target < program.end:
+                break
+            entry = index.lookup(target)
+            if entry is None:
+                break  # an undecodable word enters ID as a bubble
+            if entry.hazard:
+                hazards.append(entry.hazard)
+        return hazards
+
+    def run(self, configs):
+        """Replay every config; returns one result dict per config"""
+        return [self.replay(config) for config in configs]
+
+    def replay(self, config):
+        # Cycles after a producer's fetch before a consumer may be fetched
+        # (1: no stall)
+        ready = 1 if config.forwarding else 3
+        load_ready = 1 + config.load_use_stall if config.forwarding else 3
+        penalty = config.branch_penalty
+        latency = config.memory_latency
+
+        stalls = {'data': 0, 'memory': 0, 'control': 0, 'fetch': 0}
+        data_stalls = 0
+        previous = earlier = None  # fetch cycles of the last two instructions
+        prev_flags = 0
+        cycle = 0
+        for flags, gap, raw1, raw2 in zip(self.flags, self.gaps, self.raw1, self.raw2):
+            if previous is None:
+                cycle = 1
+            else:
+                cycle = previous + 1 + gap
+                if prev_flags & FLUSH:
+                    cycle += penalty
+                    stalls['control'] += penalty
+                if prev_flags & (LOAD | STORE):
+                    cycle += latency
+                    stalls['memory'] += latency
+                stalls['fetch'] += gap
+                earliest = cycle
+                if raw1:
+                    earliest = max(earliest, previous + (load_ready if prev_flags & LOAD else ready))
+                if raw2 and earlier is not None:
+                    earliest = max(earliest, earlier + ready)
+                data_stalls += earliest - cycle
+                cycle = earliest
+            earlier, previous = previous, cycle
+            prev_flags = flags
+        stalls['data'] = data_stalls
+
+        instructions = len(self.pcs)
+        cycles = 0
+        if instructions:
+            writeback = cycle + 4 + (latency if prev_flags & (LOAD | STORE) else 0)
+            # CPU spends one more cycle draining WB after the last retirement
+            cycles = writeback + 1
+
+        # Of the instructions a redirect squashes, all but the youngest
+        # reached ID and were checked for hazards
+        counts = dict(self.stream_hazards)
+        for pc, redirects in self.redirects.items():
+            for hazard in self.wrong_path_hazards(pc, max(0, penalty - 1)):
+                counts[hazard] = counts.get(hazard, 0) + redirects
+
+        return {
+            'config': config.name,
+            'cycles': cycles,
+            'instructions': instructions,
+            'cpi': cycles / instructions if instructions else 0.0,
+            'hazards': sum(counts.values()),
+            'hazard_kinds': {HAZARD_KINDS[kind]: n for kind, n in counts.items()},
+            'stalls': stalls,
+        }
+
+
+def format_results(results):
+    lines = [f"{'config':<16} {'cycles':>10} {'CPI':>6} {'hazards':>8} {'data':>8} "
+             f"{'memory':>8} {'control':>8}"]
+    for r in results:
+        stalls = r['stalls']
+        lines.append(f"{r['config']:<16} {r['cycles']:>10} {r['cpi']:>6.2f} {r['hazards']:>8} "
+                     f"{stalls['data']:>8} {stalls['memory']:>8} {stalls['control']:>8}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Replay a cycle trace under different pipeline parameters")
+    arg_parser.add_argument('trace', help="trace file written by cycle_trace.Tracer")
+    arg_parser.add_argument('--program', default=None,
+                            help="assembly source, to count hazards of squashed instructions")
+    arg_parser.add_argument('-c', '--config', action='append', default=[], type=ReplayConfig.parse,
+                            metavar='NAME:KEY=VALUE,...',
+                            help="configuration to evaluate (repeatable; default: presets)")
+    arg_parser.add_argument('--json', action='store_true', help="print JSON lines")
+    args = arg_parser.parse_args(argv)
+
+    # NumPy is only needed to read the trace file
+    from trace_reader import TraceReader
+
+    program = None
+    if args.program:
+        with open(args.program) as f:
+            program = DecodeCache.from_instructions(Parser(Opcode()).load_program(f))
+
+    with TraceReader(args.trace) as trace:
+        replay = TraceReplay(trace.retired(), program)
+    results = replay.run(args.config or PRESETS)
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+    else:
+        print(format_results(results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+from memory import PAGE_SIZE
+from simulator import RunResult
+
+
+# Bumped whenever a change to the simulator can change results, so old
+# entries stop matching
+CACHE_VERSION = 2
+
+DEFAULT_MAX_BYTES = 64 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+COUNTERS = ('hits', 'misses', 'evictions')
+
+ZERO_PAGE = bytes(PAGE_SIZE)
+
+
+def memory_digest(memory):
+    """SHA-256 of memory contents; pages that are all zero are skipped, so an
+    allocated zero page and an untouched one hash the same"""
+    digest = hashlib.sha256()
+    for number in sorted(memory.pages):
+        page = memory.pages[number]
+        if page != ZERO_PAGE:
+            digest.update(number.to_bytes(4, 'little'))
+            digest.update(page)
+    return digest.hexdigest()
+
+
+def program_fingerprint(program):
+    """The loaded program (a DecodeCache) as plain data. Parsed assembly is
+    its instructions as tuples, so labels, comments, spacing and the
+    spelling of pseudo-instructions do not affect it; a binary decoded from
+    memory is a SHA-256 of its text range."""
+    if program is None:
+        return None
+    if program.memory is None:
+        return [(inst.op, inst.rd, inst.rs1, inst.rs2, inst.imm)
+                for _, inst in sorted(program.entries.items())]
+    text = program.memory.read_bytes(program.start, program.end - program.start)
+    return hashlib.sha256(text).hexdigest()
+
+
+class CachedRunResult(RunResult):
+    """RunResult with the final registers and memory digest, as stored in
+    the cache; ``cached`` tells whether it came from there"""
+
+    def __init__(self, cycles, instructions, hazards, pc, stop_reason, registers, memory_digest,
+                 cached=False):
+        super().__init__(cycles, instructions, hazards, pc, stop_reason)
+        self.registers = registers
+        self.memory_digest = memory_digest
+        self.cached = cached
+
+    def to_dict(self):
+        return {**super().to_dict(), 'registers': self.registers,
+                'memory_digest': self.memory_digest, 'cached': self.cached}
+
+
+class ResultCache:
+    """On-disk cache of run results in a SQLite file, shared by processes.
+
+    Entries are keyed by a hash of the simulator's parsed program,
+    starting state (registers, PC, counters, pipeline latches and memory
+    contents) and run configuration. Once the stored values exceed
+    ``max_bytes``, the least recently used entries are evicted. ``hits``
+    and ``misses`` count this instance's lookups; ``stats`` also reports
+    the totals of every user of the file.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+
+    def key(self, sim, max_cycles=None, max_instructions=None, until_pc=None):
+        """Hex key for running ``sim`` from its current state with these limits"""
+        cpu = sim.cpu
+        program = sim.program
+        state = {
+            'version': CACHE_VERSION,
+            'mode': sim.mode,
+            'program': program_fingerprint(program),
+            'program_range': None if program is None else [program.start, program.end],
+            'registers': list(cpu.registers),
+            'pc': cpu.pc,
+            'counters': [cpu.cycle, cpu.instructions_executed, sim.hazard_detector.hazards_detected],
+            'latches': [latch.get_state() if latch.valid else None for latch in cpu.pipeline.values()],
+            'memory': memory_digest(sim.memory),
+            'limits': [max_cycles, max_instructions, until_pc],
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+    def lookup(self, key):
+        """The CachedRunResult stored under ``key``, or None"""
+        row = self.db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            self._count('misses')
+            return None
+        self.hits += 1
+        self._count('hits')
+        self.db.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        value = json.loads(row[0])
+        return CachedRunResult(value['cycles'], value['instructions'], value['hazards'],
+                               value['pc'], value['stop_reason'], value['registers'],
+                               value['memory_digest'], cached=True)
+
+    def store(self, key, sim, run_result):
+        """Record the state ``sim`` finished a run in; returns the CachedRunResult"""
+        result = CachedRunResult(run_result.cycles, run_result.instructions, run_result.hazards,
+                                 run_result.pc, run_result.stop_reason, list(sim.registers),
+                                 memory_digest(sim.memory))
+        value = json.dumps({
+            'cycles': result.cycles,
+            'instructions': result.instructions,
+            'hazards': result.hazards,
+            'pc': result.pc,
+            'stop_reason': result.stop_reason,
+            'registers': result.registers,
+            'memory_digest': result.memory_digest,
+        })
+        self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                        (key, value, len(value), time.time()))
+        self._evict()
+        return result
+
+    def run(self, sim, max_cycles=None, max_instructions=None, until_pc=None):
+        """``sim.run`` through the cache.
+
+        On a hit the stored result is returned and ``sim`` is left where it
+        was (its memory is only known by digest); on a miss ``sim`` runs
+        and the result is stored. Returns a CachedRunResult.
+        """
+        key = self.key(sim, max_cycles, max_instructions, until_pc)
+        result = self.lookup(key)
+        if result is None:
+            result = self.store(key, sim, sim.run(max_cycles, max_instructions, until_pc))
+        return result
+
+    def _count(self, name, amount=1):
+        self.db.execute('INSERT INTO counters VALUES (?, ?) '
+                        'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                        (name, amount))
+
+    def _evict(self):
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Keep the most recently used entries that fit
+        kept = 0
+        evicted = []
+        for key, size in self.db.execute('SELECT key, size FROM results ORDER BY last_used DESC'):
+            if kept + size <= self.max_bytes and not evicted:
+                kept += size
+            else:
+                evicted.append((key,))
+        self.db.executemany('DELETE FROM results WHERE key = ?', evicted)
+        self._count('evictions', len(evicted))
+
+    def stats(self):
+        counters = dict.fromkeys(COUNTERS, 0)
+        counters.update(self.db.execute('SELECT name, value FROM counters'))
+        entries, size = self.db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        return {**counters, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes,
+                'session_hits': self.hits, 'session_misses': self.misses}
+
+    def clear(self):
+        self.db.execute('DELETE FROM results')
+        self.db.execute('DELETE FROM counters')
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
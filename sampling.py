@@ -0,0 +1,163 @@
+import math
+
+from functional_cpu import FunctionalCPU
+from translated_cpu import TranslatedCPU
+
+
+FAST_FORWARD_ENGINES = {
+    'functional': FunctionalCPU,
+    'translated': TranslatedCPU,
+}
+
+# Two-sided 95% normal quantile for the CPI confidence interval
+CONFIDENCE_Z = 1.96
+
+
+class SampleResult:
+    """Outcome of RISCVSimulator.run_sampled.
+
+    ``instructions`` is exact; ``cycles`` and ``hazards`` are extrapolated
+    from the measurement windows. ``cpi_error`` is the half-width of the
+    95% confidence interval on ``cpi`` (None with fewer than two windows).
+    """
+
+    def __init__(self, instructions, windows, detailed_instructions, detailed_cycles, pc,
+                 stop_reason):
+        self.instructions = instructions
+        self.windows = windows
+        self.detailed_instructions = detailed_instructions
+        self.detailed_cycles = detailed_cycles
+        self.pc = pc
+        self.stop_reason = stop_reason
+
+        measured = sum(count for count, _, _ in windows)
+        self.cpi = sum(cycles for _, cycles, _ in windows) / measured if measured else 0.0
+        self.hazard_rate = sum(hazards for _, _, hazards in windows) / measured if measured else 0.0
+        self.cpi_error = None
+        if len(windows) > 1:
+            # Ratio estimator: spread of the windows' CPIs around the mean,
+            # weighted by window length
+            mean_count = measured / len(windows)
+            residuals = [(cycles - self.cpi * count) / mean_count for count, cycles, _ in windows]
+            variance = sum(r * r for r in residuals) / (len(windows) - 1)
+            self.cpi_error = CONFIDENCE_Z * math.sqrt(variance / len(windows))
+
+    @property
+    def cycles(self):
+        return round(self.cpi * self.instructions)
+
+    @property
+    def hazards(self):
+        return round(self.hazard_rate * self.instructions)
+
+    @property
+    def cycles_error(self):
+        return None if self.cpi_error is None else self.cpi_error * self.instructions
+
+    @property
+    def completed(self):
+        return self.stop_reason == 'completed'
+
+    def to_dict(self):
+        return {
+            'cycles': self.cycles,
+            'instructions': self.instructions,
+            'cpi': self.cpi,
+            'cpi_error': self.cpi_error,
+            'cycles_error': self.cycles_error,
+            'hazards': self.hazards,
+            'windows': len(self.windows),
+            'detailed_instructions': self.detailed_instructions,
+            'detailed_cycles': self.detailed_cycles,
+            'pc': self.pc,
+            'stop_reason': self.stop_reason,
+        }
+
+    def __repr__(self):
+        error = f" ± {self.cpi_error:.3f}" if self.cpi_error is not None else ''
+        return (f"SampleResult(cycles≈{self.cycles}, instructions={self.instructions}, "
+                f"cpi={self.cpi:.3f}{error}, windows={len(self.windows)}, "
+                f"stop_reason={self.stop_reason!r})")
+
+
+class Sampler:
+    """Alternates ISA-level fast-forwarding with detailed pipeline windows.
+
+    Each ``interval`` instructions start with the pipeline CPU running
+    ``warmup`` instructions (to fill the pipeline, not measured) and then
+    ``window`` measured ones; the rest run on a FunctionalCPU or
+    TranslatedCPU. Measuring first means even a program shorter than one
+    interval gets a window; one that ends during the warmup ran entirely
+    on the pipeline, so that detailed run is its measurement. Both engines use the same register list, memory and
+    program, and leaving the pipeline rewinds to its oldest in-flight
+    instruction, so the final architectural state is exactly that of a
+    full pipeline run.
+    """
+
+    def __init__(self, cpu, components, interval=100000, warmup=100, window=1000,
+                 fast_mode='translated'):
+        if fast_mode not in FAST_FORWARD_ENGINES:
+            raise ValueError(f"Unknown fast-forward mode: {fast_mode!r}")
+        if window <= 0 or warmup < 0 or interval < warmup + window:
+            raise ValueError("Sampling needs window > 0 and interval >= warmup + window")
+        self.cpu = cpu
+        self.components = components
+        self.interval = interval
+        self.warmup = warmup
+        self.window = window
+
+        self.fast = FAST_FORWARD_ENGINES[fast_mode]()
+        self.fast.registers = cpu.registers
+        self.fast.execution_log = cpu.execution_log
+
+    def run(self, max_instructions=None):
+        cpu, fast, components = self.cpu, self.fast, self.components
+        hazard_detector = components['hazard_detector']
+        fast.registers = cpu.registers  # CPU.reset replaces the list
+        skip = self.interval - self.warmup - self.window
+
+        retired = 0
+        detailed_instructions = detailed_cycles = detailed_hazards = 0
+        windows = []
+        remaining = max_instructions
+        pc = cpu.rewind_in_flight()
+        stop_reason = None
+
+        def budget(count):
+            return count if remaining is None else min(count, remaining - retired)
+
+        while stop_reason is None:
+            for phase, count in (('warmup', self.warmup), ('window', self.window), ('fast', skip)):
+                count = budget(count)
+                if remaining is not None and retired >= remaining:
+                    stop_reason = 'max_instructions'
+                    break
+                if phase == 'fast':
+                    fast.pc = pc
+                    before = fast.instructions_executed
+                    reason = fast.run(components, max_instructions=count)
+                    retired += fast.instructions_executed - before
+                    pc = fast.pc
+                else:
+                    cpu.pc = pc
+                    cycles, before, hazards = (cpu.cycle, cpu.instructions_executed,
+                                               hazard_detector.hazards_detected)
+                    reason = cpu.run(components, max_instructions=count)
+                    done = cpu.instructions_executed - before
+                    retired += done
+                    detailed_instructions += done
+                    detailed_cycles += cpu.cycle - cycles
+                    detailed_hazards += hazard_detector.hazards_detected - hazards
+                    if phase == 'window' and done:
+                        windows.append((done, cpu.cycle - cycles,
+                                        hazard_detector.hazards_detected - hazards))
+                    pc = cpu.rewind_in_flight()
+                if reason == 'completed':
+                    stop_reason = 'completed'
+                    break
+
+        if not windows and detailed_instructions:
+            # Stopped before a window: nothing was fast-forwarded
+            windows.append((detailed_instructions, detailed_cycles, detailed_hazards))
+        cpu.pc = pc
+        return SampleResult(retired, windows, detailed_instructions, detailed_cycles, pc, stop_reason)
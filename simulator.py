@@ -1,53 +1,304 @@
+from types import MappingProxyType
+
+from checkpoint import Checkpoint
 from cpu import CPU
-from memory import Memory
+from decoder import Decoder, DecodeCache
+from functional_cpu import FunctionalCPU
+from loader import Loader
+from translated_cpu import TranslatedCPU
+from memory import Memory, PAGE_BITS, PAGE_SIZE
 from alu import ALU
 from hazard_detector import HazardDetector
-from opcode import Opcode
+from opcodes import Opcode
 from parser import Parser
+from profiler import Profiler
+from register_file import RegisterView, set_registers, register_snapshot
+from cycle_trace import Tracer
+from sampling import Sampler
+
+
+class RunResult:
+    """Outcome of RISCVSimulator.run.
+
+    Counters are machine totals since the last reset; ``stop_reason`` is
+    'completed', 'max_cycles', 'max_instructions' or 'until_pc'.
+    """
+
+    def __init__(self, cycles, instructions, hazards, pc, stop_reason):
+        self.cycles = cycles
+        self.instructions = instructions
+        self.hazards = hazards
+        self.pc = pc
+        self.stop_reason = stop_reason
+
+    @property
+    def cpi(self):
+        return self.cycles / self.instructions if self.instructions else 0.0
+
+    @property
+    def completed(self):
+        return self.stop_reason == 'completed'
+
+    def to_dict(self):
+        return {
+            'cycles': self.cycles,
+            'instructions': self.instructions,
+            'cpi': self.cpi,
+            'hazards': self.hazards,
+            'pc': self.pc,
+            'stop_reason': self.stop_reason
+        }
+
+    def __repr__(self):
+        return (f"RunResult(cycles={self.cycles}, instructions={self.instructions}, "
+                f"cpi={self.cpi:.2f}, hazards={self.hazards}, stop_reason={self.stop_reason!r})")
 
 
 class RISCVSimulator:
-    def __init__(self):
-        self.cpu = CPU()
-        self.memory = Memory()
+    MODES = {
+        'pipeline': CPU,
+        'functional': FunctionalCPU,
+        'translated': TranslatedCPU,
+    }
+
+    def __init__(self, mode='pipeline', memory=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown execution mode: {mode!r}")
+        self.mode = mode
+        self.cpu = self.MODES[mode]()
+        # A Memory can be passed in to share it (see multihart.py)
+        self.memory = Memory() if memory is None else memory
         self.alu = ALU()
         self.hazard_detector = HazardDetector()
         self.opcode = Opcode()
         self.parser = Parser(self.opcode)
+        self.decoder = Decoder(self.opcode)
+        self.loader = Loader(self.memory)
 
         self.instructions = []
+        self.data = []
+        self.labels = {}
+        self.program = None
+        # (path, base) of a loaded binary, reloaded by reset, and where it starts
+        self.binary = None
+        self.entry = 0
         self.components = {}
+        self.profiler = None
+        self.tracer = None
+
+    def load_program(self, code, load_data=True):
+        """Assemble ``code`` (a string or an iterable of lines such as an open
+        file) and copy its .data into memory; returns the instruction count.
+
+        ``load_data=False`` leaves memory alone, for a simulator sharing
+        memory that already holds the program's data.
+        """
+        assembly = self.parser.assemble(code)
+        self.instructions = assembly.instructions
+        self.data = assembly.data
+        self.labels = assembly.labels
+        self.binary = None
+        self.entry = 0
+        if load_data:
+            self._load_data()
+        self._set_program(DecodeCache.from_instructions(self.instructions))
+        return len(self.instructions)
 
-    def load_program(self, code):
-        self.instructions = self.parser.load_program(code)
+    def _load_data(self):
+        if self.binary is not None:
+            self.loader.load(*self.binary)
+        for address, block in self.data:
+            self.memory.write_bytes(address, block)
+
+    def load_binary(self, path, base=0):
+        """Load an ELF32 executable or a flat binary at ``base`` into memory.
+
+        Instructions are decoded from memory on first fetch. The PC is set to
+        the entry point; returns the number of words in the text range.
+        """
+        entry, text_start, text_end = self.loader.load(path, base)
+        self.instructions = []
+        self.data = []
+        self.labels = {}
+        self.binary = (path, base)
+        self.entry = entry
+        self._set_program(DecodeCache(self.memory, text_start, text_end, self.decoder))
+        self.cpu.pc = entry
+        return len(self.program)
+
+    def _set_program(self, program):
+        self.program = program
+        # Stores over a binary's text drop what was decoded from it, in every mode
+        self.memory.unwatch(self._invalidate_code)
+        if program.memory is not None:
+            self.memory.watch(program.start, program.end, self._invalidate_code)
+        self.hazard_detector.set_program(program)
         self.components = {
             'instructions': self.instructions,
+            'program': program,
             'memory': self.memory,
             'alu': self.alu,
             'hazard_detector': self.hazard_detector
         }
-        return len(self.instructions)
 
     def step(self):
-        return self.cpu.step(self.components)
+        running = self.cpu.step(self.components)
+        if not running:
+            self.flush_log()
+        return running
+
+    def run(self, max_cycles=None, max_instructions=None, until_pc=None):
+        """Run until the program completes or a limit is reached.
+
+        ``max_cycles`` and ``max_instructions`` count from this call;
+        ``until_pc`` stops before the instruction at that address retires
+        (see CPU.run for the pipeline's exact point). Returns a RunResult.
+        """
+        stop_reason = self.cpu.run(self.components, max_cycles, max_instructions, until_pc)
+        self.flush_log()
+        return RunResult(self.cpu.cycle, self.cpu.instructions_executed,
+                         self.hazard_detector.hazards_detected, self.cpu.pc, stop_reason)
+
+    def run_sampled(self, interval=100000, warmup=100, window=1000, fast_mode='translated',
+                    max_instructions=None):
+        """Estimate pipeline timing by sampling (pipeline mode only).
+
+        Each ``interval`` instructions start with ``warmup`` then
+        ``window`` instructions on the pipeline; the rest run on a
+        ``fast_mode`` engine. Cycles and CPI are then extrapolated from
+        the windows with a 95% confidence interval. The final registers, memory and PC match
+        a full pipeline run. ``cycle`` and ``hazards_detected`` afterwards
+        hold the estimates; returns a SampleResult (see sampling.py).
+        """
+        if self.mode != 'pipeline':
+            raise ValueError("Sampling needs a simulator in pipeline mode")
+        cpu = self.cpu
+        start = (cpu.cycle, cpu.instructions_executed, self.hazard_detector.hazards_detected)
+        sampler = Sampler(cpu, self.components, interval, warmup, window, fast_mode)
+        result = sampler.run(max_instructions)
+        cpu.cycle = start[0] + result.cycles
+        cpu.instructions_executed = start[1] + result.instructions
+        self.hazard_detector.hazards_detected = start[2] + result.hazards
+        return result
+
+    def hazard_report(self):
+        """Potential hazards in the loaded program, found without running it"""
+        if self.program is None:
+            return []
+        return self.hazard_detector.index.report()
+
+    def enable_profiling(self):
+        """Start collecting stage timings and execution counts; returns the
+        Profiler (see profiler.py). Profiling costs nothing until enabled."""
+        if self.profiler is None:
+            self.profiler = Profiler()
+            self.profiler.attach(self)
+        return self.profiler
+
+    def disable_profiling(self):
+        """Stop profiling and return the Profiler with what it collected"""
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.detach()
+        return profiler
+
+    def enable_trace(self, path):
+        """Write a binary record of every following cycle to ``path``
+        (see cycle_trace.py); returns the Tracer"""
+        if self.tracer is not None:
+            raise ValueError("A trace is already being written")
+        self.tracer = Tracer(path)
+        self.tracer.attach(self)
+        return self.tracer
+
+    def disable_trace(self):
+        """Stop tracing and close the trace file"""
+        tracer, self.tracer = self.tracer, None
+        if tracer is not None:
+            tracer.detach()
+        return tracer
+
+    def checkpoint(self):
+        """Capture the full machine state; cheap when little memory changed"""
+        cpu = self.cpu
+        program_range = (0, 0) if self.program is None else (self.program.start, self.program.end)
+        latches = {stage: latch.get_state() for stage, latch in cpu.pipeline.items()}
+        return Checkpoint(self.mode, program_range, list(cpu.registers), cpu.pc, cpu.cycle,
+                          cpu.instructions_executed, self.hazard_detector.hazards_detected,
+                          latches, self.memory.snapshot())
+
+    def restore(self, checkpoint):
+        """Return to a Checkpoint taken from this program (in any mode).
+
+        Checkpoints with instructions in the pipeline can only be restored
+        into pipeline mode. The execution log is left as it is.
+        """
+        program = self.program
+        program_range = (0, 0) if program is None else (program.start, program.end)
+        if tuple(checkpoint.program_range) != program_range:
+            raise ValueError("Checkpoint was taken from a different program")
+        if checkpoint.in_flight and self.mode != 'pipeline':
+            raise ValueError(f"Checkpoint has instructions in flight; cannot restore "
+                             f"into {self.mode!r} mode")
+
+        cpu = self.cpu
+        set_registers(cpu.registers, checkpoint.registers)
+        cpu.pc = checkpoint.pc
+        cpu.cycle = checkpoint.cycle
+        cpu.instructions_executed = checkpoint.instructions_executed
+        self.hazard_detector.hazards_detected = checkpoint.hazards_detected
+
+        changed = self.memory.restore(checkpoint.pages)
+        if program is not None and program.memory is not None:
+            # Code decoded from memory may have been overwritten
+            for number in changed:
+                start = number << PAGE_BITS
+                if start < program.end and program.start < start + PAGE_SIZE:
+                    self._invalidate_code(start, start + PAGE_SIZE)
+
+        for stage, latch in cpu.pipeline.items():
+            state = checkpoint.latches[stage]
+            latch.set_state(state, program.fetch(state[1]) if state[0] else None)
 
     def reset(self):
+        """Return to the state the program was loaded in: registers and
+        counters cleared, memory holding only its .data (or the binary,
+        reread from its file) and the PC at its entry point"""
         self.cpu.reset()
         self.memory.reset()
+        self._load_data()
         self.hazard_detector.hazards_detected = 0
-        self.instructions = []
+        self.cpu.pc = self.entry
+
+        program = self.program
+        if program is not None and program.memory is not None:
+            # Code decoded before the reset may since have been overwritten
+            self._invalidate_code(program.start, program.end)
+
+    def _invalidate_code(self, start, end):
+        """Forget instructions decoded (and translated) from [start, end)"""
+        getattr(self.cpu, 'invalidate', self.program.invalidate)(start, end)
 
     @property
     def registers(self):
-        return self.cpu.registers
+        """The register file; writes through it are wrapped to 32 bits
+        (see RegisterView)"""
+        return RegisterView(self.cpu.registers)
+
+    def register_snapshot(self):
+        """The register file as a compact read-only int32 memoryview (a copy;
+        see register_file.py)"""
+        return register_snapshot(self.cpu.registers)
 
     @property
     def memory_values(self):
-        return self.memory.memory
+        """Word-indexed view of memory (index i is the word at address 4 * i)"""
+        return self.memory.words
 
     @property
     def pipeline(self):
-        return self.cpu.pipeline
+        """Read-only mapping of stage name to its (live) pipeline latch"""
+        return MappingProxyType(self.cpu.pipeline)
 
     @property
     def cycle(self):
@@ -65,5 +316,18 @@ class RISCVSimulator:
     def execution_log(self):
         return self.cpu.execution_log
 
+    def configure_log(self, levels=None, **options):
+        """Set log verbosity, ring-buffer size and file sink (see ExecutionLog)"""
+        self.cpu.execution_log.configure(levels=levels, **options)
+
+    def flush_log(self):
+        """Write log events still batched for the sink (done whenever
+        ``run`` returns or a ``step`` completes the program)"""
+        self.cpu.execution_log.flush()
+
+    def close_log(self):
+        """Flush and detach the log sink, closing it if it was given as a path"""
+        self.cpu.execution_log.close()
+
     def get_cpi(self):
         return self.cpu.get_cpi()
\ No newline at end of file
@@ -0,0 +1,30 @@
+import pytest
+
+from simulator import RISCVSimulator
+from trace_reader import TraceReader
+
+
+# Two taken branches whose target is the next instruction, and one not taken
+PROGRAM = """
+    addi x1, x0, 1
+    beq x1, x1, next
+next:
+    bne x1, x0, after
+after:
+    beq x1, x0, done
+done:
+    addi x2, x0, 2
+"""
+
+
+@pytest.mark.parametrize('mode', RISCVSimulator.MODES)
+def test_taken_branch_to_next_instruction_is_flagged(mode, tmp_path):
+    path = str(tmp_path / 'run.trace')
+    sim = RISCVSimulator(mode)
+    sim.load_program(PROGRAM)
+    sim.enable_trace(path)
+    sim.run()
+    sim.disable_trace()
+    with TraceReader(path) as reader:
+        assert reader.flag('taken').sum() == 2
+        assert reader.flag('flush').sum() == 2
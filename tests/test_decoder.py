@@ -0,0 +1,92 @@
+import pytest
+
+from decoder import Decoder
+from opcodes import Opcode
+from parser import Parser
+
+
+def i_type(imm, rs1, funct3, rd, opcode):
+    return (imm & 0xFFF) << 20 | rs1 << 15 | funct3 << 12 | rd << 7 | opcode
+
+
+def s_type(imm, rs2, rs1, funct3):
+    imm &= 0xFFF
+    return (imm >> 5) << 25 | rs2 << 20 | rs1 << 15 | funct3 << 12 | (imm & 0x1F) << 7 | 0x23
+
+
+def b_type(imm, rs2, rs1, funct3):
+    imm &= 0x1FFF
+    return ((imm >> 12) << 31 | ((imm >> 5) & 0x3F) << 25 | rs2 << 20 | rs1 << 15 |
+            funct3 << 12 | ((imm >> 1) & 0xF) << 8 | ((imm >> 11) & 1) << 7 | 0x63)
+
+
+def u_type(imm, rd, opcode):
+    return (imm & 0xFFFFF) << 12 | rd << 7 | opcode
+
+
+def j_type(imm, rd):
+    imm &= 0x1FFFFF
+    return ((imm >> 20) << 31 | ((imm >> 1) & 0x3FF) << 21 | ((imm >> 11) & 1) << 20 |
+            ((imm >> 12) & 0xFF) << 12 | rd << 7 | 0x6F)
+
+
+@pytest.fixture(scope='module')
+def decoder():
+    return Decoder(Opcode())
+
+
+@pytest.mark.parametrize('imm', [0, 1, -1, 2047, -2048, 0x7FF, -0x555])
+def test_i_type(decoder, imm):
+    inst = decoder.decode(i_type(imm, 3, 0, 5, 0x13))
+    assert (inst.op, inst.rd, inst.rs1, inst.imm) == ('addi', 5, 3, imm)
+    load = decoder.decode(i_type(imm, 3, 4, 5, 0x03))
+    assert (load.op, load.rd, load.rs1, load.imm) == ('lbu', 5, 3, imm)
+
+
+@pytest.mark.parametrize('imm', [0, 4, -4, 31, 32, 2047, -2048])
+def test_s_type(decoder, imm):
+    inst = decoder.decode(s_type(imm, 7, 2, 2))
+    assert (inst.op, inst.rs1, inst.rs2, inst.imm) == ('sw', 2, 7, imm)
+
+
+@pytest.mark.parametrize('imm', [4, -4, 2, 0x7FE, 0x800, -0x800, 4094, -4096])
+def test_b_type(decoder, imm):
+    inst = decoder.decode(b_type(imm, 9, 8, 6))
+    assert (inst.op, inst.rs1, inst.rs2, inst.imm) == ('bltu', 8, 9, imm)
+
+
+@pytest.mark.parametrize('imm', [0, 1, 0x80000, 0xFFFFF, 0x12345])
+def test_u_type(decoder, imm):
+    for opcode, op in ((0x37, 'lui'), (0x17, 'auipc')):
+        inst = decoder.decode(u_type(imm, 4, opcode))
+        assert (inst.op, inst.rd, inst.imm) == (op, 4, imm)
+
+
+@pytest.mark.parametrize('imm', [2, -2, 0x7FE, 0x800, 0xFFFFE, -0x100000, 0x1000])
+def test_j_type(decoder, imm):
+    inst = decoder.decode(j_type(imm, 1))
+    assert (inst.op, inst.rd, inst.imm) == ('jal', 1, imm)
+
+
+def test_shifts_and_register_ops(decoder):
+    srai = decoder.decode(0x20 << 25 | i_type(31, 6, 5, 7, 0x13))
+    assert (srai.op, srai.rd, srai.rs1, srai.imm) == ('srai', 7, 6, 31)
+    sub = decoder.decode(0x20 << 25 | 3 << 20 | 2 << 15 | 1 << 7 | 0x33)
+    assert (sub.op, sub.rd, sub.rs1, sub.rs2) == ('sub', 1, 2, 3)
+
+
+def test_not_rv32i(decoder):
+    assert decoder.decode(0) is None
+    assert decoder.decode(0xFFFFFFFF) is None
+    assert decoder.decode(i_type(0, 1, 3, 1, 0x03)) is None  # no funct3 3 load
+
+
+@pytest.mark.parametrize('word', [
+    i_type(-7, 3, 0, 5, 0x13), i_type(-8, 2, 1, 9, 0x03), s_type(-12, 5, 2, 0),
+    b_type(-16, 2, 1, 1), u_type(0xFFFFF, 3, 0x37), j_type(-2048, 1), i_type(4, 1, 0, 0, 0x67),
+])
+def test_disassembly_reassembles(decoder, word):
+    inst = decoder.decode(word)
+    parsed = Parser(Opcode()).parse_instruction(inst.raw)
+    assert (parsed.op, parsed.rd, parsed.rs1, parsed.rs2, parsed.imm) == (
+        inst.op, inst.rd, inst.rs1, inst.rs2, inst.imm)
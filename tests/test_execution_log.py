@@ -0,0 +1,19 @@
+from simulator import RISCVSimulator
+
+
+PROGRAM = """
+    addi x1, x0, 3
+loop:
+    addi x1, x1, -1
+    bne x1, x0, loop
+"""
+
+
+def test_sink_is_written_when_run_returns(tmp_path):
+    path = tmp_path / 'run.log'
+    sim = RISCVSimulator()
+    sim.configure_log(sink=str(path))
+    sim.load_program(PROGRAM)
+    sim.run()
+    assert len(path.read_text().splitlines()) == len(sim.execution_log)
+    sim.close_log()
@@ -0,0 +1,44 @@
+import pytest
+
+from simulator import RISCVSimulator
+
+
+PROGRAM = """
+    addi x1, x0, 5
+    addi x2, x0, 0
+loop:
+    add x2, x2, x1
+    addi x1, x1, -1
+    bne x1, x0, loop
+    sw x2, 0(x0)
+"""
+
+
+def run(mode, tmp_path, order):
+    sim = RISCVSimulator(mode)
+    sim.load_program(PROGRAM)
+    sim.enable_profiling()
+    sim.enable_trace(str(tmp_path / 'run.trace'))
+    sim.run()
+    if order == 'trace-first':
+        sim.disable_trace()
+        sim.disable_profiling()
+    else:
+        sim.disable_profiling()
+        sim.disable_trace()
+    return sim
+
+
+@pytest.mark.parametrize('mode', RISCVSimulator.MODES)
+@pytest.mark.parametrize('order', ['trace-first', 'profile-first'])
+def test_profiling_and_tracing_detach_in_either_order(mode, tmp_path, order):
+    sim = run(mode, tmp_path, order)
+    assert sim.registers[2] == 15
+    assert not any(name in vars(sim.cpu) for name in ('fetch', '_translate', 'run'))
+    assert not any(name in vars(sim.memory) for name in ('load', 'store'))
+
+    # The engine runs unwrapped afterwards and gives the same result
+    sim.reset()
+    sim.load_program(PROGRAM)
+    sim.run()
+    assert sim.registers[2] == 15
@@ -0,0 +1,29 @@
+import pytest
+
+from job_server import execute_job, validate_job
+
+
+def program(*words):
+    values = ', '.join(str(word) for word in words)
+    return f".data\nvalues: .word {values}\n.text\nla x2, values\nlw x1, 4(x2)\n"
+
+
+def test_reused_simulator_starts_from_the_new_programs_data():
+    simulators = {}
+    results = [list(execute_job(simulators, {'program': source}))[-1]
+               for source in (program(1, 2), program(9), program(1, 2))]
+    assert [result['registers'][1] for result in results] == [2, 0, 2]
+
+
+@pytest.mark.parametrize('field, value', [
+    ('max_cycles', 'abc'), ('max_cycles', -1), ('max_instructions', 1.5),
+    ('progress', -10), ('progress', True), ('until_pc', -4), ('until_pc', [0]),
+])
+def test_bad_limits_are_rejected(field, value):
+    with pytest.raises(ValueError, match=field):
+        validate_job({'program': program(1), field: value})
+
+
+def test_good_limits_are_accepted():
+    validate_job({'program': program(1), 'max_cycles': 0, 'max_instructions': None,
+                  'progress': 100, 'until_pc': 'values'})
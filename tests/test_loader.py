@@ -0,0 +1,77 @@
+import struct
+
+import pytest
+
+from simulator import RISCVSimulator
+
+
+def elf(segments, entry):
+    """ELF32 RISC-V executable with one PT_LOAD per (vaddr, data, memsz, flags)"""
+    header_size, phdr_size = 52, 32
+    offset = header_size + phdr_size * len(segments)
+    phdrs, body = b'', b''
+    for vaddr, data, memsz, flags in segments:
+        phdrs += struct.pack('<IIIIIIII', 1, offset + len(body), vaddr, vaddr, len(data), memsz,
+                             flags, 4)
+        body += data
+    ident = b'\x7fELF\x01\x01\x01' + bytes(9)
+    header = struct.pack('<HHIIIIIHHHHHH', 2, 243, 1, entry, header_size, 0, 0, header_size,
+                         phdr_size, len(segments), 40, 0, 0)
+    return ident + header + phdrs + body
+
+
+def words(*values):
+    return b''.join(value.to_bytes(4, 'little') for value in values)
+
+
+def test_bss_is_zeroed_over_old_memory(tmp_path):
+    path = tmp_path / 'prog.elf'
+    # lw x1, 0(x2) with x2 = 0x2000 (lui x2, 2), reading the first .bss word
+    text = words(0x00002137, 0x00012083)
+    path.write_bytes(elf([(0x1000, text, len(text), 5), (0x2000, b'', 16, 6)], 0x1000))
+    sim = RISCVSimulator('functional')
+    sim.memory.store(0x2000, 0x12345678)
+    sim.load_binary(str(path))
+    sim.run()
+    assert sim.registers[1] == 0
+    assert sim.memory.view(0x2000, 4).tolist() == [0, 0, 0, 0]
+
+
+def test_elf_segments_entry_and_text_range(tmp_path):
+    path = tmp_path / 'prog.elf'
+    text = words(0x00500093, 0x00102023)  # addi x1, x0, 5; sw x1, 0(x0)
+    data = words(0xCAFEBABE)
+    path.write_bytes(elf([(0x10000, text, len(text), 5), (0x20000, data, 8, 6)], 0x10000))
+    sim = RISCVSimulator('pipeline')
+    assert sim.load_binary(str(path)) == 2
+    assert (sim.cpu.pc, sim.program.start, sim.program.end) == (0x10000, 0x10000, 0x10008)
+    assert sim.memory.load(0x20000, 4, False) == 0xCAFEBABE
+    sim.run()
+    assert sim.registers[1] == 5
+    assert sim.memory.load(0) == 5
+
+
+def test_flat_binary_at_base(tmp_path):
+    path = tmp_path / 'prog.bin'
+    path.write_bytes(words(0x00500093))
+    sim = RISCVSimulator('functional')
+    sim.load_binary(str(path), 0x4000)
+    assert (sim.cpu.pc, sim.program.start, sim.program.end) == (0x4000, 0x4000, 0x4004)
+
+
+@pytest.mark.parametrize('patch, message', [
+    (lambda image: image[:4] + b'\x02' + image[5:], '32-bit'),
+    (lambda image: image[:18] + (62).to_bytes(2, 'little') + image[20:], 'not RISC-V'),
+])
+def test_unsupported_elf(tmp_path, patch, message):
+    path = tmp_path / 'prog.elf'
+    path.write_bytes(patch(elf([(0x1000, words(0x13), 4, 5)], 0x1000)))
+    with pytest.raises(ValueError, match=message):
+        RISCVSimulator().load_binary(str(path))
+
+
+def test_elf_without_executable_segment(tmp_path):
+    path = tmp_path / 'data.elf'
+    path.write_bytes(elf([(0x1000, words(1), 4, 6)], 0x1000))
+    with pytest.raises(ValueError, match='no executable segment'):
+        RISCVSimulator().load_binary(str(path))
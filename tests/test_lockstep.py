@@ -0,0 +1,64 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from lockstep import LockstepSimulator  # noqa: E402
+from simulator import RISCVSimulator  # noqa: E402
+
+
+# x1..x4 are per-instance inputs; the blt splits instances onto two paths
+# that meet again at "join"
+PROGRAM = """
+    sll x5, x1, x2
+    srl x6, x1, x2
+    sra x7, x1, x2
+    slli x8, x3, 31
+    srli x9, x3, 1
+    srai x10, x3, 4
+    sltu x11, x1, x3
+    slt x12, x1, x3
+    slti x13, x4, -1
+    sltiu x14, x4, -1
+    blt x1, x3, other
+    sw x1, 1(x0)
+    sh x3, 7(x0)
+    lw x15, 2(x0)
+    jal x0, join
+other:
+    sb x4, 13(x0)
+    sw x3, 14(x0)
+    lh x15, 13(x0)
+join:
+    lhu x16, 7(x0)
+    lb x17, 13(x0)
+    lw x18, 1(x0)
+    lbu x19, 3(x0)
+    xori x20, x4, -1
+    sub x21, x1, x3
+"""
+
+INPUTS = [
+    [0, 0, 0, 0],
+    [1, 1, 2, -1],
+    [-1, 31, 0x7FFFFFFF, 5],
+    [-0x80000000, 4, -0x80000000, -2048],
+    [0x12345678, 33, -1, 2047],
+    [-5, 63, 7, -7],
+]
+
+
+def test_matches_functional_mode():
+    lockstep = LockstepSimulator(len(INPUTS), memory_words=64)
+    lockstep.load_program(PROGRAM)
+    lockstep.registers[:, 1:5] = np.array(INPUTS, dtype=np.int32)
+    lockstep.run()
+    assert not lockstep.faulted.any()
+
+    for index, values in enumerate(INPUTS):
+        sim = RISCVSimulator('functional')
+        sim.load_program(PROGRAM)
+        sim.registers[1:5] = values
+        sim.run()
+        assert lockstep.registers[index].tolist() == list(sim.registers), values
+        assert lockstep.memory[index].tolist() == sim.memory_values[:64], values
+        assert lockstep.instructions_executed[index] == sim.instructions_executed
@@ -0,0 +1,93 @@
+import struct
+
+import pytest
+
+from opcodes import Opcode
+from parser import Parser, _split_immediate
+from simulator import RISCVSimulator
+
+
+def assemble(source):
+    return Parser(Opcode()).assemble(source)
+
+
+def run(source):
+    sim = RISCVSimulator('functional')
+    sim.load_program(source)
+    sim.run()
+    return sim
+
+
+LI_VALUES = [0, 1, -1, 2047, 2048, -2048, -2049, 0x7FF, 0x800, 0x801, 0xFFF, 0x1000,
+             0x12345800, 0x123457FF, 0x7FFFF800, 0x7FFFFFFF, -0x80000000, 0xFFFFF800,
+             0xFFFFFFFF]
+
+
+@pytest.mark.parametrize('value', LI_VALUES)
+def test_split_immediate_recombines(value):
+    hi, lo = _split_immediate(value)
+    assert 0 <= hi < 1 << 20
+    assert -2048 <= lo < 2048
+    assert ((hi << 12) + lo - value) % (1 << 32) == 0
+
+
+@pytest.mark.parametrize('value', LI_VALUES)
+def test_li_loads_the_value(value):
+    expected = (value + 0x80000000) % (1 << 32) - 0x80000000
+    assert run(f"li x5, {value}\n").registers[5] == expected
+
+
+@pytest.mark.parametrize('value, count', [(2047, 1), (-2048, 1), (2048, 2), (-2049, 2),
+                                          (0x1000, 1), (0x1001, 2)])
+def test_li_uses_as_few_instructions_as_fit(value, count):
+    assert len(assemble(f"li x5, {value}\n").instructions) == count
+
+
+def test_forward_and_backward_branch_labels():
+    assembly = assemble("""
+        addi x1, x0, 3
+    loop:
+        addi x1, x1, -1
+        beq x1, x0, done
+        jal x0, loop
+    done:
+        addi x2, x0, 1
+    """)
+    beq, jal = assembly.instructions[2], assembly.instructions[3]
+    assert (beq.op, beq.imm) == ('beq', 8)
+    assert (jal.op, jal.imm) == ('jal', -8)
+    assert assembly.labels == {'loop': 4, 'done': 16}
+
+
+def test_word_label_and_la():
+    source = """
+    .data
+    first: .word 7
+    table: .word first, after
+    buffer: .space 8
+    after: .word -1
+    .text
+        la x1, table
+        lw x2, 0(x1)
+        lw x3, 0(x2)
+    """
+    assembly = assemble(source)
+    address, data = assembly.data[0]
+    assert assembly.labels['buffer'] == address + 12
+    assert assembly.labels['after'] == address + 20
+    assert struct.unpack_from('<3I', data) == (7, address, address + 20)
+    assert data[12:20] == bytes(8)
+    sim = run(source)
+    assert sim.registers[1:4] == [assembly.labels['table'], address, 7]
+
+
+def test_duplicate_label():
+    with pytest.raises(ValueError, match="Line 3: duplicate label 'a'"):
+        assemble("a:\n    addi x1, x0, 1\na: addi x1, x0, 2\n")
+
+
+def test_undefined_label():
+    with pytest.raises(ValueError, match="undefined label 'nowhere'"):
+        assemble("    beq x0, x0, nowhere\n")
+    with pytest.raises(ValueError, match="undefined label 'nowhere'"):
+        assemble(".data\n.word nowhere\n")
@@ -0,0 +1,33 @@
+import pytest
+
+from multihart import MultiHartSimulator
+from simulator import RISCVSimulator
+
+
+@pytest.mark.parametrize('mode', RISCVSimulator.MODES)
+def test_writes_through_the_simulator_are_wrapped(mode):
+    sim = RISCVSimulator(mode)
+    sim.load_program("add x6, x5, x0\n")
+    sim.registers[5] = 1 << 40 | 7
+    sim.registers[-1] = 0x80000000
+    sim.registers[0] = 9
+    assert sim.cpu.registers[5] == 7
+    assert sim.registers[31] == -0x80000000
+    assert sim.registers[0] == 0
+    sim.run()
+    assert sim.registers[6] == 7
+
+
+def test_slice_writes_are_wrapped():
+    sim = RISCVSimulator()
+    sim.registers[1:3] = [0xFFFFFFFF, 1 << 32]
+    assert list(sim.registers[:3]) == [0, -1, 0]
+    with pytest.raises(ValueError):
+        sim.registers[1:3] = [1]
+
+
+def test_hart_ids_are_seeded_through_the_view():
+    with MultiHartSimulator(harts=2, memory_size=4096) as sim:
+        sim.load_program("addi x11, x10, 1\n")
+        sim.run()
+        assert [hart.registers[11] for hart in sim.harts] == [1, 2]
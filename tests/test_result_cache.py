@@ -0,0 +1,34 @@
+from result_cache import ResultCache
+from simulator import RISCVSimulator
+
+
+DATA = """
+.data
+value: .word 3
+.text
+"""
+
+
+def test_key_tells_programs_apart_after_reset(tmp_path):
+    results = []
+    with ResultCache(str(tmp_path / 'results.db')) as cache:
+        for value in (5, 7):
+            sim = RISCVSimulator('functional')
+            sim.load_program(DATA + f"addi x1, x0, {value}\n")
+            sim.reset()
+            results.append(cache.run(sim))
+    assert results[0].registers[1] == 5
+    assert not results[1].cached
+    assert results[1].registers[1] == 7
+
+
+def test_key_covers_binary_text(tmp_path):
+    keys = []
+    for word in (0x00500093, 0x00700093):  # addi x1, x0, 5 / 7
+        path = tmp_path / f'{word:08x}.bin'
+        path.write_bytes(word.to_bytes(4, 'little'))
+        sim = RISCVSimulator('functional')
+        sim.load_binary(str(path))
+        with ResultCache(str(tmp_path / 'results.db')) as cache:
+            keys.append(cache.key(sim))
+    assert keys[0] != keys[1]
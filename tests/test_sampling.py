@@ -0,0 +1,39 @@
+from simulator import RISCVSimulator
+
+
+# 601 instructions, far fewer than one sampling interval
+SHORT = """
+    addi x1, x0, 200
+loop:
+    addi x2, x2, 3
+    addi x1, x1, -1
+    bne x1, x0, loop
+"""
+
+
+def full_run():
+    sim = RISCVSimulator()
+    sim.load_program(SHORT)
+    return sim.run()
+
+
+def test_program_shorter_than_an_interval_is_measured():
+    sim = RISCVSimulator()
+    sim.load_program(SHORT)
+    result = sim.run_sampled(interval=10000, warmup=100, window=1000)
+    expected = full_run()
+    assert result.windows
+    assert result.instructions == expected.instructions
+    assert abs(result.cycles - expected.cycles) <= 5
+    assert sim.registers[2] == 600
+
+
+def test_program_ending_in_the_warmup_uses_its_detailed_run():
+    sim = RISCVSimulator()
+    sim.load_program(SHORT)
+    result = sim.run_sampled(interval=10000, warmup=1000, window=1000)
+    expected = full_run()
+    assert len(result.windows) == 1
+    assert result.cycles == expected.cycles
+    assert result.hazards == expected.hazards
+    assert sim.cycle == expected.cycles
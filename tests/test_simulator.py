@@ -0,0 +1,90 @@
+import pytest
+
+from simulator import RISCVSimulator
+
+
+BASE = 0x1000
+
+
+def write_binary(path, *words):
+    path.write_bytes(b''.join(word.to_bytes(4, 'little') for word in words))
+
+
+@pytest.mark.parametrize('mode', RISCVSimulator.MODES)
+def test_reset_reloads_binary(mode, tmp_path):
+    path = tmp_path / 'prog.bin'
+    write_binary(path, 0x00500093)  # addi x1, x0, 5
+    sim = RISCVSimulator(mode)
+    sim.load_binary(str(path), BASE)
+    sim.run()
+    assert sim.registers[1] == 5
+
+    write_binary(path, 0x00700093)  # addi x1, x0, 7
+    sim.reset()
+    assert sim.cpu.pc == BASE
+    sim.run()
+    assert sim.registers[1] == 7
+
+
+# Three passes over "addi x5, x5, 1"; the first pass overwrites it with
+# "addi x5, x5, 100", which the next two must execute
+SELF_MODIFYING = (
+    0x06428137,  # lui x2, 0x6428
+    0x29310113,  # addi x2, x2, 0x293    (x2 = addi x5, x5, 100)
+    0x00300193,  # addi x3, x0, 3
+    0x00128293,  # addi x5, x5, 1
+    0x00202623,  # sw x2, 12(x0)
+    0xfff18193,  # addi x3, x3, -1
+    0xfe019ae3,  # bne x3, x0, -12
+)
+
+
+@pytest.mark.parametrize('mode', RISCVSimulator.MODES)
+def test_self_modifying_binary(mode, tmp_path):
+    path = tmp_path / 'prog.bin'
+    write_binary(path, *SELF_MODIFYING)
+    sim = RISCVSimulator(mode)
+    sim.load_binary(str(path))
+    sim.run()
+    assert sim.registers[5] == 201
+
+
+def test_empty_binary_is_rejected(tmp_path):
+    path = tmp_path / 'empty.bin'
+    path.write_bytes(b'')
+    with pytest.raises(ValueError, match='empty binary'):
+        RISCVSimulator().load_binary(str(path))
+
+
+UNTIL_PC = """
+    addi x1, x0, 5
+    addi x2, x1, 1
+    sw x2, 0(x0)
+    lw x3, 0(x0)
+    add x4, x3, x2
+"""
+
+
+@pytest.mark.parametrize('mode', RISCVSimulator.MODES)
+def test_until_pc_stops_before_the_instruction(mode):
+    sim = RISCVSimulator(mode)
+    sim.load_program(UNTIL_PC)
+    result = sim.run(until_pc=8)
+    assert result.stop_reason == 'until_pc'
+    assert sim.instructions_executed == 2
+    assert sim.registers[1:3] == [5, 6]
+    assert sim.memory.load(0) == 0
+    sim.run()
+    assert sim.registers[3:5] == [6, 12]
+
+
+def test_pipeline_resumed_after_until_pc_keeps_its_timing():
+    straight = RISCVSimulator()
+    straight.load_program(UNTIL_PC)
+    straight.run()
+    sim = RISCVSimulator()
+    sim.load_program(UNTIL_PC)
+    sim.run(until_pc=12)
+    sim.run()
+    assert (sim.cycle, sim.hazards_detected) == (straight.cycle, straight.hazards_detected)
+    assert list(sim.registers) == list(straight.registers)
@@ -0,0 +1,92 @@
+import mmap
+
+import numpy as np
+
+from cycle_trace import (TRACE_HEADER, TRACE_MAGIC, TRACE_RECORD, TRACE_VERSION, NO_PC,
+                         WRITE, LOAD, STORE, HAZARD, FLUSH, BRANCH, TAKEN, JUMP)
+
+
+# NumPy view of cycle_trace.TRACE_RECORD (packed, little-endian)
+TRACE_DTYPE = np.dtype([
+    ('cycle', '<i8'),
+    ('if_pc', '<u4'),
+    ('id_pc', '<u4'),
+    ('ex_pc', '<u4'),
+    ('mem_pc', '<u4'),
+    ('wb_pc', '<u4'),
+    ('value', '<i4'),
+    ('mem_address', '<u4'),
+    ('mem_value', '<i4'),
+    ('rd', 'u1'),
+    ('rs1', 'u1'),
+    ('rs2', 'u1'),
+    ('flags', 'u1'),
+])
+assert TRACE_DTYPE.itemsize == TRACE_RECORD.size
+
+FLAGS = {
+    'write': WRITE,
+    'load': LOAD,
+    'store': STORE,
+    'hazard': HAZARD,
+    'flush': FLUSH,
+    'branch': BRANCH,
+    'taken': TAKEN,
+    'jump': JUMP,
+}
+
+
+class TraceReader:
+    """Memory-maps a trace file written by cycle_trace.Tracer.
+
+    ``records`` is a read-only NumPy structured array (see TRACE_DTYPE)
+    backed by the mapping, so opening a trace reads nothing up front and
+    slicing or filtering only touches the pages involved. The record
+    count comes from the file size, so a trace whose writer did not close
+    cleanly can still be read.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(TRACE_HEADER.size)
+            if len(header) < TRACE_HEADER.size:
+                raise ValueError("Not a simulator trace")
+            magic, version, record_size, _ = TRACE_HEADER.unpack(header)
+            if magic != TRACE_MAGIC:
+                raise ValueError("Not a simulator trace")
+            if version != TRACE_VERSION or record_size != TRACE_DTYPE.itemsize:
+                raise ValueError(f"Unsupported trace version {version}")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        count = (len(self._map) - TRACE_HEADER.size) // TRACE_DTYPE.itemsize
+        self.records = np.frombuffer(self._map, dtype=TRACE_DTYPE, count=count,
+                                     offset=TRACE_HEADER.size)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def flag(self, name):
+        """Boolean mask of records with flag ``name`` ('load', 'taken', ...)"""
+        return (self.records['flags'] & FLAGS[name]) != 0
+
+    def retired(self):
+        """Records of cycles in which an instruction retired"""
+        return self.records[self.records['wb_pc'] != NO_PC]
+
+    def close(self):
+        self.records = None
+        try:
+            self._map.close()
+        except BufferError:
+            # Views taken from ``records`` are still alive; the mapping is
+            # released when the last of them is
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
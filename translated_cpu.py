@@ -0,0 +1,210 @@
+from types import SimpleNamespace
+
+from bits import MASK32, SIGN_BIT, wrap32
+from functional_cpu import FunctionalCPU
+from memory import PAGE_BITS
+from opcodes import OP_JALR
+
+
+
+# Python expression templates for ALU results, before 32-bit wrapping
+ALU_EXPRESSIONS = {
+    'add': '{a} + {b}', 'addi': '{a} + {imm}',
+    'sub': '{a} - {b}',
+    'and': '{a} & {b}', 'andi': '{a} & {imm}',
+    'or': '{a} | {b}', 'ori': '{a} | {imm}',
+    'xor': '{a} ^ {b}', 'xori': '{a} ^ {imm}',
+    'sll': '{a} << ({b} & 31)', 'slli': '{a} << {imm}',
+    'srl': '({a} & 0xFFFFFFFF) >> ({b} & 31)', 'srli': '({a} & 0xFFFFFFFF) >> {imm}',
+    'sra': '{a} >> ({b} & 31)', 'srai': '{a} >> {imm}',
+    'slt': '1 if {a} < {b} else 0', 'slti': '1 if {a} < {imm} else 0',
+    'sltu': '1 if ({a} & 0xFFFFFFFF) < ({b} & 0xFFFFFFFF) else 0',
+    'sltiu': '1 if ({a} & 0xFFFFFFFF) < ({imm} & 0xFFFFFFFF) else 0',
+}
+
+BRANCH_CONDITIONS = {
+    'beq': '{a} == {b}',
+    'bne': '{a} != {b}',
+    'blt': '{a} < {b}',
+    'bge': '{a} >= {b}',
+    'bltu': '({a} & 0xFFFFFFFF) < ({b} & 0xFFFFFFFF)',
+    'bgeu': '({a} & 0xFFFFFFFF) >= ({b} & 0xFFFFFFFF)',
+}
+
+
+def _wrapped_source(expression):
+    """Source of ``expression`` wrapped to signed 32 bits (wrap32, inlined)"""
+    return f"((({expression}) + {SIGN_BIT}) & {MASK32}) - {SIGN_BIT}"
+
+
+def _reg(number):
+    return f"r{number}" if number else '0'
+
+
+class TranslatedCPU(FunctionalCPU):
+    """Functional engine that runs whole basic blocks as compiled Python.
+
+    A block starts at a PC and runs up to (and including) the next branch,
+    jal or jalr. Its instructions are turned into Python source with the
+    registers they use held in locals, compiled once with ``compile()`` and
+    cached by start PC. A store to an address a translated block (or
+    decoded instruction) came from invalidates it (through the memory
+    watch RISCVSimulator sets on a binary's text), so self-modifying
+    binaries are retranslated. Single steps and the tail of a budgeted run
+    fall back to FunctionalCPU's per-instruction closures.
+    """
+
+    MAX_BLOCK_LENGTH = 64
+
+    def __init__(self):
+        super().__init__()
+        self._blocks = {}
+        self._code_pages = {}
+        self._program = None
+        self._port = None
+        self.blocks_translated = 0
+        self.blocks_invalidated = 0
+
+    def compile(self, program, memory_unit):
+        super().compile(program, memory_unit)
+        self._blocks = {}
+        self._code_pages = {}
+        self._program = program
+        self._port = SimpleNamespace(load=memory_unit.load, store=memory_unit.store)
+
+    def _translate_at(self, pc, program, memory_unit):
+        self._code_pages.setdefault(pc >> PAGE_BITS, set())
+        return super()._translate_at(pc, program, self._port)
+
+    def translate_block(self, pc):
+        """Compile the basic block starting at ``pc``; None if pc is not code"""
+        program = self._program
+        insts = []
+        end = pc
+        while len(insts) < self.MAX_BLOCK_LENGTH and program.start <= end < program.end:
+            inst = program.fetch(end)
+            if inst is None:
+                break
+            insts.append(inst)
+            end += 4
+            if inst.is_branch or inst.is_jump:
+                break
+        if not insts:
+            return None
+
+        namespace = {'regs': self.registers, 'load': self._port.load, 'store': self._port.store}
+        code = compile(self.block_source(pc, insts), f"<block 0x{pc & MASK32:08x}>", 'exec')
+        exec(code, namespace)
+
+        block = (namespace['block'], len(insts), end)
+        self._blocks[pc] = block
+        for page in range(pc >> PAGE_BITS, ((end - 1) >> PAGE_BITS) + 1):
+            self._code_pages.setdefault(page, set()).add(pc)
+        self.blocks_translated += 1
+        return block
+
+    def block_source(self, pc, insts):
+        """Python source for a block function returning the next PC"""
+        body = []
+        read = set()
+        written = set()
+        exit_pc = f"{pc + len(insts) * 4}"
+
+        for inst in insts:
+            a, b = _reg(inst.rs1), _reg(inst.rs2)
+            rd = inst.rd
+            if inst.rs1:
+                read.add(inst.rs1)
+            if inst.rs2:
+                read.add(inst.rs2)
+
+            if inst.is_load:
+                call = f"load({a} + {inst.imm}, {inst.mem_size}, {inst.mem_signed})"
+                body.append(f"r{rd} = {call}" if rd else call)
+            elif inst.is_store:
+                body.append(f"store({a} + {inst.imm}, {b}, {inst.mem_size})")
+            elif inst.is_branch:
+                condition = BRANCH_CONDITIONS[inst.op].format(a=a, b=b)
+                exit_pc = f"{pc + inst.imm} if {condition} else {pc + 4}"
+            elif inst.is_jump:
+                link = wrap32(pc + 4)
+                if inst.op_id == OP_JALR:
+                    body.append(f"target = ({a} + {inst.imm}) & ~1")
+                    exit_pc = 'target'
+                else:
+                    exit_pc = f"{pc + inst.imm}"
+                if rd:
+                    body.append(f"r{rd} = {link}")
+            elif inst.op == 'lui':
+                if rd:
+                    value = inst.imm << 12
+                    body.append(f"r{rd} = {wrap32(value)}")
+            elif inst.op == 'auipc':
+                if rd:
+                    value = pc + (inst.imm << 12)
+                    body.append(f"r{rd} = {wrap32(value)}")
+            elif rd:
+                expression = ALU_EXPRESSIONS[inst.op].format(a=a, b=b, imm=inst.imm)
+                body.append(f"r{rd} = {_wrapped_source(expression)}")
+
+            if inst.writes_rd:
+                written.add(rd)
+            pc += 4
+
+        lines = ['def block(regs=regs, load=load, store=store):']
+        lines += [f"    r{n} = regs[{n}]" for n in sorted(read)]
+        lines += [f"    {line}" for line in body]
+        lines += [f"    regs[{n}] = r{n}" for n in sorted(written)]
+        lines.append(f"    return {exit_pc}")
+        return '\n'.join(lines) + '\n'
+
+    def invalidate(self, start, end):
+        """Drop translations of code overlapping [start, end)"""
+        for page in range(start >> PAGE_BITS, ((end - 1) >> PAGE_BITS) + 1):
+            for block_start in list(self._code_pages.get(page, ())):
+                block = self._blocks.get(block_start)
+                if block is not None and block_start < end and start < block[2]:
+                    del self._blocks[block_start]
+                    self.blocks_invalidated += 1
+                    for block_page in range(block_start >> PAGE_BITS,
+                                            ((block[2] - 1) >> PAGE_BITS) + 1):
+                        self._code_pages.get(block_page, set()).discard(block_start)
+
+        super().invalidate(start, end)
+
+    def run(self, components, max_cycles=None, max_instructions=None, until_pc=None):
+        """Execute block by block until the PC leaves the program, reaches until_pc or a budget runs out"""
+        self._ensure_compiled(components)
+        program = components['program']
+        blocks = self._blocks
+        start, end = program.start, program.end
+        budget = self._budget(max_cycles, max_instructions)
+        until = -1 if until_pc is None else until_pc
+        pc = self.pc
+        count = 0
+
+        while start <= pc < end and count != budget and pc != until:
+            try:
+                block, length, block_end = blocks[pc]
+            except KeyError:
+                translated = self.translate_block(pc)
+                if translated is None:
+                    pc += 4  # not an instruction: skipped like a fetch bubble
+                    continue
+                block, length, block_end = translated
+            if (budget >= 0 and count + length > budget) or pc < until < block_end:
+                break
+            pc = block()
+            count += length
+
+        self.pc = pc
+        self.cycle += count
+        self.instructions_executed += count
+        if start <= pc < end and count != budget and pc != until:
+            # The budget or until_pc ends inside this block: finish one
+            # instruction at a time
+            return super().run(components,
+                               None if max_cycles is None else max_cycles - count,
+                               None if max_instructions is None else max_instructions - count,
+                               until_pc)
+        return self._stop_reason(start, end, until, count, max_cycles)